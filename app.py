@@ -3,15 +3,14 @@ import os
 
 load_dotenv()
 
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, jsonify
 from flask_cors import CORS
 from config import get_config
 
 
 def create_app():
-    app = Flask(__name__,
-                static_folder='dist',
-                static_url_path='')
+    # dist/ is served by utils.static_assets, Flask's own static route would shadow its fallback
+    app = Flask(__name__, static_folder=None)
     
     config_name = os.environ.get('FLASK_ENV', 'development')
 
@@ -31,25 +30,50 @@ def create_app():
         cors_origins = cors_origins.split(',')
     CORS(app, origins=cors_origins, supports_credentials=True)
 
+    from utils.metrics import init_app as init_metrics
+    init_metrics(app)
+
+    from utils.profiling import init_app as init_profiling
+    init_profiling(app)
+
     with app.app_context():
         from models.database import init_db, init_app
         init_app(app)
         init_db()
 
+    from services.generator_provider import GeneratorProvider
+    generator_provider = GeneratorProvider(app.config)
+    app.extensions['generator_provider'] = generator_provider
+
     from routes.quiz_routes import register_quiz_routes
     register_quiz_routes(app)
 
+    from routes.analytics_routes import register_analytics_routes
+    register_analytics_routes(app)
+
+    from routes.export_routes import register_export_routes
+    register_export_routes(app)
+
+    if config.MODEL_PRELOAD:
+        generator_provider.preload()
+        # Under gunicorn --preload the warmup runs in each worker after fork (see gunicorn.conf.py)
+        if os.environ.get('DEFER_MODEL_WARMUP', 'false').lower() != 'true':
+            generator_provider.start_warmup()
+
     @app.route('/health')
     def health():
         return jsonify({"status": "healthy", "message": "Quiz app is running"})
 
-    @app.route('/', defaults={'path': ''})
-    @app.route('/<path:path>')
-    def serve_react_app(path):
-        if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
-            return send_from_directory(app.static_folder, path)
-        else:
-            return send_from_directory(app.static_folder, 'index.html')
+    @app.route('/ready')
+    def ready():
+        """Readiness: with MODEL_PRELOAD only reports ready once the model has been warmed up"""
+        status = generator_provider.status()
+        if config.MODEL_PRELOAD and not generator_provider.ready:
+            return jsonify({"status": "not ready", "model": status}), 503
+        return jsonify({"status": "ready", "model": status})
+
+    from utils.static_assets import init_app as init_static_assets
+    init_static_assets(app)
 
     return app
 
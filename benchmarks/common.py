@@ -0,0 +1,67 @@
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+import statistics
+from typing import Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def git_revision() -> Dict[str, Optional[str]]:
+    def git(*args):
+        try:
+            return subprocess.check_output(['git', *args], stderr=subprocess.DEVNULL, text=True).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'commit': git('rev-parse', '--short', 'HEAD'),
+        'branch': git('rev-parse', '--abbrev-ref', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))
+    }
+
+
+def summarize(seconds: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    if not seconds:
+        return {'count': 0}
+    values = sorted(seconds)
+
+    def percentile(q):
+        return 1000 * values[min(len(values) - 1, int(q * len(values)))]
+
+    return {
+        'count': len(values),
+        'mean_ms': 1000 * statistics.mean(values),
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'max_ms': 1000 * values[-1]
+    }
+
+
+def write_results(name: str, params: Dict, results: Dict, output: Optional[str] = None) -> str:
+    """Write one run as JSON, by default to benchmarks/results/<name>-<commit>-<timestamp>.json"""
+    revision = git_revision()
+    report = {
+        'benchmark': name,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git': revision,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'params': params,
+        'results': results
+    }
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(
+            RESULTS_DIR, f"{name}-{revision['commit'] or 'nogit'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        )
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return output
@@ -0,0 +1,49 @@
+"""Compare two benchmark result files, e.g. from two commits
+
+    python -m benchmarks.compare benchmarks/results/micro-abc1234-*.json benchmarks/results/micro-def5678-*.json
+"""
+import json
+import argparse
+from typing import Dict
+
+# Latencies are better when lower, throughput when higher
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'rss_mb', 'quizzes_per_second')
+
+
+def flatten(results: Dict, prefix: str = '') -> Dict[str, float]:
+    values = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            values.update(flatten(value, name))
+        elif key in METRICS and isinstance(value, (int, float)):
+            values[name] = value
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    parser.add_argument('--threshold', type=float, default=5.0, help='Flag changes larger than this percentage')
+    args = parser.parse_args()
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.candidate, 'r', encoding='utf-8') as f:
+        candidate = json.load(f)
+
+    print(f"baseline  {baseline['git'].get('commit')} {baseline['timestamp']}")
+    print(f"candidate {candidate['git'].get('commit')} {candidate['timestamp']}")
+
+    before, after = flatten(baseline['results']), flatten(candidate['results'])
+    for name in sorted(before.keys() & after.keys()):
+        old, new = before[name], after[name]
+        change = 100 * (new - old) / old if old else 0.0
+        better = change < 0 if not name.endswith('quizzes_per_second') else change > 0
+        flag = '' if abs(change) < args.threshold else ('  better' if better else '  WORSE')
+        print(f"{name:60s} {old:12.3f} -> {new:12.3f} {change:+7.1f}%{flag}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Startup time and memory of the web tier, each sample in a fresh interpreter
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --repeat 10 --top 15
+
+create_app imports app.py (which creates the app), first_request also answers
+/health, model_stack imports torch and transformers for reference. Every
+scenario reports which heavy modules ended up imported.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List
+
+from benchmarks.common import summarize, write_results
+
+HEAVY_MODULES = ('torch', 'transformers', 'numpy', 'pyarrow')
+
+# Runs in the child, prints seconds, peak RSS and loaded heavy modules as JSON
+PROBE = """
+import json, sys, time, resource
+started = time.perf_counter()
+{body}
+seconds = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    'seconds': seconds,
+    'rss_mb': rss / (1024 * 1024 if sys.platform == 'darwin' else 1024),
+    'heavy_modules': [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+SCENARIOS = {
+    'create_app': "import app",
+    'first_request': "import app\nassert app.app.test_client().get('/health').status_code == 200",
+    'model_stack': "import torch, transformers"
+}
+
+
+def child_env(data_dir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        'DB_PATH': os.path.join(data_dir, 'quiz_db.sqlite'),
+        'SESSION_STORE_PATH': os.path.join(data_dir, 'quiz_sessions.sqlite'),
+        'DISTRACTOR_CACHE_PATH': os.path.join(data_dir, 'distractor_cache.sqlite'),
+        'METRICS_DIR': os.path.join(data_dir, 'metrics'),
+        'MODEL_PRELOAD': 'false',
+        'SECRET_KEY': env.get('SECRET_KEY', 'benchmark')
+    })
+    return env
+
+
+def run_scenario(body: str, repeat: int, env: Dict[str, str]) -> Dict:
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', PROBE.format(body=body, heavy=HEAVY_MODULES)],
+            env=env, capture_output=True, text=True, check=True
+        )
+        samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return {
+        **summarize([sample['seconds'] for sample in samples]),
+        'rss_mb': max(sample['rss_mb'] for sample in samples),
+        'heavy_modules': samples[-1]['heavy_modules']
+    }
+
+
+def slowest_imports(body: str, env: Dict[str, str], top: int) -> List[Dict]:
+    """Import time per top-level package from python -X importtime
+
+    A package's time is its largest cumulative time, so it includes the packages
+    it imports itself (flask includes werkzeug).
+    """
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', body], env=env, capture_output=True, text=True, check=True
+    )
+    packages = {}
+    for line in output.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        package = name.strip().split('.')[0]
+        packages[package] = max(packages.get(package, 0), int(cumulative))
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{'package': package, 'ms': microseconds / 1000} for package, microseconds in ranked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure web tier import time and memory')
+    parser.add_argument('--only', nargs='+', choices=list(SCENARIOS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='Show the slowest top-level imports of create_app')
+    parser.add_argument('--output', help='Results JSON, default benchmarks/results/')
+    args = parser.parse_args()
+
+    env = child_env(tempfile.mkdtemp(prefix='quiz-import-'))
+    results = {}
+    for name in args.only or list(SCENARIOS):
+        try:
+            results[name] = run_scenario(SCENARIOS[name], args.repeat, env)
+        except subprocess.CalledProcessError as e:
+            print(f"{name:15s} failed: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        summary = results[name]
+        print(f"{name:15s} p50={summary['p50_ms']:8.1f} ms max_rss={summary['rss_mb']:7.1f} MB "
+              f"heavy={','.join(summary['heavy_modules']) or '-'}")
+
+    if args.top:
+        results['slowest_imports'] = slowest_imports(SCENARIOS['create_app'], env, args.top)
+        for entry in results['slowest_imports']:
+            print(f"  {entry['package']:30s} {entry['ms']:8.1f} ms")
+
+    params = {key: value for key, value in vars(args).items() if key != 'output'}
+    print(f"Results written to {write_results('import_time', params, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
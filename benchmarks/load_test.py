@@ -0,0 +1,231 @@
+"""Drive /start_quiz -> /get_all_questions -> /submit_quiz at a given concurrency
+
+    python -m benchmarks.load_test --users 8 --quizzes 200
+    python -m benchmarks.load_test --generator model --users 4 --quizzes 20
+    python -m benchmarks.load_test --url http://localhost:5000 --users 16 --duration 60
+
+Without --url the app runs in-process on a temporary data directory, with a
+stub generator (fixed latency per batch) or the real model.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import http.cookiejar
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from benchmarks.common import summarize, write_results
+
+ENDPOINTS = ('/start_quiz', '/get_all_questions', '/submit_quiz')
+
+
+class StubGenerator:
+    """Stands in for the model: sleeps latency_ms per batch and returns formatted wrong answers"""
+
+    model_path = 'stub'
+    fingerprint = 'stub'
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency = latency_ms / 1000.0
+
+    def generate_distractors_batch(self, items, num_distractors: int = 3, **kwargs) -> List[List[str]]:
+        from services.numeric_distractors import numeric_distractors
+
+        if self.latency:
+            time.sleep(self.latency)
+        results = []
+        for question, answer in items:
+            distractors = numeric_distractors(answer, num_distractors, question)
+            results.append(distractors + [f"{answer} ({i})" for i in range(num_distractors - len(distractors))])
+        return results
+
+    def generate_distractors(self, question, answer, num_distractors: int = 3, **kwargs) -> List[str]:
+        return self.generate_distractors_batch([(question, answer)], num_distractors)[0]
+
+
+class TestClientSession:
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def post(self, path: str, payload: Dict) -> Tuple[int, Dict]:
+        response = self.client.post(path, json=payload)
+        return response.status_code, response.get_json(silent=True) or {}
+
+
+class HTTPSession:
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def post(self, path: str, payload: Dict) -> Tuple[int, Dict]:
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        try:
+            with self.opener.open(request, timeout=300) as response:
+                return response.status, json.loads(response.read() or b'{}')
+        except urllib.error.HTTPError as e:
+            return e.code, {}
+
+
+def build_submission(quiz: Dict, rng: random.Random) -> Dict:
+    answers = []
+    for question in quiz['questions']:
+        options = [question['correct_answer'], *question['distractors']]
+        chosen = rng.choice(options)
+        answers.append({
+            'question': question['question'],
+            'answer': chosen,
+            'not_selected_answers': [option for option in options if option != chosen],
+            'is_correct': chosen == question['correct_answer'],
+            'confidence': rng.randint(1, 5),
+            'is_generated': question['is_generated']
+        })
+    return {
+        'quiz_id': quiz['quiz_id'],
+        'participant_name': 'loadtest',
+        'answers': answers,
+        'score': sum(answer['is_correct'] for answer in answers),
+        'avg_confidence': sum(answer['confidence'] for answer in answers) / len(answers),
+        'total_questions': len(answers)
+    }
+
+
+class LoadTest:
+
+    def __init__(self, make_session, users: int, quizzes: int, duration: float, seed: int = 0):
+        self.make_session = make_session
+        self.users = users
+        self.quizzes = quizzes
+        self.duration = duration
+        self.seed = seed
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.completed = 0
+        self._lock = threading.Lock()
+        self._started = 0
+
+    def _claim(self, deadline: float) -> bool:
+        with self._lock:
+            if self.duration and time.monotonic() >= deadline:
+                return False
+            if not self.duration and self._started >= self.quizzes:
+                return False
+            self._started += 1
+            return True
+
+    def _record(self, path: str, seconds: float, status: int) -> bool:
+        with self._lock:
+            self.latencies[path].append(seconds)
+            if status != 200:
+                self.errors[path] += 1
+        return status == 200
+
+    def _call(self, session, path: str, payload: Dict) -> Tuple[bool, Dict]:
+        started = time.perf_counter()
+        status, body = session.post(path, payload)
+        return self._record(path, time.perf_counter() - started, status), body
+
+    def _user(self, index: int, deadline: float):
+        rng = random.Random(self.seed + index)
+        session = self.make_session()
+        while self._claim(deadline):
+            ok, _ = self._call(session, '/start_quiz', {})
+            if not ok:
+                continue
+            ok, quiz = self._call(session, '/get_all_questions', {})
+            if not ok:
+                continue
+            ok, _ = self._call(session, '/submit_quiz', build_submission(quiz, rng))
+            if ok:
+                with self._lock:
+                    self.completed += 1
+
+    def run(self) -> Dict:
+        started = time.monotonic()
+        deadline = started + self.duration if self.duration else None
+        threads = [threading.Thread(target=self._user, args=(i, deadline)) for i in range(self.users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        return {
+            'elapsed_seconds': elapsed,
+            'completed_quizzes': self.completed,
+            'quizzes_per_second': self.completed / elapsed if elapsed else 0.0,
+            'endpoints': {
+                path: {**summarize(self.latencies[path]), 'errors': self.errors[path]}
+                for path in ENDPOINTS
+            }
+        }
+
+
+def in_process_app(generator: str, stub_latency_ms: float):
+    """Create the app on a temporary data directory, with the stub or the real generator"""
+    data_dir = tempfile.mkdtemp(prefix='quiz-loadtest-')
+    os.environ['DB_PATH'] = os.path.join(data_dir, 'quiz_db.sqlite')
+    os.environ['SESSION_STORE_PATH'] = os.path.join(data_dir, 'quiz_sessions.sqlite')
+    os.environ['DISTRACTOR_CACHE_PATH'] = os.path.join(data_dir, 'distractor_cache.sqlite')
+    os.environ.setdefault('SECRET_KEY', 'loadtest')
+
+    from app import create_app
+    app = create_app()
+
+    if generator == 'stub':
+        from services.batch_scheduler import BatchScheduler
+
+        stub = StubGenerator(stub_latency_ms)
+        if app.config.get('BATCHING_ENABLED'):
+            stub = BatchScheduler(stub, app.config['BATCH_MAX_SIZE'], app.config['BATCH_WAIT_MS'])
+        app.extensions['generator_provider'].use(stub)
+    else:
+        app.extensions['generator_provider'].warmup()
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the quiz serving path')
+    parser.add_argument('--url', help='Test a running server instead of an in-process app')
+    parser.add_argument('--generator', choices=['stub', 'model'], default='stub')
+    parser.add_argument('--stub-latency-ms', type=float, default=50, help='Stub generation time per batch')
+    parser.add_argument('--users', type=int, default=8, help='Concurrent simulated participants')
+    parser.add_argument('--quizzes', type=int, default=100, help='Total quizzes, ignored with --duration')
+    parser.add_argument('--duration', type=float, default=0, help='Run for this many seconds instead')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Results JSON, default benchmarks/results/')
+    args = parser.parse_args()
+
+    if args.url:
+        make_session = lambda: HTTPSession(args.url)
+    else:
+        app = in_process_app(args.generator, args.stub_latency_ms)
+        make_session = lambda: TestClientSession(app)
+
+    results = LoadTest(make_session, args.users, args.quizzes, args.duration, args.seed).run()
+
+    print(f"{results['completed_quizzes']} quizzes in {results['elapsed_seconds']:.1f}s "
+          f"({results['quizzes_per_second']:.2f} quizzes/s, {args.users} users)")
+    for path, summary in results['endpoints'].items():
+        if summary['count']:
+            print(f"{path:20s} n={summary['count']:5d} p50={summary['p50_ms']:8.1f} ms "
+                  f"p95={summary['p95_ms']:8.1f} ms p99={summary['p99_ms']:8.1f} ms errors={summary['errors']}")
+
+    params = {key: value for key, value in vars(args).items() if key != 'output'}
+    print(f"Results written to {write_results('load_test', params, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
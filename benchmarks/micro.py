@@ -0,0 +1,161 @@
+"""Micro-benchmarks of the hot functions on the serving path
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --with-model --only generate_distractors
+
+generate_distractors needs the model and only runs with --with-model.
+"""
+import os
+import json
+import time
+import uuid
+import argparse
+import tempfile
+from typing import Callable, Dict, List
+
+from benchmarks.common import summarize, write_results
+
+QUESTIONS_FILE = 'quiz_results/arithmetik_questions.json'
+
+
+def measure(fn: Callable, repeat: int, number: int, setup: Callable = None) -> Dict:
+    """Time number calls per sample, repeat samples, and report per-call latency"""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return {**summarize(samples), 'calls_per_sample': number}
+
+
+def load_items(limit: int = 20) -> List[tuple]:
+    with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
+        return [(q['question'], q['answer']) for q in json.load(f)[:limit]]
+
+
+def bench_extract(repeat: int) -> Dict:
+    from services.distractor_service import DistractorGenerator
+
+    # The parsing helpers do not touch the model, so skip loading it
+    generator = DistractorGenerator.__new__(DistractorGenerator)
+    texts = [
+        "<distractor1> 12 <distractor2> 15 <distractor3> 18",
+        "2.5 hours, 3 hours, 3.5 hours",
+        "120 150 180",
+        "The answer is not a number"
+    ]
+    return measure(lambda: [generator._extract_distractors_seq2seq(text) for text in texts], repeat, 1000)
+
+
+def bench_filter(repeat: int) -> Dict:
+    from services.distractor_service import DistractorGenerator
+
+    generator = DistractorGenerator.__new__(DistractorGenerator)
+    candidates = ['12', '15', ' 15 ', '18', '42', '12', '20', '21', '22', '23', '24', '25']
+    return measure(lambda: generator._filter_distractors(candidates, '42', 3), repeat, 1000)
+
+
+def bench_numeric_rules(repeat: int) -> Dict:
+    from services.numeric_distractors import numeric_distractors
+
+    items = load_items()
+    return measure(lambda: [numeric_distractors(answer, 3, question) for question, answer in items], repeat, 20)
+
+
+def bench_load_questions(repeat: int) -> Dict:
+    from services.quiz_service import QuizService
+
+    service = QuizService()
+    return measure(service.load_questions, repeat, 50)
+
+
+def bench_save_quiz_result(repeat: int) -> Dict:
+    from app import create_app
+    from models.quiz import QuizModel
+
+    app = create_app()
+    answers = [
+        {
+            'question': question,
+            'answer': answer,
+            'not_selected_answers': ['1', '2', '3'],
+            'is_correct': i % 2 == 0,
+            'confidence': 3,
+            'is_generated': i < 10
+        }
+        for i, (question, answer) in enumerate(load_items())
+    ]
+
+    def save():
+        QuizModel.save_quiz_result({
+            'quiz_id': str(uuid.uuid4()),
+            'participant_name': 'benchmark',
+            'answers': answers,
+            'score': 10,
+            'avg_confidence': 3.0
+        })
+
+    with app.app_context():
+        return measure(save, repeat, 20)
+
+
+def bench_generate_distractors(repeat: int) -> Dict:
+    from services.distractor_service import DistractorGenerator
+
+    generator = DistractorGenerator()
+    items = load_items(10)
+    generator.generate_distractors(*items[0])
+
+    single = measure(lambda: generator.generate_distractors(*items[0]), repeat, 1)
+    batch = measure(lambda: generator.generate_distractors_batch(items), max(1, repeat // 5), 1)
+    return {
+        'profile': generator.profile.name,
+        'backend': generator.backend.name,
+        'single': single,
+        'batch_of_10': batch
+    }
+
+
+BENCHMARKS = {
+    '_extract_distractors_seq2seq': bench_extract,
+    '_filter_distractors': bench_filter,
+    'numeric_distractors': bench_numeric_rules,
+    'load_questions': bench_load_questions,
+    'save_quiz_result': bench_save_quiz_result,
+    'generate_distractors': bench_generate_distractors
+}
+
+MODEL_BENCHMARKS = {'generate_distractors'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks of the serving path')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS))
+    parser.add_argument('--with-model', action='store_true', help='Also benchmark generation with the real model')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='Results JSON, default benchmarks/results/')
+    args = parser.parse_args()
+
+    # save_quiz_result writes to a throwaway database
+    data_dir = tempfile.mkdtemp(prefix='quiz-micro-')
+    os.environ['DB_PATH'] = os.path.join(data_dir, 'quiz_db.sqlite')
+    os.environ['SESSION_STORE_PATH'] = os.path.join(data_dir, 'quiz_sessions.sqlite')
+    os.environ['DISTRACTOR_CACHE_PATH'] = os.path.join(data_dir, 'distractor_cache.sqlite')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+    names = args.only or [name for name in BENCHMARKS if args.with_model or name not in MODEL_BENCHMARKS]
+    results = {}
+    for name in names:
+        results[name] = BENCHMARKS[name](args.repeat)
+        summary = results[name].get('single', results[name])
+        print(f"{name:30s} p50={summary['p50_ms']:10.4f} ms p95={summary['p95_ms']:10.4f} ms")
+
+    params = {key: value for key, value in vars(args).items() if key != 'output'}
+    print(f"Results written to {write_results('micro', params, results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
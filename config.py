@@ -7,10 +7,86 @@ class Config:
     
     QUESTIONS_FILE = os.environ.get('QUESTIONS_FILE') or 'quiz_results/arithmetik_questions.json'
     QUESTIONS_PER_QUIZ = 20 
+    # Optional attribute to stratify question sampling by: answer_type or length_bucket
+    QUESTION_STRATIFY_BY = os.environ.get('QUESTION_STRATIFY_BY')
     
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000,http://localhost:5173').split(',')
     
     MODEL_PATH = os.environ.get('MODEL_PATH', './downloaded_model')
+    
+    DISTRACTOR_CACHE_ENABLED = os.environ.get('DISTRACTOR_CACHE_ENABLED', 'true').lower() == 'true'
+    DISTRACTOR_CACHE_PATH = os.environ.get('DISTRACTOR_CACHE_PATH') or os.path.join(os.path.dirname(DB_PATH), 'distractor_cache.sqlite')
+    DISTRACTOR_CACHE_VARIANTS = int(os.environ.get('DISTRACTOR_CACHE_VARIANTS', '3'))
+    DISTRACTOR_CACHE_TTL = int(os.environ.get('DISTRACTOR_CACHE_TTL', str(7 * 24 * 3600)))
+    DISTRACTOR_CACHE_MAX_ENTRIES = int(os.environ.get('DISTRACTOR_CACHE_MAX_ENTRIES', '10000'))
+    
+    # Load and warm up the model at startup instead of on the first /get_all_questions call
+    MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', 'false').lower() == 'true'
+    
+    # torch, torch-int8 (dynamic int8 quantization, CPU) or onnx (ONNX Runtime, CPU)
+    INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'torch')
+    
+    # fast, balanced or quality (see services/decoding_profiles.py), requests may pick another one
+    DECODING_PROFILE = os.environ.get('DECODING_PROFILE', 'quality')
+    
+    # off, topup (fill short model output with rule-based numeric distractors) or rules_first (skip the model when the rules suffice)
+    DISTRACTOR_HYBRID_MODE = os.environ.get('DISTRACTOR_HYBRID_MODE', 'off')
+    
+    # Time budget for the AI questions of one quiz and for each generate() call, keep MODEL_TIMEOUT below GUNICORN_TIMEOUT
+    MODEL_TIMEOUT = int(os.environ.get('MODEL_TIMEOUT', '60'))
+    QUESTION_TIMEOUT = float(os.environ.get('QUESTION_TIMEOUT', '10'))
+    # Questions short of distractors are retried with this profile, then served from the cache, swapped for a spare,
+    # given rule-based numeric distractors or, last, swapped for one of SPARE_QUESTIONS manual distractor questions
+    FALLBACK_PROFILE = os.environ.get('FALLBACK_PROFILE', 'fast')
+    SPARE_QUESTIONS = int(os.environ.get('SPARE_QUESTIONS', '5'))
+    
+    # Group concurrent /submit_quiz writes into one transaction. The queue is per process, so a group
+    # holds at most one submission per request thread (GUNICORN_THREADS, 2 by default), MAX_BATCH
+    # is only an upper bound for deployments with many more threads
+    WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', 'false').lower() == 'true'
+    WRITE_BEHIND_MAX_BATCH = int(os.environ.get('WRITE_BEHIND_MAX_BATCH', '200'))
+    WRITE_BEHIND_MAX_DELAY_MS = float(os.environ.get('WRITE_BEHIND_MAX_DELAY_MS', '20'))
+    # A submission not committed by the queue within this time is written directly
+    WRITE_BEHIND_TIMEOUT = float(os.environ.get('WRITE_BEHIND_TIMEOUT', '10'))
+    
+    # 'sqlite' shares generated quizzes across gunicorn workers, 'memory' keeps them per process
+    SESSION_STORE = os.environ.get('SESSION_STORE', 'sqlite')
+    SESSION_STORE_PATH = os.environ.get('SESSION_STORE_PATH') or os.path.join(os.path.dirname(DB_PATH), 'quiz_sessions.sqlite')
+    SESSION_TTL = int(os.environ.get('SESSION_TTL', str(4 * 3600)))
+    SESSION_MAX_ENTRIES = int(os.environ.get('SESSION_MAX_ENTRIES', '10000'))
+    
+    # 'local' loads the model in every worker, 'server' talks to one shared inference process
+    # (authenticated with INFERENCE_AUTHKEY or SECRET_KEY). INFERENCE_TIMEOUT bounds connecting and each reply
+    INFERENCE_MODE = os.environ.get('INFERENCE_MODE', 'local')
+    INFERENCE_SOCKET = os.environ.get('INFERENCE_SOCKET', 'data/inference.sock')
+    INFERENCE_TIMEOUT = int(os.environ.get('INFERENCE_TIMEOUT', '120'))
+    
+    BATCHING_ENABLED = os.environ.get('BATCHING_ENABLED', 'true').lower() == 'true'
+    BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', '16'))
+    BATCH_WAIT_MS = float(os.environ.get('BATCH_WAIT_MS', '20'))
+    
+    # Per-process metric snapshots, merged by /metrics across gunicorn workers
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_DIR = os.environ.get('METRICS_DIR') or os.path.join(os.path.dirname(DB_PATH), 'metrics')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '5'))
+    
+    # /export is disabled unless a token is set, it returns participant names
+    EXPORT_TOKEN = os.environ.get('EXPORT_TOKEN')
+    EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '1000'))
+    
+    # Opt-in request profiling (X-Profile header or sampling), no hooks are installed when disabled
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+    PROFILING_DIR = os.environ.get('PROFILING_DIR') or os.path.join(os.path.dirname(DB_PATH), 'profiles')
+    PROFILING_MAX_CAPTURES = int(os.environ.get('PROFILING_MAX_CAPTURES', '50'))
+
+    @classmethod
+    def validate(cls):
+        """Reject settings that would otherwise only fail on the first request"""
+        from services.question_bank import STRATA
+        if cls.QUESTION_STRATIFY_BY and cls.QUESTION_STRATIFY_BY not in STRATA:
+            raise ValueError(f"QUESTION_STRATIFY_BY must be one of {', '.join(STRATA)}, got '{cls.QUESTION_STRATIFY_BY}'")
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -31,7 +107,7 @@ class ProductionConfig(Config):
     QUESTIONS_PER_QUIZ = int(os.environ.get('QUESTIONS_PER_QUIZ', '15'))
     
     ENABLE_GPU = os.environ.get('ENABLE_GPU', 'true').lower() == 'true'
-    MODEL_TIMEOUT = int(os.environ.get('MODEL_TIMEOUT', '120'))
+    MODEL_TIMEOUT = int(os.environ.get('MODEL_TIMEOUT', '90'))
     
     CORS_ORIGINS = [
         'https://localhost:5173',
@@ -50,4 +126,6 @@ def get_config(config_name=None):
     if config_name is None:
         config_name = os.environ.get('FLASK_ENV', 'development')
     
-    return config_by_name.get(config_name, DevelopmentConfig)
\ No newline at end of file
+    config = config_by_name.get(config_name, DevelopmentConfig)
+    config.validate()
+    return config
\ No newline at end of file
@@ -0,0 +1,56 @@
+import os
+import gc
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('GUNICORN_WORKERS', '4'))
+threads = int(os.environ.get('GUNICORN_THREADS', '2'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+accesslog = '-'
+errorlog = '-'
+
+# With MODEL_PRELOAD the app, and with it the model weights, is loaded once in the master
+# before forking so all workers share the weights copy-on-write. Warmup then runs per worker.
+preload_app = os.environ.get('MODEL_PRELOAD', 'false').lower() == 'true'
+if preload_app:
+    os.environ['DEFER_MODEL_WARMUP'] = 'true'
+
+# Workers write metric snapshots side by side, only the master clears old ones
+os.environ['METRICS_MULTIPROCESS'] = 'true'
+
+
+def on_starting(server):
+    """Clear metric snapshots of the previous run and start the shared inference process"""
+    from utils.metrics import configure_from_env
+    configure_from_env(clear=True)
+
+    if os.environ.get('INFERENCE_MODE', 'local') != 'server':
+        return
+
+    from services.inference_server import start_inference_server
+    server.inference_process = start_inference_server(
+        os.environ.get('INFERENCE_SOCKET', 'data/inference.sock'),
+        os.environ.get('MODEL_PATH')
+    )
+
+
+def pre_fork(server, worker):
+    # Keep objects created while loading the app out of the GC's reach so collections in
+    # the workers do not touch (and copy) the shared pages
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+
+    provider = worker.app.callable.extensions.get('generator_provider')
+    if provider is not None:
+        provider.start_warmup()
+
+
+def on_exit(server):
+    process = getattr(server, 'inference_process', None)
+    if process is not None and process.is_alive():
+        process.terminate()
+        process.join(10)
@@ -0,0 +1,71 @@
+import sqlite3
+from models.database import get_db
+
+
+def _bucket_stats(answers, correct):
+    return {
+        "answers": answers,
+        "correct": correct,
+        "accuracy": correct / answers if answers else None
+    }
+
+
+def _summarize(rows):
+    """Fold (confidence, answers, correct) rows into totals plus a calibration histogram"""
+    answers = sum(row['answers'] for row in rows)
+    correct = sum(row['correct'] for row in rows)
+    confidence_sum = sum(row['confidence'] * row['answers'] for row in rows)
+
+    summary = _bucket_stats(answers, correct)
+    summary['mean_confidence'] = confidence_sum / answers if answers else None
+    summary['confidence'] = {
+        str(row['confidence']): _bucket_stats(row['answers'], row['correct'])
+        for row in sorted(rows, key=lambda row: row['confidence'])
+    }
+    return summary
+
+
+class AnalyticsModel:
+    
+    @staticmethod
+    def get_type_summary():
+        """Accuracy, mean confidence and calibration per question_type (AI vs Manual)"""
+        db = get_db()
+        
+        try:
+            rows = db.execute(
+                "SELECT question_type, confidence, answers, correct FROM analytics_type"
+            ).fetchall()
+        except sqlite3.Error as e:
+            raise Exception(f"Database error: {str(e)}")
+        
+        by_type = {}
+        for row in rows:
+            by_type.setdefault(row['question_type'], []).append(row)
+        
+        return {question_type: _summarize(type_rows) for question_type, type_rows in by_type.items()}
+    
+    @staticmethod
+    def get_question_stats(question_type=None):
+        """Per-question accuracy, mean confidence and calibration"""
+        db = get_db()
+        
+        query = "SELECT question, question_type, confidence, answers, correct FROM analytics_question"
+        params = ()
+        if question_type:
+            query += " WHERE question_type = ?"
+            params = (question_type,)
+        
+        try:
+            rows = db.execute(query, params).fetchall()
+        except sqlite3.Error as e:
+            raise Exception(f"Database error: {str(e)}")
+        
+        by_question = {}
+        for row in rows:
+            by_question.setdefault((row['question'], row['question_type']), []).append(row)
+        
+        return [
+            {"question": question, "question_type": q_type, **_summarize(question_rows)}
+            for (question, q_type), question_rows in sorted(by_question.items())
+        ]
@@ -1,28 +1,47 @@
 import sqlite3
 import os
+import threading
 from flask import current_app, g
 import logging
 
 logger = logging.getLogger(__name__)
 
+_local = threading.local()
+
+def connect(db_path):
+    """Open a connection tuned for concurrent writers: WAL journal, NORMAL sync, busy timeout"""
+    conn = sqlite3.connect(
+        db_path,
+        timeout=10,
+        detect_types=sqlite3.PARSE_DECLTYPES
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=10000")
+    return conn
+
 def get_db():
-    """Get database connection from global context or create new one"""
+    """Get this worker thread's database connection, reused across requests"""
     if 'db' not in g:
         db_path = current_app.config['DB_PATH']
-        g.db = sqlite3.connect(
-            db_path,
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        key = (os.getpid(), db_path)
+        
+        # Connections are not shared across threads or inherited across fork
+        if getattr(_local, 'key', None) != key:
+            _local.conn = connect(db_path)
+            _local.key = key
+        
+        g.db = _local.conn
     
     return g.db
 
 def close_db(e=None):
-    """Close database connection if exists"""
+    """Release the connection at the end of the request, rolling back anything left uncommitted"""
     db = g.pop('db', None)
     
-    if db is not None:
-        db.close()
+    if db is not None and db.in_transaction:
+        db.rollback()
 
 def init_db():
     """Initialize database"""
@@ -38,7 +57,7 @@ def init_db():
     logger.info(f"Using database path: {db_path}")
 
     try:
-        conn = sqlite3.connect(db_path)
+        conn = connect(db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
@@ -86,6 +105,46 @@ def init_db():
             ON quiz_answers(quiz_id)
         ''')
 
+        # Aggregates maintained on every submit, see QuizModel.insert_quiz
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analytics_question (
+                question TEXT NOT NULL,
+                question_type TEXT NOT NULL,
+                confidence INTEGER NOT NULL,
+                answers INTEGER NOT NULL DEFAULT 0,
+                correct INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (question, question_type, confidence)
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analytics_type (
+                question_type TEXT NOT NULL,
+                confidence INTEGER NOT NULL,
+                answers INTEGER NOT NULL DEFAULT 0,
+                correct INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (question_type, confidence)
+            )
+        ''')
+
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM analytics_type)")
+        analytics_empty = not cursor.fetchone()[0]
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM quiz_answers)")
+        if analytics_empty and cursor.fetchone()[0]:
+            logger.info("Backfilling analytics tables from existing quiz answers")
+            cursor.execute('''
+                INSERT INTO analytics_question (question, question_type, confidence, answers, correct)
+                SELECT question, COALESCE(question_type, 'AI'), CAST(ROUND(COALESCE(confidence, 0)) AS INTEGER), COUNT(*), SUM(is_correct)
+                FROM quiz_answers
+                GROUP BY 1, 2, 3
+            ''')
+            cursor.execute('''
+                INSERT INTO analytics_type (question_type, confidence, answers, correct)
+                SELECT question_type, confidence, SUM(answers), SUM(correct)
+                FROM analytics_question
+                GROUP BY 1, 2
+            ''')
+
         conn.commit()
         logger.info("SQLite database initialized successfully")
         
@@ -100,4 +159,12 @@ def init_db():
 
 def init_app(app):
     """Register database with Flask"""
-    app.teardown_appcontext(close_db)
\ No newline at end of file
+    app.teardown_appcontext(close_db)
+    
+    if app.config.get('WRITE_BEHIND_ENABLED'):
+        from models.write_queue import WriteBehindQueue
+        app.extensions['write_queue'] = WriteBehindQueue(
+            app.config['DB_PATH'],
+            max_batch=app.config['WRITE_BEHIND_MAX_BATCH'],
+            max_delay_ms=app.config['WRITE_BEHIND_MAX_DELAY_MS']
+        )
\ No newline at end of file
@@ -1,61 +1,143 @@
 import json
+import math
 import sqlite3
+import logging
+from collections import Counter
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from flask import current_app
 from models.database import get_db
+from utils import metrics
+
+logger = logging.getLogger(__name__)
+
+SAVE_SECONDS = metrics.histogram(
+    'quiz_save_result_seconds', 'Time to commit one quiz submission, by write path', ['path']
+)
 
 class QuizModel:
     
+    ANSWER_FIELDS = ['question', 'answer', 'not_selected_answers', 'is_correct', 'confidence', 'is_generated']
+    
     @staticmethod
     def save_quiz_result(quiz_data):
+        write_queue = current_app.extensions.get('write_queue')
+        if write_queue is not None:
+            # Group commit: wait until the transaction holding this submission is committed
+            timeout = current_app.config.get('WRITE_BEHIND_TIMEOUT', 10)
+            try:
+                with SAVE_SECONDS.time(path='write_behind'):
+                    return write_queue.submit(quiz_data).result(timeout=timeout)
+            except FutureTimeoutError:
+                # insert_quiz ignores a quiz_id that exists, so a late group commit cannot duplicate it
+                logger.error(f"Write-behind queue did not commit quiz {quiz_data['quiz_id']} within {timeout}s, writing it directly")
+        
         db = get_db()
-        cursor = db.cursor()
         
         try:
-            cursor.execute(
-                "SELECT quiz_id FROM quiz_results WHERE quiz_id = ?", 
-                (quiz_data['quiz_id'],)
-            )
-            existing_quiz = cursor.fetchone()
-            
-            if existing_quiz:
-                return {"message": "Quiz already submitted", "quiz_id": quiz_data['quiz_id']}
-            
-            cursor.execute(
-                '''INSERT INTO quiz_results (quiz_id, participant_name, score, avg_confidence)
-                   VALUES (?, ?, ?, ?)''',
-                (
-                    quiz_data['quiz_id'], 
-                    quiz_data.get('participant_name', 'Anonymous'),
-                    quiz_data['score'], 
-                    float(quiz_data['avg_confidence'])
-                )
-            )
-            
-            for answer in quiz_data['answers']:
-                if all(key in answer for key in ['question', 'answer', 'not_selected_answers', 'is_correct', 'confidence', 'is_generated']):
-                    cursor.execute(
-                        '''INSERT INTO quiz_answers
-                           (quiz_id, question, answer, not_selected_answers, is_correct, confidence, is_generated, question_type)
-                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                        (
-                            quiz_data['quiz_id'],
-                            answer['question'],
-                            str(answer['answer']),
-                            json.dumps(answer['not_selected_answers']),
-                            1 if answer['is_correct'] else 0,
-                            answer['confidence'],
-                            1 if answer.get('is_generated', True) else 0,
-                            'AI' if answer.get('is_generated', True) else 'Manual'
-                        )
-                    )
-            
-            db.commit()
-            return {"message": "Quiz submitted successfully", "quiz_id": quiz_data['quiz_id']}
+            with SAVE_SECONDS.time(path='direct'), db:
+                inserted = QuizModel.insert_quiz(db, quiz_data)
+            return QuizModel.result_message(quiz_data['quiz_id'], inserted)
             
         except sqlite3.Error as e:
-            db.rollback()
             raise Exception(f"Database error: {str(e)}")
     
+    @staticmethod
+    def insert_quiz(db, quiz_data):
+        """Insert one submission inside the caller's transaction, returns False if it already exists"""
+        cursor = db.execute(
+            '''INSERT INTO quiz_results (quiz_id, participant_name, score, avg_confidence)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(quiz_id) DO NOTHING''',
+            (
+                quiz_data['quiz_id'], 
+                quiz_data.get('participant_name', 'Anonymous'),
+                quiz_data['score'], 
+                float(quiz_data['avg_confidence'])
+            )
+        )
+        
+        if cursor.rowcount == 0:
+            return False
+        
+        rows = [
+            (
+                quiz_data['quiz_id'],
+                answer['question'],
+                str(answer['answer']),
+                json.dumps(answer['not_selected_answers']),
+                1 if answer['is_correct'] else 0,
+                answer['confidence'],
+                1 if answer.get('is_generated', True) else 0,
+                'AI' if answer.get('is_generated', True) else 'Manual'
+            )
+            for answer in quiz_data['answers']
+            if all(key in answer for key in QuizModel.ANSWER_FIELDS)
+        ]
+        
+        db.executemany(
+            '''INSERT INTO quiz_answers
+               (quiz_id, question, answer, not_selected_answers, is_correct, confidence, is_generated, question_type)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+            rows
+        )
+        
+        # The analytics are derived data, failing to update them must not lose the submission
+        db.execute("SAVEPOINT analytics")
+        try:
+            QuizModel._update_analytics(db, rows)
+            db.execute("RELEASE SAVEPOINT analytics")
+        except sqlite3.Error as e:
+            db.execute("ROLLBACK TO SAVEPOINT analytics")
+            db.execute("RELEASE SAVEPOINT analytics")
+            logger.error(f"Analytics update failed for quiz {quiz_data['quiz_id']}, submission kept: {e}")
+        return True
+    
+    @staticmethod
+    def confidence_bucket(confidence):
+        """Integer confidence bucket, rounded half up like SQLite's ROUND; 0 for missing or unparseable values"""
+        try:
+            return int(math.floor(float(confidence) + 0.5))
+        except (TypeError, ValueError, OverflowError):
+            return 0
+    
+    @staticmethod
+    def _update_analytics(db, rows):
+        per_question = Counter()
+        per_question_correct = Counter()
+        for _, question, _, _, is_correct, confidence, _, question_type in rows:
+            key = (question, question_type, QuizModel.confidence_bucket(confidence))
+            per_question[key] += 1
+            per_question_correct[key] += is_correct
+        
+        per_type = Counter()
+        per_type_correct = Counter()
+        for (question, question_type, confidence), count in per_question.items():
+            per_type[(question_type, confidence)] += count
+            per_type_correct[(question_type, confidence)] += per_question_correct[(question, question_type, confidence)]
+        
+        db.executemany(
+            '''INSERT INTO analytics_question (question, question_type, confidence, answers, correct)
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(question, question_type, confidence) DO UPDATE SET
+                   answers = answers + excluded.answers,
+                   correct = correct + excluded.correct''',
+            [(*key, count, per_question_correct[key]) for key, count in per_question.items()]
+        )
+        db.executemany(
+            '''INSERT INTO analytics_type (question_type, confidence, answers, correct)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(question_type, confidence) DO UPDATE SET
+                   answers = answers + excluded.answers,
+                   correct = correct + excluded.correct''',
+            [(*key, count, per_type_correct[key]) for key, count in per_type.items()]
+        )
+    
+    @staticmethod
+    def result_message(quiz_id, inserted):
+        if not inserted:
+            return {"message": "Quiz already submitted", "quiz_id": quiz_id}
+        return {"message": "Quiz submitted successfully", "quiz_id": quiz_id}
+    
     @staticmethod
     def get_quiz_results(quiz_id):
         db = get_db()
@@ -0,0 +1,92 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from models.database import connect
+from models.quiz import QuizModel
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """Groups concurrent quiz submissions into one SQLite transaction (group commit)
+
+    Callers get a Future that resolves once the transaction containing their
+    submission has been committed, so a successful response still means durable.
+    """
+
+    def __init__(self, db_path, max_batch=200, max_delay_ms=20):
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000.0
+        self._pid = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started lazily so a queue created before gunicorn forks gets its thread in each worker
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._pending = deque()
+                self._cond = threading.Condition()
+            elif self._thread.is_alive():
+                return
+            else:
+                logger.error("Write-behind thread died, restarting it")
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, quiz_data) -> Future:
+        self._ensure_started()
+        future = Future()
+        with self._cond:
+            self._pending.append((quiz_data, future))
+            self._cond.notify()
+        return future
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            deadline = time.monotonic() + self.max_delay
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            return [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+
+    def _run(self):
+        db = connect(self.db_path)
+        while True:
+            batch = self._take_batch()
+            try:
+                with db:
+                    results = [QuizModel.insert_quiz(db, quiz_data) for quiz_data, _ in batch]
+            except Exception as e:
+                logger.warning(f"Group commit of {len(batch)} submissions failed, retrying one by one: {e}")
+                self._commit_individually(db, batch)
+                continue
+
+            for (quiz_data, future), inserted in zip(batch, results):
+                future.set_result(QuizModel.result_message(quiz_data['quiz_id'], inserted))
+            logger.info(f"Committed {len(batch)} quiz submissions in one transaction")
+
+    def _commit_individually(self, db, batch):
+        for quiz_data, future in batch:
+            try:
+                with db:
+                    inserted = QuizModel.insert_quiz(db, quiz_data)
+                future.set_result(QuizModel.result_message(quiz_data['quiz_id'], inserted))
+            except sqlite3.Error as e:
+                future.set_exception(Exception(f"Database error: {str(e)}"))
+            except Exception as e:
+                future.set_exception(e)
@@ -1,6 +1,10 @@
 from .quiz_routes import register_quiz_routes
+from .analytics_routes import register_analytics_routes
+from .export_routes import register_export_routes
 
 def register_routes(app):
     register_quiz_routes(app)
+    register_analytics_routes(app)
+    register_export_routes(app)
 
 __all__ = ['register_routes']
\ No newline at end of file
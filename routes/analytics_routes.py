@@ -0,0 +1,39 @@
+from flask import Flask, request, jsonify
+import logging
+from models.analytics import AnalyticsModel
+
+logger = logging.getLogger(__name__)
+
+def register_analytics_routes(app: Flask):
+
+    @app.route('/analytics', methods=['GET'])
+    def analytics_summary():
+        """Accuracy and confidence calibration per question type"""
+        try:
+            return jsonify({
+                "status": "success",
+                "question_types": AnalyticsModel.get_type_summary()
+            })
+        except Exception as e:
+            logger.error(f"Error reading analytics: {str(e)}")
+            return jsonify({
+                "status": "error",
+                "message": "Failed to read analytics"
+            }), 500
+
+    @app.route('/analytics/questions', methods=['GET'])
+    def analytics_questions():
+        """Per-question accuracy and calibration, optionally filtered by ?question_type=AI|Manual"""
+        try:
+            questions = AnalyticsModel.get_question_stats(request.args.get('question_type'))
+            return jsonify({
+                "status": "success",
+                "total": len(questions),
+                "questions": questions
+            })
+        except Exception as e:
+            logger.error(f"Error reading question analytics: {str(e)}")
+            return jsonify({
+                "status": "error",
+                "message": "Failed to read question analytics"
+            }), 500
@@ -0,0 +1,70 @@
+from flask import Flask, Response, request, jsonify, stream_with_context
+import hmac
+import logging
+from services.export_service import stream_export, FORMATTERS, CONTENT_TYPES
+
+logger = logging.getLogger(__name__)
+
+def register_export_routes(app: Flask):
+
+    def authorized() -> bool:
+        token = app.config.get('EXPORT_TOKEN')
+        if not token:
+            return False
+        provided = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        return hmac.compare_digest(provided, token)
+
+    @app.route('/export', methods=['GET'])
+    def export_results():
+        """Stream results joined with answers as ?format=ndjson|csv|parquet
+
+        Filters: since, until (quiz timestamp), question_type, after_id (resume cursor).
+        """
+        if not authorized():
+            return jsonify({
+                "status": "error",
+                "message": "Export requires a valid EXPORT_TOKEN"
+            }), 403
+
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in FORMATTERS:
+            return jsonify({
+                "status": "error",
+                "message": f"Unknown format '{export_format}', expected one of {sorted(FORMATTERS)}"
+            }), 400
+
+        try:
+            after_id = int(request.args.get('after_id', 0))
+        except ValueError:
+            return jsonify({
+                "status": "error",
+                "message": "after_id must be an integer"
+            }), 400
+
+        try:
+            chunks = stream_export(
+                app.config['DB_PATH'],
+                export_format,
+                since=request.args.get('since'),
+                until=request.args.get('until'),
+                question_type=request.args.get('question_type'),
+                after_id=after_id,
+                chunk_size=app.config.get('EXPORT_CHUNK_SIZE', 1000)
+            )
+            # Start the generator so a missing optional dependency fails before the response starts
+            first = next(chunks)
+        except Exception as e:
+            logger.error(f"Error starting export: {str(e)}")
+            return jsonify({
+                "status": "error",
+                "message": f"Failed to start export: {str(e)}"
+            }), 500
+
+        def generate():
+            yield first
+            yield from chunks
+
+        response = Response(stream_with_context(generate()), mimetype=CONTENT_TYPES[export_format])
+        response.headers['Content-Disposition'] = f'attachment; filename=quiz_results.{export_format}'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
@@ -1,11 +1,16 @@
-from flask import Flask, request, jsonify, session, current_app as app
+from flask import Flask, Response, request, jsonify, session, stream_with_context, current_app as app
 from dotenv import load_dotenv
 import uuid
 import json
 import logging
 import random
-from services.distractor_service import DistractorGenerator
+from services.generator_provider import GeneratorProvider
 from services.quiz_service import QuizService
+from services.session_store import create_session_store
+from services.decoding_profiles import get_profile
+from services.deadline_generation import Deadline, DeadlineGenerator
+from utils.error_handlers import QuizError, handle_quiz_error
+from utils import metrics
 
 load_dotenv()
 
@@ -13,21 +18,50 @@ logger = logging.getLogger(__name__)
 
 def register_quiz_routes(app: Flask):
     
-    quiz_service = QuizService()
-    distractor_generator = None
+    quiz_service = QuizService(session_store=create_session_store(app.config))
+    generator_provider = app.extensions.setdefault('generator_provider', GeneratorProvider(app.config))
+    
+    # A shared SQLite store looks the same from every worker, per-process memory stores add up
+    session_store_size = metrics.gauge(
+        'quiz_session_store_size', 'Generated quizzes waiting for submission', ['backend'],
+        mode='max' if quiz_service.session_store.backend == 'sqlite' else 'sum'
+    )
+    metrics.REGISTRY.on_collect(
+        lambda: session_store_size.set(len(quiz_service.session_store), backend=quiz_service.session_store.backend)
+    )
     
     def get_distractor_generator():
         """Lazy load distractor generator"""
-        nonlocal distractor_generator
-        if distractor_generator is None:
-            try:
-                distractor_generator = DistractorGenerator()
-                logger.info("Distractor generator initialized successfully")
-            except Exception as e:
-                logger.error(f"Failed to initialize distractor generator: {e}")
-                raise
-        return distractor_generator
+        return generator_provider.get()
     
+    @app.route('/inference_stats', methods=['GET'])
+    def inference_stats():
+        """Queue depth and batch-size statistics of the generation scheduler"""
+        distractor_generator = generator_provider.generator
+        if distractor_generator is None or not hasattr(distractor_generator, 'stats'):
+            return jsonify({"status": "success", "stats": None})
+        
+        try:
+            return jsonify({"status": "success", "stats": distractor_generator.stats()})
+        except Exception as e:
+            logger.error(f"Error reading inference stats: {str(e)}")
+            return jsonify({
+                "status": "error",
+                "message": "Failed to read inference stats"
+            }), 500
+
+    @app.route('/session_stats', methods=['GET'])
+    def session_stats():
+        """Size, hit/miss and expiry/eviction counters of the quiz session store"""
+        try:
+            return jsonify({"status": "success", "stats": quiz_service.session_store.stats()})
+        except Exception as e:
+            logger.error(f"Error reading session stats: {str(e)}")
+            return jsonify({
+                "status": "error",
+                "message": "Failed to read session stats"
+            }), 500
+
     @app.route('/start_quiz', methods=['POST'])
     def start_quiz():
         try:
@@ -52,105 +86,106 @@ def register_quiz_routes(app: Flask):
                 "message": "Failed to start quiz"
             }), 500
 
+    def select_quiz_questions():
+        """Pick 10 questions for AI generation, 10 with manual distractors and spares of both kinds"""
+        counts = quiz_service.question_counts()
+        logger.info(f"Question bank: generated={counts['generated']}, manual={counts['manual']}")
+        
+        if not counts['generated'] and not counts['manual']:
+            logger.error("No questions found in data files")
+            raise QuizError("No questions available")
+        
+        # Ensure exactly 10 of each type for consistent evaluation
+        if counts['generated'] < 10:
+            logger.error(f"Need at least 10 questions for AI generation, found {counts['generated']}")
+            raise QuizError("Insufficient questions for AI generation")
+            
+        if counts['manual'] < 10:
+            logger.error(f"Need at least 10 manual questions, found {counts['manual']}")
+            raise QuizError("Insufficient manual questions")
+        
+        # Select exactly 10 of each type, spares replace AI questions that cannot be generated in time
+        num_spares = min(app.config.get('SPARE_QUESTIONS', 0), counts['generated'] - 10)
+        sampled = quiz_service.sample_questions('generated', 10 + num_spares)
+        questions_for_ai, spare_questions = sampled[:10], sampled[10:]
+        # Manual spares are the last resort for AI questions that cannot be served at all
+        num_manual_spares = min(app.config.get('SPARE_QUESTIONS', 0), counts['manual'] - 10)
+        sampled = quiz_service.sample_questions('manual', 10 + num_manual_spares)
+        questions_with_manual, manual_spares = sampled[:10], sampled[10:]
+        
+        logger.info("Selected exactly 10 questions for AI generation and 10 with manual distractors")
+        
+        return questions_for_ai, questions_with_manual, (spare_questions, manual_spares)
+    
+    def load_generator():
+        try:
+            return get_distractor_generator()
+        except Exception as e:
+            logger.error(f"Failed to get distractor generator: {e}")
+            raise QuizError("Model initialization failed")
+    
+    def requested_profile():
+        """Decoding profile from the request body, falls back to the deployment's DECODING_PROFILE"""
+        data = request.get_json(silent=True) or {}
+        try:
+            return get_profile(data.get('profile') or app.config.get('DECODING_PROFILE')).name
+        except ValueError as e:
+            raise QuizError(str(e), status_code=400)
+    
+    def deadline_generator(generator, profile, spares):
+        """Bounds generation for one quiz by MODEL_TIMEOUT and QUESTION_TIMEOUT, with fallbacks"""
+        spare_questions, manual_spares = spares
+        return DeadlineGenerator(
+            generator,
+            Deadline(app.config.get('MODEL_TIMEOUT', 60)),
+            profile,
+            fallback_profile=app.config.get('FALLBACK_PROFILE'),
+            question_timeout=app.config.get('QUESTION_TIMEOUT'),
+            spares=spare_questions,
+            manual_spares=manual_spares
+        )
+    
+    def build_quiz_question(question, distractors, is_generated):
+        return {
+            'question': question.question,
+            'question_de': question.question_de,
+            'correct_answer': question.answer,
+            'distractors': list(distractors),
+            'is_generated': is_generated
+        }
+    
+    def check_distractors(distractors, index):
+        if not distractors or len(distractors) < 3:
+            logger.error(f"Failed to generate sufficient distractors for question {index + 1}")
+            raise QuizError(f"Model failed to generate distractors for question {index + 1}")
+        
+        logger.info(f"Successfully generated {len(distractors)} distractors for AI question {index + 1}")
+    
     @app.route('/get_all_questions', methods=['POST'])
     def get_all_questions():
         try:
             logger.info("Starting get_all_questions endpoint")
             
-            questions_data = quiz_service.load_questions()
-            logger.info(f"Loaded questions data: generated={len(questions_data['generated'])}, manual={len(questions_data['manual'])}")
-            
-            if not questions_data['generated'] and not questions_data['manual']:
-                logger.error("No questions found in data files")
-                return jsonify({
-                    "status": "error",
-                    "message": "No questions available"
-                }), 500
-            
-            # Ensure exactly 10 of each type for consistent evaluation
-            if len(questions_data['generated']) < 10:
-                logger.error(f"Need at least 10 questions for AI generation, found {len(questions_data['generated'])}")
-                return jsonify({
-                    "status": "error",
-                    "message": "Insufficient questions for AI generation"
-                }), 500
-                
-            if len(questions_data['manual']) < 10:
-                logger.error(f"Need at least 10 manual questions, found {len(questions_data['manual'])}")
-                return jsonify({
-                    "status": "error",
-                    "message": "Insufficient manual questions"
-                }), 500
-            
-            # Select exactly 10 of each type
-            questions_for_ai = random.sample(questions_data['generated'], 10)
-            questions_with_manual = random.sample(questions_data['manual'], 10)
-            
-            logger.info("Selected exactly 10 questions for AI generation and 10 with manual distractors")
-            
-            try:
-                generator = get_distractor_generator()
-            except Exception as e:
-                logger.error(f"Failed to get distractor generator: {e}")
-                return jsonify({
-                    "status": "error",
-                    "message": "Model initialization failed"
-                }), 500
-            
-            quiz_data = []
+            profile = requested_profile()
+            questions_for_ai, questions_with_manual, spares = select_quiz_questions()
+            generator = deadline_generator(load_generator(), profile, spares)
             
             # Add manual questions first
-            for question in questions_with_manual:
-                quiz_data.append({
-                    'question': question['question'],
-                    'question_de': question.get('translation', {}).get('de', ''),
-                    'correct_answer': question['answer'],
-                    'distractors': question['distractors'],
-                    'is_generated': False
-                })
-            
-            # Generate AI distractors for exactly 10 questions
+            quiz_data = [build_quiz_question(question, question.distractors, False) for question in questions_with_manual]
+            
+            # Generate AI distractors for exactly 10 questions in batched decoding passes
             logger.info("Generating AI distractors for 10 questions...")
-            for i, question in enumerate(questions_for_ai):
-                logger.info(f"Processing AI question {i+1}/10: {question['question'][:50]}...")
-                
-                try:
-                    distractors = generator.generate_distractors(
-                        question['question'], 
-                        question['answer']
-                    )
-                    
-                    if not distractors or len(distractors) < 3:
-                        logger.error(f"Failed to generate sufficient distractors for question {i+1}")
-                        return jsonify({
-                            "status": "error",
-                            "message": f"Model failed to generate distractors for question {i+1}"
-                        }), 500
-                    
-                    quiz_data.append({
-                        'question': question['question'],
-                        'question_de': question.get('translation', {}).get('de', ''),
-                        'correct_answer': question['answer'],
-                        'distractors': distractors,
-                        'is_generated': True
-                    })
-                    
-                    logger.info(f"Successfully generated {len(distractors)} distractors for AI question {i+1}")
-                    
-                except Exception as e:
-                    logger.error(f"Failed to generate distractors for question {i+1}: {e}")
-                    return jsonify({
-                        "status": "error",
-                        "message": f"Model generation failed for question {i+1}"
-                    }), 500
+            generated = generator.generate(questions_for_ai)
+            logger.info(f"Distractor sources: {dict(generator.sources)}")
+            
+            for i, (question, distractors) in enumerate(generated):
+                check_distractors(distractors, i)
+                quiz_data.append(build_quiz_question(question, distractors, not generator.is_manual(question)))
             
             # Verify we have exactly 20 questions (10 AI + 10 manual)
             if len(quiz_data) != 20:
                 logger.error(f"Expected 20 questions, got {len(quiz_data)}")
-                return jsonify({
-                    "status": "error",
-                    "message": "Failed to generate complete question set"
-                }), 500
+                raise QuizError("Failed to generate complete question set")
             
             random.shuffle(quiz_data)
             
@@ -160,18 +195,23 @@ def register_quiz_routes(app: Flask):
             session['quiz_id'] = quiz_id
             session.modified = True
             
-            logger.info("Successfully created quiz with exactly 10 AI-generated and 10 manual questions")
+            # Fewer than 10 if AI questions had to be swapped for manual ones
+            generated_count = sum(1 for item in quiz_data if item['is_generated'])
+            logger.info(f"Successfully created quiz with {generated_count} AI-generated and {20 - generated_count} manual questions")
             
             return jsonify({
                 "status": "success", 
-                "message": "Quiz generated with 10 AI + 10 manual questions", 
+                "message": f"Quiz generated with {generated_count} AI + {20 - generated_count} manual questions", 
                 "quiz_id": quiz_id,
                 "questions": quiz_data,
                 "total_questions": 20,
-                "generated_questions": 10,
-                "manual_questions": 10
+                "generated_questions": generated_count,
+                "manual_questions": 20 - generated_count,
+                "distractor_sources": dict(generator.sources)
             })
             
+        except QuizError as e:
+            return handle_quiz_error(e)
         except Exception as e:
             logger.error(f"Error in get_all_questions: {str(e)}")
             return jsonify({
@@ -179,6 +219,80 @@ def register_quiz_routes(app: Flask):
                 "message": f"Failed to generate questions: {str(e)}"
             }), 500
 
+    @app.route('/stream_questions', methods=['POST'])
+    def stream_questions():
+        """Stream quiz questions as NDJSON with their quiz position: manual questions at once, AI questions as they are generated"""
+        try:
+            logger.info("Starting stream_questions endpoint")
+            
+            profile = requested_profile()
+            questions_for_ai, questions_with_manual, spares = select_quiz_questions()
+            generator = deadline_generator(load_generator(), profile, spares)
+        except QuizError as e:
+            return handle_quiz_error(e)
+        except Exception as e:
+            logger.error(f"Error in stream_questions: {str(e)}")
+            return jsonify({
+                "status": "error",
+                "message": f"Failed to generate questions: {str(e)}"
+            }), 500
+        
+        quiz_id = str(uuid.uuid4())
+        
+        # The session cookie goes out with the response headers, before the body is streamed
+        session['quiz_id'] = quiz_id
+        session.modified = True
+        
+        def event(payload):
+            return json.dumps(payload) + "\n"
+        
+        def generate():
+            yield event({"type": "start", "quiz_id": quiz_id, "total_questions": 20})
+            
+            # Random positions for both conditions, so neither the order nor the arrival of questions
+            # tells manual and AI questions apart. The client places each question at its position.
+            positions = random.sample(range(20), 20)
+            manual_positions, ai_positions = positions[:10], positions[10:]
+            quiz_data = [None] * 20
+            
+            for question, position in zip(questions_with_manual, manual_positions):
+                quiz_data[position] = build_quiz_question(question, question.distractors, False)
+                yield event({"type": "question", "position": position, "question": quiz_data[position]})
+            
+            # All AI questions are submitted at once, each is streamed as soon as it is resolved
+            concurrent = app.config.get('BATCHING_ENABLED') or app.config.get('INFERENCE_MODE') == 'server'
+            try:
+                for i, question, distractors in generator.generate_as_completed(questions_for_ai, concurrent):
+                    check_distractors(distractors, i)
+                    position = ai_positions[i]
+                    quiz_data[position] = build_quiz_question(question, distractors, not generator.is_manual(question))
+                    yield event({"type": "question", "position": position, "question": quiz_data[position]})
+            except Exception as e:
+                logger.error(f"Failed to stream AI questions: {e}")
+                message = e.message if isinstance(e, QuizError) else "Model generation failed"
+                yield event({"type": "error", "message": message})
+                return
+            
+            quiz_service.store_quiz_data(quiz_id, quiz_data)
+            
+            generated_count = sum(1 for item in quiz_data if item['is_generated'])
+            logger.info(f"Streamed quiz {quiz_id} with {generated_count} AI-generated and {20 - generated_count} manual questions")
+            
+            yield event({
+                "type": "complete",
+                "quiz_id": quiz_id,
+                "total_questions": len(quiz_data),
+                "generated_questions": generated_count,
+                "manual_questions": 20 - generated_count,
+                "distractor_sources": dict(generator.sources)
+            })
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/x-ndjson',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
     @app.route('/submit_quiz', methods=['POST'])
     def submit_quiz():
         """Submit completed quiz answers"""
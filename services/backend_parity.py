@@ -0,0 +1,110 @@
+"""Compare distractors generated by different inference backends on the question bank
+
+    python -m services.backend_parity --backends torch torch-int8 onnx --output parity.json
+
+Decoding is run without sampling so differences come from the backends alone.
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import resource
+import multiprocessing
+from typing import Dict, List
+
+from services.distractor_service import DistractorGenerator
+
+logger = logging.getLogger(__name__)
+
+
+def _overlap(a: List[str], b: List[str]) -> float:
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def run_backend(backend: str, model_path: str, items: List[tuple], batch_size: int) -> Dict:
+    started = time.perf_counter()
+    generator = DistractorGenerator(model_path, batch_size=batch_size, backend=backend)
+    load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    outputs = generator.generate_distractors_batch(items, do_sample=False)
+    generate_seconds = time.perf_counter() - started
+
+    return {
+        'backend': backend,
+        'load_seconds': load_seconds,
+        'generate_seconds': generate_seconds,
+        'seconds_per_question': generate_seconds / len(items),
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'outputs': outputs
+    }
+
+
+def compare(runs: List[Dict], items: List[tuple]) -> Dict:
+    reference = runs[0]
+    report = {'reference': reference['backend'], 'questions': len(items), 'backends': {}}
+
+    for run in runs:
+        pairs = list(zip(reference['outputs'], run['outputs']))
+        report['backends'][run['backend']] = {
+            'exact_match_rate': sum(set(ref) == set(out) for ref, out in pairs) / len(pairs),
+            'mean_overlap': sum(_overlap(ref, out) for ref, out in pairs) / len(pairs),
+            'complete_rate': sum(len(out) >= 3 for out in run['outputs']) / len(pairs),
+            'load_seconds': run['load_seconds'],
+            'seconds_per_question': run['seconds_per_question'],
+            'max_rss_mb': run['max_rss_mb']
+        }
+
+    report['examples'] = [
+        {
+            'question': question,
+            'answer': answer,
+            'distractors': {run['backend']: run['outputs'][i] for run in runs}
+        }
+        for i, (question, answer) in enumerate(items)
+    ]
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check distractor parity across inference backends')
+    parser.add_argument('--backends', nargs='+', default=['torch', 'torch-int8', 'onnx'],
+                        help='Backends to compare, the first one is the reference')
+    parser.add_argument('--model-path', default=os.environ.get('MODEL_PATH', './downloaded_model'))
+    parser.add_argument('--questions', default='quiz_results/arithmetik_questions.json')
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--output', default=None, help='Write the full report as JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with open(args.questions, 'r', encoding='utf-8') as f:
+        questions = json.load(f)[:args.limit]
+    items = [(q['question'], q['answer']) for q in questions]
+
+    # Each backend runs in its own process so load time and peak memory are measured in isolation
+    ctx = multiprocessing.get_context('spawn')
+    runs = []
+    for backend in args.backends:
+        with ctx.Pool(1) as pool:
+            runs.append(pool.apply(run_backend, (backend, args.model_path, items, args.batch_size)))
+    report = compare(runs, items)
+
+    for backend, summary in report['backends'].items():
+        print(f"{backend:12s} exact={summary['exact_match_rate']:.2f} overlap={summary['mean_overlap']:.2f} "
+              f"complete={summary['complete_rate']:.2f} {1000 * summary['seconds_per_question']:.0f} ms/question "
+              f"rss={summary['max_rss_mb']:.0f} MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
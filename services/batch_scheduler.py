@@ -0,0 +1,185 @@
+import os
+import time
+import logging
+import threading
+from collections import deque, Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingRequest:
+    __slots__ = ('item', 'options', 'future', 'enqueued_at')
+
+    def __init__(self, item: Tuple[str, str], options: Tuple, future: Future):
+        self.item = item
+        self.options = options
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class BatchScheduler:
+    """Collects concurrent generation requests and runs them as one batched generate call
+
+    A batch is dispatched once max_batch_size requests are pending or the oldest
+    request has waited max_wait_ms, whichever comes first. Only requests with the
+    same decoding options are batched together.
+    """
+
+    def __init__(self, generator, max_batch_size: int = 16, max_wait_ms: float = 20):
+        self.generator = generator
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._start()
+
+    def _start(self):
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._max_batch = 0
+        self._batch_sizes = Counter()
+        self._wait_seconds = 0.0
+        self._generate_seconds = 0.0
+        self._timeouts = 0
+
+        self._worker = threading.Thread(target=self._run, name='batch-scheduler', daemon=True)
+        self._worker.start()
+        self._pid = os.getpid()
+
+    def _ensure_started(self):
+        # Threads do not survive fork, e.g. when the scheduler was built in a preloading gunicorn master
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._start()
+
+    def __getattr__(self, name):
+        return getattr(self.generator, name)
+
+    def generate_distractors(self, question: str, answer: str, num_distractors: int = 3,
+                             max_length: Optional[int] = None, profile: Optional[str] = None) -> List[str]:
+        return self.generate_distractors_batch(
+            [(question, answer)],
+            num_distractors=num_distractors,
+            max_length=max_length,
+            profile=profile
+        )[0]
+
+    def generate_distractors_batch(self, items: Sequence[Tuple[str, str]], timeout: Optional[float] = None,
+                                   **kwargs) -> List[List[str]]:
+        """Queue the items for batched generation, items still pending after timeout get no distractors"""
+        self._ensure_started()
+        kwargs.pop('batch_size', None)
+        # Unset options are left to the generator's defaults, so they do not split batches
+        options = tuple(sorted((name, value) for name, value in kwargs.items() if value is not None))
+        futures = []
+
+        with self._cond:
+            for item in items:
+                future = Future()
+                self._queue.append(_PendingRequest(tuple(item), options, future))
+                futures.append(future)
+            self._cond.notify()
+
+        if timeout is None:
+            return [future.result() for future in futures]
+
+        deadline = time.monotonic() + timeout
+        results, timed_out = [], 0
+        for future in futures:
+            try:
+                results.append(future.result(max(0.0, deadline - time.monotonic())))
+            except FutureTimeoutError:
+                # Requests not yet taken into a batch are dropped, running ones finish unobserved
+                future.cancel()
+                results.append([])
+                timed_out += 1
+        if timed_out:
+            logger.warning(f"{timed_out} of {len(futures)} generation requests timed out after {timeout:.1f}s")
+            with self._stats_lock:
+                self._timeouts += timed_out
+        return results
+
+    def _take_batch(self) -> List[_PendingRequest]:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+
+            # Wait for the batch to fill up, but never longer than max_wait after the oldest request
+            deadline = self._queue[0].enqueued_at + self.max_wait
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            options = self._queue[0].options
+            batch, rest = [], deque()
+            while self._queue:
+                request = self._queue.popleft()
+                if request.options == options and len(batch) < self.max_batch_size:
+                    # Skips requests whose caller gave up, the rest can no longer be cancelled
+                    if request.future.set_running_or_notify_cancel():
+                        batch.append(request)
+                else:
+                    rest.append(request)
+            self._queue.extendleft(reversed(rest))
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                continue
+            started = time.monotonic()
+
+            try:
+                results = self.generator.generate_distractors_batch(
+                    [request.item for request in batch],
+                    batch_size=len(batch),
+                    **dict(batch[0].options)
+                )
+            except Exception as e:
+                logger.error(f"Batched generation of {len(batch)} requests failed: {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                results = None
+            else:
+                for request, result in zip(batch, results):
+                    request.future.set_result(result)
+
+            finished = time.monotonic()
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._max_batch = max(self._max_batch, len(batch))
+                self._batch_sizes[len(batch)] += 1
+                self._wait_seconds += sum(started - request.enqueued_at for request in batch)
+                self._generate_seconds += finished - started
+
+            logger.info(f"Ran batch of {len(batch)} generation requests in {finished - started:.2f}s")
+
+    def stats(self) -> Dict:
+        with self._cond:
+            queue_depth = len(self._queue)
+
+        with self._stats_lock:
+            return {
+                'queue_depth': queue_depth,
+                'batches': self._batches,
+                'requests': self._requests,
+                'avg_batch_size': self._requests / self._batches if self._batches else 0.0,
+                'max_batch_size': self._max_batch,
+                'batch_size_counts': dict(sorted(self._batch_sizes.items())),
+                'avg_queue_wait_ms': 1000 * self._wait_seconds / self._requests if self._requests else 0.0,
+                'avg_batch_generate_ms': 1000 * self._generate_seconds / self._batches if self._batches else 0.0,
+                'timeouts': self._timeouts,
+                'max_batch_size_limit': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000
+            }
@@ -0,0 +1,187 @@
+import time
+import logging
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from services.numeric_distractors import numeric_distractors
+from services.question_bank import Question
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class DeadlineGenerator:
+    """Generates the AI distractors of one quiz within a time budget, falling back instead of failing
+
+    Questions without enough distractors from the requested profile are retried
+    with the cheaper fallback profile, then served from any cached variant, then
+    replaced by a spare question that can be served that way (spare_reserve of
+    the budget is kept for it). Questions still short get rule-based numeric
+    distractors, and as a last resort are swapped for a question with manual
+    distractors, which needs no generation at all.
+    """
+
+    def __init__(self, generator, deadline: Deadline, profile: str, fallback_profile: Optional[str] = None,
+                 question_timeout: Optional[float] = None, spares: Sequence[Question] = (),
+                 num_distractors: int = 3, fallback_reserve: float = 0.3,
+                 manual_spares: Sequence[Question] = (), spare_reserve: float = 0.2):
+        self.generator = generator
+        self.deadline = deadline
+        self.profile = profile
+        self.fallback_profile = fallback_profile if fallback_profile != profile else None
+        self.question_timeout = question_timeout
+        self.spares = deque(spares)
+        self.manual_spares = deque(manual_spares)
+        self._manual_questions = frozenset(manual_spares)
+        self.num_distractors = num_distractors
+        # Share of the remaining time the first attempt leaves for the fallbacks
+        self.fallback_reserve = fallback_reserve
+        # Share of the budget the attempts leave for spare questions, which would get no time otherwise
+        self.spare_reserve = spare_reserve
+        self.sources = Counter()
+        # generate() may run for several questions at once, see generate_as_completed
+        self._lock = threading.Lock()
+
+    def is_manual(self, question: Question) -> bool:
+        """True for a manual distractor question swapped in for an AI question"""
+        return question in self._manual_questions
+
+    def _complete(self, distractors) -> bool:
+        return bool(distractors) and len(distractors) >= self.num_distractors
+
+    def _generate(self, questions: List[Question], profile: str, timeout: float) -> List[List[str]]:
+        if timeout <= 0:
+            return [[] for _ in questions]
+        try:
+            return self.generator.generate_distractors_batch(
+                [(question.question, question.answer) for question in questions],
+                num_distractors=self.num_distractors,
+                profile=profile,
+                max_time=self.question_timeout,
+                timeout=timeout
+            )
+        except Exception as e:
+            logger.error(f"Generation with profile '{profile}' failed for {len(questions)} questions: {e}")
+            return [[] for _ in questions]
+
+    def _cached(self, question: Question) -> Optional[List[str]]:
+        lookup = getattr(self.generator, 'cached_variant', None)
+        if lookup is None:
+            return None
+        profiles = [profile for profile in (self.profile, self.fallback_profile) if profile]
+        return lookup(question.question, question.answer, self.num_distractors, profiles=profiles)
+
+    def _resolve(self, questions: List[Question], attempts: Sequence[Tuple[str, str]],
+                 reserve: float = 0.0) -> List[Optional[Tuple[List[str], str]]]:
+        results = [None] * len(questions)
+        pending = list(range(len(questions)))
+
+        for number, (profile, source) in enumerate(attempts):
+            if not pending:
+                break
+            remaining = self.deadline.remaining()
+            timeout = remaining * (1 - (self.fallback_reserve if number < len(attempts) - 1 else reserve))
+            outputs = self._generate([questions[i] for i in pending], profile, timeout)
+            for i, distractors in zip(pending, outputs):
+                if self._complete(distractors):
+                    results[i] = (distractors, source)
+            pending = [i for i in pending if results[i] is None]
+
+        for i in pending:
+            distractors = self._cached(questions[i])
+            if self._complete(distractors):
+                results[i] = (distractors, 'pool')
+
+        return results
+
+    def generate(self, questions: Sequence[Question]) -> List[Tuple[Question, List[str]]]:
+        """Distractors per question, questions that could not be served come back with an empty list"""
+        questions = list(questions)
+        attempts = [(self.profile, 'model')]
+        if self.fallback_profile:
+            attempts.append((self.fallback_profile, 'fallback_profile'))
+
+        resolved = self._resolve(questions, attempts, self.spare_reserve if self.spares else 0.0)
+        output = []
+        for question, result in zip(questions, resolved):
+            output.append((question, result[0] if result else []))
+
+        with self._lock:
+            for result in resolved:
+                if result:
+                    self.sources[result[1]] += 1
+
+        missing = [i for i, result in enumerate(resolved) if result is None]
+        if missing and self.spares:
+            with self._lock:
+                spares = [self.spares.popleft() for _ in range(min(len(missing), len(self.spares)))]
+            spare_attempts = [(self.fallback_profile or self.profile, 'swapped')]
+            served = [(spare, result[0]) for spare, result in zip(spares, self._resolve(spares, spare_attempts)) if result]
+            for i, (spare, distractors) in zip(missing, served):
+                logger.warning(f"Replaced question '{questions[i].question[:60]}' with a spare question")
+                output[i] = (spare, distractors)
+                with self._lock:
+                    self.sources['swapped'] += 1
+
+        # Fallbacks that need no model and cannot run out of time
+        for i, (question, distractors) in enumerate(output):
+            if self._complete(distractors):
+                continue
+            original = questions[i]
+            rules = numeric_distractors(original.answer, self.num_distractors, original.question)
+            if self._complete(rules):
+                output[i] = (original, rules)
+                source = 'rules'
+            else:
+                with self._lock:
+                    manual = self.manual_spares.popleft() if self.manual_spares else None
+                if manual is None:
+                    continue
+                logger.warning(f"Replaced question '{original.question[:60]}' with a manual distractor question")
+                output[i] = (manual, list(manual.distractors))
+                source = 'manual_swap'
+            with self._lock:
+                self.sources[source] += 1
+
+        unresolved = sum(1 for _, distractors in output if not self._complete(distractors))
+        if unresolved:
+            with self._lock:
+                self.sources['failed'] += unresolved
+        return output
+
+    def generate_as_completed(self, questions: Sequence[Question],
+                              concurrent: bool = True) -> Iterator[Tuple[int, Question, List[str]]]:
+        """(index, question, distractors) per question, in the order they are resolved
+
+        With concurrent every question is submitted at once on its own thread, so a
+        batching generator (BatchScheduler, inference server) decodes them in shared
+        batches and each result is yielded as soon as its batch is done. Without a
+        batching generator that would be one decode per question, so all questions
+        go through one batched generate() and are yielded when it returns.
+        """
+        questions = list(questions)
+        if not concurrent:
+            for index, (question, distractors) in enumerate(self.generate(questions)):
+                yield index, question, distractors
+            return
+
+        with ThreadPoolExecutor(max_workers=max(1, len(questions)), thread_name_prefix='quiz-generate') as pool:
+            futures = {pool.submit(self.generate, [question]): index for index, question in enumerate(questions)}
+            for future in as_completed(futures):
+                question, distractors = future.result()[0]
+                yield futures[future], question, distractors
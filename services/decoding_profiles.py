@@ -0,0 +1,59 @@
+from typing import NamedTuple, Optional
+
+DEFAULT_PROFILE = 'quality'
+
+
+class DecodingProfile(NamedTuple):
+    """generate() settings, sequences per input scale with the number of requested distractors"""
+    name: str
+    sequences_per_distractor: float
+    beam_search: bool
+    do_sample: bool
+    max_new_tokens: int
+    temperature: float = 0.8
+    top_p: float = 0.92
+    repetition_penalty: float = 1.2
+    no_repeat_ngram_size: int = 0
+
+    def num_sequences(self, num_distractors: int) -> int:
+        return max(1, round(num_distractors * self.sequences_per_distractor))
+
+    def generate_kwargs(self, num_distractors: int, max_new_tokens: Optional[int] = None,
+                        do_sample: Optional[bool] = None) -> dict:
+        num_sequences = self.num_sequences(num_distractors)
+        do_sample = self.do_sample if do_sample is None else do_sample
+        kwargs = {
+            'max_new_tokens': max_new_tokens or self.max_new_tokens,
+            'num_return_sequences': num_sequences,
+            'num_beams': num_sequences if self.beam_search else 1,
+            'do_sample': do_sample,
+            'repetition_penalty': self.repetition_penalty,
+        }
+        if do_sample:
+            kwargs['temperature'] = self.temperature
+            kwargs['top_p'] = self.top_p
+        if kwargs['num_beams'] > 1:
+            kwargs['early_stopping'] = True
+        if self.no_repeat_ngram_size:
+            kwargs['no_repeat_ngram_size'] = self.no_repeat_ngram_size
+        return kwargs
+
+
+PROFILES = {
+    # One greedy sequence, the model usually emits all distractors in it
+    'fast': DecodingProfile('fast', sequences_per_distractor=0, beam_search=False,
+                            do_sample=False, max_new_tokens=32),
+    # One sampled sequence per distractor, no beam search
+    'balanced': DecodingProfile('balanced', sequences_per_distractor=1, beam_search=False,
+                                do_sample=True, max_new_tokens=48, no_repeat_ngram_size=2),
+    # Beam search over two sampled sequences per distractor, the previous fixed settings
+    'quality': DecodingProfile('quality', sequences_per_distractor=2, beam_search=True,
+                               do_sample=True, max_new_tokens=100, no_repeat_ngram_size=2),
+}
+
+
+def get_profile(name: Optional[str] = None) -> DecodingProfile:
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown decoding profile '{name}', expected one of {sorted(PROFILES)}")
+    return PROFILES[name]
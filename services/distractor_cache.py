@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import random
+import hashlib
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from services.decoding_profiles import get_profile
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILES = ('config.json', 'generation_config.json', 'tokenizer_config.json', 'special_tokens_map.json')
+WEIGHT_SUFFIXES = ('.bin', '.safetensors', '.onnx')
+# Generation options that bound time or batching but do not change what a complete result looks like
+UNKEYED_OPTIONS = ('batch_size', 'max_time', 'timeout')
+
+
+def model_fingerprint(model_path: str) -> str:
+    """Stable identifier of a model directory, changes when config or weights change"""
+    digest = hashlib.sha256()
+    for name in MODEL_FILES:
+        path = os.path.join(model_path, name)
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                digest.update(name.encode('utf-8'))
+                digest.update(f.read())
+
+    if os.path.isdir(model_path):
+        for name in sorted(os.listdir(model_path)):
+            if name.endswith(WEIGHT_SUFFIXES):
+                stat = os.stat(os.path.join(model_path, name))
+                digest.update(f"{name}:{stat.st_size}:{int(stat.st_mtime)}".encode('utf-8'))
+
+    return digest.hexdigest()[:16]
+
+
+class DistractorCache:
+    """SQLite-backed store of generated distractor variants, shared by all workers"""
+
+    def __init__(self, db_path: str, max_variants: int = 3, ttl: int = 7 * 24 * 3600,
+                 max_entries: int = 10000, evict_every: int = 100):
+        self.db_path = db_path
+        self.max_variants = max_variants
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._writes = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS distractor_cache (
+                    cache_key TEXT NOT NULL,
+                    variant INTEGER NOT NULL,
+                    distractors TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (cache_key, variant)
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_distractor_cache_last_used
+                ON distractor_cache(last_used)
+            ''')
+
+    @staticmethod
+    def make_key(fingerprint: str, question: str, answer: str, params: Dict[str, Any]) -> str:
+        payload = json.dumps([fingerprint, question, answer, params], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, min_variants: Optional[int] = None) -> Optional[List[str]]:
+        """Return a random stored variant once the key holds min_variants (default max_variants) of them, else None"""
+        now = time.time()
+        try:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT variant, distractors FROM distractor_cache WHERE cache_key = ? AND created_at >= ?",
+                (key, now - self.ttl)
+            ).fetchall()
+
+            if not rows or len(rows) < (min_variants or self.max_variants):
+                return None
+
+            variant, distractors = random.choice(rows)
+            with conn:
+                conn.execute(
+                    "UPDATE distractor_cache SET last_used = ? WHERE cache_key = ? AND variant = ?",
+                    (now, key, variant)
+                )
+            return json.loads(distractors)
+        except sqlite3.Error as e:
+            logger.warning(f"Distractor cache lookup failed: {e}")
+            return None
+
+    def put(self, key: str, distractors: List[str]):
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                # Replace expired variants first, then fill free slots, then the least recently used one
+                conn.execute(
+                    "DELETE FROM distractor_cache WHERE cache_key = ? AND created_at < ?",
+                    (key, now - self.ttl)
+                )
+                used = {row[0]: row[1] for row in conn.execute(
+                    "SELECT variant, last_used FROM distractor_cache WHERE cache_key = ?", (key,)
+                )}
+                free = [v for v in range(self.max_variants) if v not in used]
+                variant = free[0] if free else min(used, key=used.get)
+                conn.execute(
+                    '''INSERT OR REPLACE INTO distractor_cache
+                       (cache_key, variant, distractors, created_at, last_used)
+                       VALUES (?, ?, ?, ?, ?)''',
+                    (key, variant, json.dumps(distractors, ensure_ascii=False), now, now)
+                )
+
+            self._writes += 1
+            if self._writes % self.evict_every == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            logger.warning(f"Distractor cache store failed: {e}")
+
+    def evict(self) -> int:
+        """Drop expired variants and the least recently used keys beyond max_entries"""
+        conn = self._connect()
+        with conn:
+            expired = conn.execute(
+                "DELETE FROM distractor_cache WHERE created_at < ?",
+                (time.time() - self.ttl,)
+            ).rowcount
+            overflow = conn.execute('''
+                DELETE FROM distractor_cache WHERE cache_key IN (
+                    SELECT cache_key FROM distractor_cache
+                    GROUP BY cache_key
+                    ORDER BY MAX(last_used) DESC
+                    LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,)).rowcount
+
+        if expired or overflow:
+            logger.info(f"Evicted {expired} expired and {overflow} LRU distractor cache rows")
+        return expired + overflow
+
+
+class CachedDistractorGenerator:
+    """Serves generate_distractors calls from DistractorCache, falling back to the wrapped generator"""
+
+    def __init__(self, generator, cache: DistractorCache, fingerprint: Optional[str] = None,
+                 default_profile: Optional[str] = None):
+        self.generator = generator
+        self.cache = cache
+        self._fingerprint = fingerprint
+        # Requests without a profile are keyed under the deployment default, so changing it does not serve stale variants
+        self.default_profile = default_profile or get_profile(os.environ.get('DECODING_PROFILE')).name
+
+    def __getattr__(self, name):
+        return getattr(self.generator, name)
+
+    @property
+    def fingerprint(self) -> str:
+        # Resolved on first use, a remote generator needs a round trip to the inference server for it
+        if self._fingerprint is None:
+            self._fingerprint = getattr(self.generator, 'fingerprint', None) or model_fingerprint(self.generator.model_path)
+        return self._fingerprint
+
+    def _key(self, question: str, answer: str, num_distractors: int, max_length: Optional[int], **kwargs) -> str:
+        params = {'num_distractors': num_distractors, 'max_length': max_length}
+        params.update((name, value) for name, value in kwargs.items() if name not in UNKEYED_OPTIONS and value is not None)
+        return self.cache.make_key(self.fingerprint, question, answer, params)
+
+    def cached_variant(self, question: str, answer: str, num_distractors: int = 3,
+                       profiles: Sequence[str] = ()) -> Optional[List[str]]:
+        """Any stored variant for the question under one of the profiles, used as a fallback when generation fails"""
+        for profile in profiles or (self.default_profile,):
+            distractors = self.cache.get(self._key(question, answer, num_distractors, None, profile=profile), min_variants=1)
+            if distractors and len(distractors) >= num_distractors:
+                return distractors
+        return None
+
+    def generate_distractors(self, question: str, answer: str, num_distractors: int = 3,
+                             max_length: Optional[int] = None, profile: Optional[str] = None) -> List[str]:
+        return self.generate_distractors_batch(
+            [(question, answer)],
+            num_distractors=num_distractors,
+            max_length=max_length,
+            profile=profile
+        )[0]
+
+    def generate_distractors_batch(self, items: Sequence[Tuple[str, str]], num_distractors: int = 3,
+                                   max_length: Optional[int] = None, profile: Optional[str] = None,
+                                   **kwargs) -> List[List[str]]:
+        items = list(items)
+        kwargs['profile'] = profile or self.default_profile
+        keys = [self._key(question, answer, num_distractors, max_length, **kwargs) for question, answer in items]
+        results = [self.cache.get(key) for key in keys]
+
+        misses = [i for i, result in enumerate(results) if result is None]
+        logger.info(f"Distractor cache: {len(items) - len(misses)} hits, {len(misses)} misses")
+
+        if misses:
+            generated = self.generator.generate_distractors_batch(
+                [items[i] for i in misses],
+                num_distractors=num_distractors,
+                max_length=max_length,
+                **kwargs
+            )
+            for i, distractors in zip(misses, generated):
+                results[i] = distractors
+                if distractors and len(distractors) >= num_distractors:
+                    self.cache.put(keys[i], distractors)
+
+        return results
@@ -1,31 +1,66 @@
 import os
+import time
 import logging
-import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 import re
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
 import gc
+from services.distractor_cache import model_fingerprint
+from services.inference_backends import get_backend
+from services.decoding_profiles import get_profile
+from services.numeric_distractors import numeric_distractors
+from utils import metrics
+from utils.profiling import profile_generate
+
+# torch is imported when a generator is created, importing this module stays cheap for the web tier
+if TYPE_CHECKING:
+    import torch
 
 logger = logging.getLogger(__name__)
 
+# off: model only, topup: fill model output with rule-based numeric distractors,
+# rules_first: use the rules alone when they yield enough distractors and the model otherwise
+HYBRID_MODES = ('off', 'topup', 'rules_first')
+
+GENERATION_STAGE_SECONDS = metrics.histogram(
+    'quiz_generation_stage_seconds', 'Time per generation call spent tokenizing, in model.generate and decoding/filtering',
+    ['stage']
+)
+DISTRACTORS_REQUESTED = metrics.counter('quiz_distractors_requested_total', 'Distractors requested from the generator')
+DISTRACTORS_YIELDED = metrics.counter(
+    'quiz_distractors_yielded_total', 'Distinct distractors returned after filtering, by source', ['source']
+)
+MODEL_LOAD_SECONDS = metrics.gauge('quiz_model_load_seconds', 'Time it took to load the model', ['backend'], mode='max')
+
 class DistractorGenerator:
     
-    def __init__(self, model_path: Optional[str] = None):
+    def __init__(self, model_path: Optional[str] = None, batch_size: Optional[int] = None,
+                 backend: Optional[str] = None, profile: Optional[str] = None, hybrid: Optional[str] = None):
+        self.backend = get_backend(backend or os.environ.get("INFERENCE_BACKEND", "torch"))
+        self.profile = get_profile(profile or os.environ.get("DECODING_PROFILE"))
+        self.hybrid = hybrid or os.environ.get("DISTRACTOR_HYBRID_MODE", "off")
+        if self.hybrid not in HYBRID_MODES:
+            raise ValueError(f"Unknown hybrid mode '{self.hybrid}', expected one of {HYBRID_MODES}")
         self.device = self._setup_device()
+        self.batch_size = batch_size or int(os.environ.get("GENERATION_BATCH_SIZE", "10"))
         
         if model_path:
             self.model_path = model_path
         else:
             self.model_path = os.environ.get("MODEL_PATH", "./downloaded_model")
         
-        logger.info(f"Initializing DistractorGenerator with device: {self.device}")
+        logger.info(f"Initializing DistractorGenerator with device: {self.device}, backend: {self.backend.name}, profile: {self.profile.name}, hybrid: {self.hybrid}")
         logger.info(f"Model path: {self.model_path}")
         
         self._load_model()
         
         logger.info("DistractorGenerator initialized successfully")
     
-    def _setup_device(self) -> torch.device:
+    def _setup_device(self) -> 'torch.device':
+        import torch
+
+        if self.backend.name != 'torch':
+            logger.info(f"Backend {self.backend.name} runs on CPU")
+            return torch.device("cpu")
         if torch.cuda.is_available():
             device = torch.device("cuda")
             logger.info(f"Using GPU: {torch.cuda.get_device_name(0)}")
@@ -36,75 +71,139 @@ class DistractorGenerator:
     
     def _load_model(self):
         try:
-            logger.info(f"Loading tokenizer from {self.model_path}")
-            self.tokenizer = AutoTokenizer.from_pretrained(
-                self.model_path,
-                local_files_only=True,
-                use_fast=True
-            )
-            
-            logger.info(f"Loading model from {self.model_path}")
-            self.model = AutoModelForSeq2SeqLM.from_pretrained(
-                self.model_path,
-                local_files_only=True,
-                torch_dtype=torch.float16 if self.device.type == 'cuda' else torch.float32,
-                device_map="auto" if self.device.type == 'cuda' else None
-            )
-            
-            if self.device.type == 'cpu':
-                self.model = self.model.to(self.device)
-            
-            self.model.eval()
+            started = time.perf_counter()
+            self.tokenizer = self.backend.load_tokenizer(self.model_path)
+            self.model = self.backend.load_model(self.model_path, self.device)
             
             if self.tokenizer.pad_token is None:
                 self.tokenizer.pad_token = self.tokenizer.eos_token
             
-            logger.info("Model loaded successfully")
+            # Backends differ numerically, so cached outputs are kept apart per backend
+            self.fingerprint = f"{model_fingerprint(self.model_path)}-{self.backend.name}"
+            if self.hybrid != 'off':
+                self.fingerprint += f"-{self.hybrid}"
+            
+            MODEL_LOAD_SECONDS.set(time.perf_counter() - started, backend=self.backend.name)
+            logger.info(f"Model loaded successfully (fingerprint {self.fingerprint})")
             
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             raise
     
-    def generate_distractors(self, question: str, answer: str, num_distractors: int = 3, max_length: int = 100) -> List[str]:
+    def generate_distractors(self, question: str, answer: str, num_distractors: int = 3,
+                             max_length: Optional[int] = None, profile: Optional[str] = None,
+                             max_time: Optional[float] = None) -> List[str]:
         try:
-            prompt = f"Question: {question} Answer: {answer}"
-            
-            logger.debug(f"Generate input: '{prompt}'")
-            
-            inputs = self.tokenizer(prompt, return_tensors="pt", padding=True)
+            return self.generate_distractors_batch(
+                [(question, answer)],
+                num_distractors=num_distractors,
+                max_length=max_length,
+                profile=profile,
+                max_time=max_time
+            )[0]
+        except Exception as e:
+            logger.error(f"Error generating distractors: {e}")
+    
+    def generate_distractors_batch(self, items: Sequence[Tuple[str, str]], num_distractors: int = 3,
+                                   max_length: Optional[int] = None, batch_size: Optional[int] = None,
+                                   do_sample: Optional[bool] = None, profile: Optional[str] = None,
+                                   max_time: Optional[float] = None, timeout: Optional[float] = None) -> List[List[str]]:
+        """Generate distractors for several (question, answer) pairs, results in input order
+        
+        max_length caps the generated tokens and do_sample overrides the decoding
+        profile, which defaults to the one the generator was created with.
+        max_time bounds each generate() call, timeout the whole call; chunks past
+        the timeout get no distractors.
+        """
+        items = list(items)
+        if not items:
+            return []
+        
+        results = [None] * len(items)
+        if self.hybrid == 'rules_first':
+            for i, (question, answer) in enumerate(items):
+                rule_distractors = numeric_distractors(answer, num_distractors, question)
+                if len(rule_distractors) >= num_distractors:
+                    results[i] = rule_distractors
+        DISTRACTORS_REQUESTED.inc(num_distractors * len(items))
+        pending = [i for i, result in enumerate(results) if result is None]
+        DISTRACTORS_YIELDED.inc(num_distractors * (len(items) - len(pending)), source='rules')
+        if len(pending) < len(items):
+            logger.info(f"Rule-based distractors for {len(items) - len(pending)} of {len(items)} questions")
+        if not pending:
+            return results
+        
+        decoding = get_profile(profile) if profile else self.profile
+        generate_kwargs = decoding.generate_kwargs(num_distractors, max_new_tokens=max_length, do_sample=do_sample)
+        deadline = time.monotonic() + timeout if timeout else None
+        
+        model_items = [items[i] for i in pending]
+        model_results = []
+        batch_size = batch_size or self.batch_size
+        for start in range(0, len(model_items), batch_size):
+            chunk = model_items[start:start + batch_size]
+            chunk_kwargs = dict(generate_kwargs)
+            if max_time:
+                chunk_kwargs['max_time'] = max_time
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Generation timeout reached, skipping {len(chunk)} questions")
+                    model_results.extend([] for _ in chunk)
+                    continue
+                chunk_kwargs['max_time'] = min(max_time or remaining, remaining)
+            model_results.extend(self._generate_chunk(chunk, num_distractors, chunk_kwargs))
+        
+        for i, distractors in zip(pending, model_results):
+            DISTRACTORS_YIELDED.inc(len(distractors), source='model')
+            if self.hybrid != 'off' and len(distractors) < num_distractors:
+                question, answer = items[i]
+                topped_up = self._filter_distractors(
+                    distractors + numeric_distractors(answer, num_distractors, question), answer, num_distractors
+                )
+                DISTRACTORS_YIELDED.inc(len(topped_up) - len(distractors), source='rules')
+                distractors = topped_up
+            results[i] = distractors
+        return results
+    
+    def _generate_chunk(self, items: List[Tuple[str, str]], num_distractors: int,
+                        generate_kwargs: dict) -> List[List[str]]:
+        import torch
+
+        prompts = [f"Question: {question} Answer: {answer}" for question, answer in items]
+        num_sequences = generate_kwargs['num_return_sequences']
+        
+        logger.debug(f"Generate inputs: {prompts}")
+        
+        with GENERATION_STAGE_SECONDS.time(stage='tokenize'):
+            inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
             input_ids = inputs["input_ids"].to(self.device)
             attention_mask = inputs["attention_mask"].to(self.device)
+        
+        with GENERATION_STAGE_SECONDS.time(stage='generate'), profile_generate(), torch.no_grad():
+            output = self.model.generate(
+                input_ids,
+                attention_mask=attention_mask,
+                pad_token_id=self.tokenizer.eos_token_id,
+                **generate_kwargs
+            )
+        
+        with GENERATION_STAGE_SECONDS.time(stage='decode'):
+            # generate() returns num_sequences rows per input, grouped by input
+            generated_texts = self.tokenizer.batch_decode(output, skip_special_tokens=True)
             
-            with torch.no_grad():
-                output = self.model.generate(
-                    input_ids,
-                    attention_mask=attention_mask,
-                    max_length=min(len(input_ids[0]) + max_length, 512),
-                    num_return_sequences=num_distractors * 2,
-                    num_beams=num_distractors * 2,
-                    temperature=0.8,
-                    top_p=0.92,
-                    do_sample=True,
-                    pad_token_id=self.tokenizer.eos_token_id,
-                    repetition_penalty=1.2,
-                    no_repeat_ngram_size=2,
-                    early_stopping=True
-                )
-            
-            all_distractors = []
-            for seq in output:
-                generated_text = self.tokenizer.decode(seq, skip_special_tokens=True)
-                logger.debug(f"Raw generated: '{generated_text}'")
+            results = []
+            for i, (question, answer) in enumerate(items):
+                all_distractors = []
+                for generated_text in generated_texts[i * num_sequences:(i + 1) * num_sequences]:
+                    logger.debug(f"Raw generated: '{generated_text}'")
+                    all_distractors.extend(self._extract_distractors_seq2seq(generated_text))
                 
-                distractors = self._extract_distractors_seq2seq(generated_text)
-                all_distractors.extend(distractors)
-            
-            result = self._filter_distractors(all_distractors, answer, num_distractors)
-            logger.info(f"Generated distractors: {result}")
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error generating distractors: {e}")
+                result = self._filter_distractors(all_distractors, answer, num_distractors)
+                logger.info(f"Generated distractors: {result}")
+                results.append(result)
+        
+        return results
     
     def _extract_distractors_seq2seq(self, generated_text: str) -> List[str]:
         distractors = []
@@ -159,6 +258,8 @@ class DistractorGenerator:
     
     
     def cleanup(self):
+        import torch
+
         if hasattr(self, 'model'):
             del self.model
         if hasattr(self, 'tokenizer'):
@@ -0,0 +1,250 @@
+"""Streaming export of quiz results joined with their answers
+
+    python -m services.export_service --format csv --output results.csv
+    python -m services.export_service --format ndjson --question-type AI --resume-file .export_cursor
+
+Rows are read in keyset-paginated chunks (answer id > last id), so memory stays
+constant and no read transaction is held open for the whole export.
+"""
+import io
+import os
+import csv
+import json
+import sqlite3
+import logging
+import argparse
+from typing import Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = [
+    'answer_id', 'quiz_id', 'participant_name', 'score', 'avg_confidence', 'timestamp',
+    'question', 'answer', 'not_selected_answers', 'is_correct', 'confidence', 'is_generated', 'question_type'
+]
+
+EXPORT_QUERY = '''
+    SELECT a.id, a.quiz_id, r.participant_name, r.score, r.avg_confidence, r.timestamp,
+           a.question, a.answer, a.not_selected_answers, a.is_correct, a.confidence, a.is_generated, a.question_type
+    FROM quiz_answers a
+    JOIN quiz_results r ON r.quiz_id = a.quiz_id
+    WHERE a.id > ?
+'''
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+
+def iter_export_chunks(db_path: str, since: Optional[str] = None, until: Optional[str] = None,
+                       question_type: Optional[str] = None, after_id: int = 0,
+                       chunk_size: int = 1000) -> Iterator[List[tuple]]:
+    """Yield lists of result rows ordered by answer id, filtered by timestamp range and question_type"""
+    query = EXPORT_QUERY
+    filters = []
+    if since:
+        query += " AND r.timestamp >= ?"
+        filters.append(since)
+    if until:
+        query += " AND r.timestamp < ?"
+        filters.append(until)
+    if question_type:
+        query += " AND a.question_type = ?"
+        filters.append(question_type)
+    query += " ORDER BY a.id LIMIT ?"
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=10)
+    try:
+        last_id = after_id or 0
+        while True:
+            rows = conn.execute(query, (last_id, *filters, chunk_size)).fetchall()
+            if not rows:
+                break
+            yield rows
+            last_id = rows[-1][0]
+    finally:
+        conn.close()
+
+
+class NDJSONFormatter:
+
+    def header(self) -> bytes:
+        return b''
+
+    def chunk(self, rows: List[tuple]) -> bytes:
+        lines = []
+        for row in rows:
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record['not_selected_answers'] = json.loads(record['not_selected_answers'] or '[]')
+            record['is_correct'] = bool(record['is_correct'])
+            record['is_generated'] = bool(record['is_generated'])
+            lines.append(json.dumps(record, ensure_ascii=False))
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+    def footer(self) -> bytes:
+        return b''
+
+
+class CSVFormatter:
+
+    def _encode(self, rows) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode('utf-8')
+
+    def header(self) -> bytes:
+        return self._encode([EXPORT_COLUMNS])
+
+    def chunk(self, rows: List[tuple]) -> bytes:
+        return self._encode(rows)
+
+    def footer(self) -> bytes:
+        return b''
+
+
+class _StreamSink:
+    """Write-only file object that hands written bytes back in pieces while tracking the offset"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+class ParquetFormatter:
+    """One Parquet row group per chunk, requires the optional pyarrow package"""
+
+    def __init__(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export requires `pip install pyarrow`")
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ('answer_id', pa.int64()), ('quiz_id', pa.string()), ('participant_name', pa.string()),
+            ('score', pa.int64()), ('avg_confidence', pa.float64()), ('timestamp', pa.string()),
+            ('question', pa.string()), ('answer', pa.string()), ('not_selected_answers', pa.string()),
+            ('is_correct', pa.bool_()), ('confidence', pa.int64()), ('is_generated', pa.bool_()),
+            ('question_type', pa.string())
+        ])
+        self.sink = _StreamSink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema)
+
+    def header(self) -> bytes:
+        return self.sink.drain()
+
+    def chunk(self, rows: List[tuple]) -> bytes:
+        columns = list(zip(*rows))
+        arrays = []
+        for field, values in zip(self.schema, columns):
+            if self.pa.types.is_boolean(field.type):
+                values = [None if v is None else bool(v) for v in values]
+            arrays.append(self.pa.array(values, type=field.type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        return self.sink.drain()
+
+    def footer(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+FORMATTERS = {
+    'ndjson': NDJSONFormatter,
+    'csv': CSVFormatter,
+    'parquet': ParquetFormatter
+}
+
+
+def stream_export(db_path: str, export_format: str = 'ndjson', **filters) -> Iterator[bytes]:
+    if export_format not in FORMATTERS:
+        raise ValueError(f"Unknown export format '{export_format}', expected one of {sorted(FORMATTERS)}")
+
+    formatter = FORMATTERS[export_format]()
+    yield formatter.header()
+    for rows in iter_export_chunks(db_path, **filters):
+        yield formatter.chunk(rows)
+    yield formatter.footer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export quiz results joined with their answers')
+    parser.add_argument('--db', default=os.environ.get('DB_PATH', 'data/quiz_db.sqlite'))
+    parser.add_argument('--format', choices=sorted(FORMATTERS), default='ndjson')
+    parser.add_argument('--output', default='-',
+                        help="Output file, '-' for stdout. {after_id} is replaced by the start cursor")
+    parser.add_argument('--since', help="Only quizzes submitted at or after this timestamp (YYYY-MM-DD[ HH:MM:SS])")
+    parser.add_argument('--until', help="Only quizzes submitted before this timestamp")
+    parser.add_argument('--question-type', choices=['AI', 'Manual'])
+    parser.add_argument('--after-id', type=int, default=0, help="Resume after this answer id")
+    parser.add_argument('--resume-file', help="Read the start cursor from and write the last exported id to this file")
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    # Every CSV or Parquet run writes a complete file with its own header, so resumed runs cannot share one
+    if args.resume_file and args.format != 'ndjson' and '{after_id}' not in args.output:
+        parser.error(f"--resume-file with --format {args.format} needs an --output that changes each run, "
+                     "e.g. results-{after_id}." + args.format)
+
+    after_id = args.after_id
+    if args.resume_file and os.path.exists(args.resume_file):
+        with open(args.resume_file, 'r') as f:
+            after_id = int(f.read().strip() or 0)
+
+    last_id = after_id
+    exported = 0
+
+    def chunks():
+        nonlocal last_id, exported
+        for rows in iter_export_chunks(args.db, since=args.since, until=args.until,
+                                       question_type=args.question_type, after_id=after_id,
+                                       chunk_size=args.chunk_size):
+            last_id = rows[-1][0]
+            exported += len(rows)
+            yield rows
+
+    formatter = FORMATTERS[args.format]()
+    if args.output == '-':
+        out = os.fdopen(os.dup(1), 'wb')
+    else:
+        # NDJSON runs resuming from a cursor add to what the earlier runs exported
+        mode = 'ab' if args.resume_file and args.format == 'ndjson' else 'wb'
+        out = open(args.output.replace('{after_id}', str(after_id)), mode)
+    with out:
+        out.write(formatter.header())
+        for rows in chunks():
+            out.write(formatter.chunk(rows))
+        out.write(formatter.footer())
+
+    if args.resume_file:
+        with open(args.resume_file, 'w') as f:
+            f.write(str(last_id))
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info(f"Exported {exported} answers, last answer id {last_id}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import time
+import logging
+import threading
+from typing import Optional
+from services.distractor_service import DistractorGenerator
+from services.distractor_cache import DistractorCache, CachedDistractorGenerator
+from services.inference_server import RemoteDistractorGenerator, inference_authkey
+from services.batch_scheduler import BatchScheduler
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ITEMS = [("What is 12 + 30?", "42")]
+
+
+class GeneratorProvider:
+    """Builds the distractor generator stack once per process and tracks its readiness
+
+    The stack is DistractorGenerator (or RemoteDistractorGenerator in server mode),
+    optionally behind a BatchScheduler, optionally behind the distractor cache.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.generator = None
+        self.model_generator = None
+        self.state = 'cold'
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+        if config.get('INFERENCE_MODE') == 'server':
+            # Fail at startup, not on the first quiz
+            inference_authkey()
+
+    def get(self):
+        """Return the generator, building it on first use"""
+        if self.generator is None:
+            with self._lock:
+                if self.generator is None:
+                    self._build()
+        return self.generator
+
+    def _build(self):
+        started = time.perf_counter()
+        try:
+            if self.config.get('INFERENCE_MODE') == 'server':
+                generator = RemoteDistractorGenerator(
+                    self.config['INFERENCE_SOCKET'],
+                    connect_timeout=self.config['INFERENCE_TIMEOUT'],
+                    request_timeout=self.config['INFERENCE_TIMEOUT']
+                )
+                logger.info(f"Using shared inference server at {self.config['INFERENCE_SOCKET']}")
+            else:
+                generator = DistractorGenerator(
+                    profile=self.config.get('DECODING_PROFILE'),
+                    hybrid=self.config.get('DISTRACTOR_HYBRID_MODE')
+                )
+                if self.config.get('BATCHING_ENABLED'):
+                    generator = BatchScheduler(
+                        generator,
+                        max_batch_size=self.config['BATCH_MAX_SIZE'],
+                        max_wait_ms=self.config['BATCH_WAIT_MS']
+                    )
+            self.model_generator = generator
+            logger.info("Distractor generator initialized successfully")
+
+            if self.config.get('DISTRACTOR_CACHE_ENABLED'):
+                cache = DistractorCache(
+                    self.config['DISTRACTOR_CACHE_PATH'],
+                    max_variants=self.config['DISTRACTOR_CACHE_VARIANTS'],
+                    ttl=self.config['DISTRACTOR_CACHE_TTL'],
+                    max_entries=self.config['DISTRACTOR_CACHE_MAX_ENTRIES']
+                )
+                generator = CachedDistractorGenerator(
+                    generator, cache, default_profile=self.config.get('DECODING_PROFILE')
+                )
+                logger.info(f"Distractor cache enabled at {self.config['DISTRACTOR_CACHE_PATH']}")
+
+            self.generator = generator
+            self.load_seconds = time.perf_counter() - started
+            if self.state == 'cold':
+                self.state = 'loaded'
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            logger.error(f"Failed to initialize distractor generator: {e}")
+            raise
+
+    def use(self, generator):
+        """Serve a prebuilt generator instead of building one, e.g. a stub in benchmarks"""
+        with self._lock:
+            self.generator = generator
+            self.model_generator = generator
+            self.state = 'ready'
+
+    def preload(self):
+        """Load the model now, e.g. in the gunicorn master so workers share the weights copy-on-write"""
+        if self.config.get('INFERENCE_MODE') == 'server':
+            # No weights to share, and the inference server is not up yet while the gunicorn master loads the app
+            logger.info("Skipping preload, the model is loaded by the inference server")
+            return
+        logger.info("Preloading distractor generator")
+        self.get()
+        logger.info(f"Distractor generator preloaded in {self.load_seconds:.1f}s")
+
+    def warmup(self):
+        """Run one generation through the model so the first participant does not pay for it"""
+        self.state = 'warming'
+        started = time.perf_counter()
+        try:
+            self.get()
+            # Skip the cache, a cache hit would not exercise the model
+            self.model_generator.generate_distractors_batch(WARMUP_ITEMS)
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            logger.error(f"Model warmup failed: {e}")
+            return
+
+        self.warmup_seconds = time.perf_counter() - started
+        self.state = 'ready'
+        logger.info(f"Model warmup finished in {self.warmup_seconds:.1f}s")
+
+    def start_warmup(self) -> Optional[threading.Thread]:
+        if self._warmup_thread is not None:
+            return self._warmup_thread
+        self._warmup_thread = threading.Thread(target=self.warmup, name='model-warmup', daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    @property
+    def ready(self) -> bool:
+        return self.state == 'ready'
+
+    def status(self) -> dict:
+        return {
+            'state': self.state,
+            'error': self.error,
+            'load_seconds': self.load_seconds,
+            'warmup_seconds': self.warmup_seconds
+        }
@@ -0,0 +1,115 @@
+import os
+import logging
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+# torch and transformers are imported when a model is loaded, not with this module
+if TYPE_CHECKING:
+    import torch
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceBackend(ABC):
+    """Loads a tokenizer and a seq2seq model exposing generate() for DistractorGenerator"""
+
+    name = None
+
+    def load_tokenizer(self, model_path: str):
+        from transformers import AutoTokenizer
+
+        logger.info(f"Loading tokenizer from {model_path}")
+        return AutoTokenizer.from_pretrained(
+            model_path,
+            local_files_only=True,
+            use_fast=True
+        )
+
+    @abstractmethod
+    def load_model(self, model_path: str, device: 'torch.device'):
+        pass
+
+
+class TorchBackend(InferenceBackend):
+    """Plain PyTorch model, fp16 on CUDA and fp32 on CPU"""
+
+    name = 'torch'
+
+    def load_model(self, model_path: str, device: 'torch.device'):
+        import torch
+        from transformers import AutoModelForSeq2SeqLM
+
+        logger.info(f"Loading model from {model_path}")
+        model = AutoModelForSeq2SeqLM.from_pretrained(
+            model_path,
+            local_files_only=True,
+            torch_dtype=torch.float16 if device.type == 'cuda' else torch.float32,
+            device_map="auto" if device.type == 'cuda' else None
+        )
+
+        if device.type == 'cpu':
+            model = model.to(device)
+
+        model.eval()
+        return model
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """PyTorch model with Linear layers dynamically quantized to int8, CPU only"""
+
+    name = 'torch-int8'
+
+    def load_model(self, model_path: str, device: 'torch.device'):
+        import torch
+
+        if device.type != 'cpu':
+            raise ValueError("The torch-int8 backend only runs on CPU")
+
+        model = super().load_model(model_path, device)
+
+        logger.info("Applying dynamic int8 quantization to Linear layers")
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.eval()
+        return model
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """Encoder/decoder ONNX export of the model, run with ONNX Runtime on CPU
+
+    The export is written to ONNX_MODEL_PATH (default <model_path>/onnx) on first
+    use and reused afterwards. Requires the optional `optimum[onnxruntime]` package.
+    """
+
+    name = 'onnx'
+
+    def _onnx_path(self, model_path: str) -> str:
+        return os.environ.get('ONNX_MODEL_PATH') or os.path.join(model_path, 'onnx')
+
+    def load_model(self, model_path: str, device: 'torch.device'):
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError:
+            raise RuntimeError("The onnx backend requires `pip install optimum[onnxruntime]`")
+
+        onnx_path = self._onnx_path(model_path)
+        if os.path.isdir(onnx_path):
+            logger.info(f"Loading ONNX model from {onnx_path}")
+            return ORTModelForSeq2SeqLM.from_pretrained(onnx_path, local_files_only=True)
+
+        logger.info(f"Exporting {model_path} to ONNX at {onnx_path}")
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_path, export=True, local_files_only=True)
+        model.save_pretrained(onnx_path)
+        return model
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (TorchBackend, QuantizedTorchBackend, OnnxRuntimeBackend)
+}
+
+
+def get_backend(name: str) -> InferenceBackend:
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {sorted(BACKENDS)}")
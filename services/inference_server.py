@@ -0,0 +1,246 @@
+import os
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+from multiprocessing.connection import Listener, Client
+from typing import List, Optional, Sequence, Tuple
+from services.batch_scheduler import BatchScheduler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = 'data/inference.sock'
+
+
+class InferenceServerError(Exception):
+    pass
+
+
+# Extra time a generate call may take on top of its own timeout before the client gives up on the reply
+RESPONSE_GRACE_SECONDS = 5
+
+
+def inference_authkey() -> bytes:
+    """Key authenticating web workers to the inference server, there is no default"""
+    key = os.environ.get('INFERENCE_AUTHKEY') or os.environ.get('SECRET_KEY')
+    if not key:
+        raise InferenceServerError("INFERENCE_MODE=server needs INFERENCE_AUTHKEY or SECRET_KEY to authenticate workers")
+    return key.encode('utf-8')
+
+
+class InferenceServer:
+    """Owns the only DistractorGenerator and answers requests from web workers over a Unix socket"""
+
+    def __init__(self, socket_path: str, model_path: Optional[str] = None,
+                 max_batch_size: int = 16, max_wait_ms: float = 20):
+        self.socket_path = socket_path
+        self.model_path = model_path
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.authkey = inference_authkey()
+        self.generator = None
+
+    def _load_generator(self):
+        from services.distractor_service import DistractorGenerator
+        # Requests from all web workers meet here, so this is where batching pays off most
+        self.generator = BatchScheduler(
+            DistractorGenerator(self.model_path),
+            max_batch_size=self.max_batch_size,
+            max_wait_ms=self.max_wait_ms
+        )
+
+    def _handle(self, request: dict):
+        op = request.get('op')
+
+        if op == 'ping':
+            return 'pong'
+
+        if op == 'info':
+            return {
+                'model_path': self.generator.model_path,
+                'fingerprint': self.generator.fingerprint,
+                'pid': os.getpid()
+            }
+
+        if op == 'generate_batch':
+            return self.generator.generate_distractors_batch(request['items'], **request.get('kwargs', {}))
+
+        if op == 'stats':
+            return self.generator.stats()
+
+        raise InferenceServerError(f"Unknown operation: {op}")
+
+    def _serve_connection(self, conn):
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    break
+
+                try:
+                    conn.send({'status': 'success', 'result': self._handle(request)})
+                except Exception as e:
+                    logger.error(f"Inference request failed: {e}")
+                    conn.send({'status': 'error', 'message': str(e)})
+        finally:
+            conn.close()
+
+    def serve_forever(self):
+        self._load_generator()
+
+        socket_dir = os.path.dirname(self.socket_path)
+        if socket_dir:
+            os.makedirs(socket_dir, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        listener = Listener(self.socket_path, family='AF_UNIX', authkey=self.authkey)
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"Inference server listening on {self.socket_path} (pid {os.getpid()})")
+
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning(f"Rejected inference client: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+
+def run_inference_server(socket_path: str, model_path: Optional[str] = None):
+    logging.basicConfig(level=logging.INFO)
+    # Generation metrics are recorded here, /metrics in the workers merges them
+    from utils.metrics import configure_from_env
+    configure_from_env()
+    InferenceServer(
+        socket_path,
+        model_path,
+        max_batch_size=int(os.environ.get('BATCH_MAX_SIZE', '16')),
+        max_wait_ms=float(os.environ.get('BATCH_WAIT_MS', '20'))
+    ).serve_forever()
+
+
+def start_inference_server(socket_path: str, model_path: Optional[str] = None) -> multiprocessing.Process:
+    """Start the inference server in a fresh (spawned) process and return it"""
+    # Fail here, in the caller, rather than in the child process
+    inference_authkey()
+    ctx = multiprocessing.get_context('spawn')
+    process = ctx.Process(
+        target=run_inference_server,
+        args=(socket_path, model_path),
+        name='inference-server',
+        daemon=True
+    )
+    process.start()
+    logger.info(f"Started inference server process {process.pid}")
+    return process
+
+
+class RemoteDistractorGenerator:
+    """Drop-in replacement for DistractorGenerator that forwards calls to the inference server"""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, connect_timeout: float = 120,
+                 request_timeout: float = 120):
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+        self.authkey = inference_authkey()
+        self._local = threading.local()
+        self._info = None
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        # The server may still be loading the model, keep retrying until connect_timeout
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                conn = Client(self.socket_path, family='AF_UNIX', authkey=self.authkey)
+                break
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                if time.monotonic() >= deadline:
+                    raise InferenceServerError(f"Inference server at {self.socket_path} unavailable: {e}")
+                time.sleep(0.5)
+
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _drop_connection(self):
+        conn, self._local.conn = getattr(self._local, 'conn', None), None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, request: dict, timeout: Optional[float] = None):
+        timeout = min(timeout, self.request_timeout) if timeout is not None else self.request_timeout
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.send(request)
+                if not conn.poll(timeout):
+                    # A late reply would be read as the answer to the next request, so the connection goes
+                    self._drop_connection()
+                    raise InferenceServerError(f"Inference server did not answer '{request['op']}' within {timeout:.0f}s")
+                response = conn.recv()
+                break
+            except (EOFError, OSError) as e:
+                self._drop_connection()
+                if attempt:
+                    raise InferenceServerError(f"Lost connection to inference server: {e}")
+
+        if response['status'] != 'success':
+            raise InferenceServerError(response['message'])
+        return response['result']
+
+    @property
+    def info(self) -> dict:
+        if self._info is None:
+            self._info = self._call({'op': 'info'})
+        return self._info
+
+    @property
+    def model_path(self) -> str:
+        return self.info['model_path']
+
+    @property
+    def fingerprint(self) -> str:
+        return self.info['fingerprint']
+
+    def stats(self) -> dict:
+        return self._call({'op': 'stats'})
+
+    def generate_distractors(self, question: str, answer: str, num_distractors: int = 3,
+                             max_length: Optional[int] = None, profile: Optional[str] = None) -> List[str]:
+        return self.generate_distractors_batch(
+            [(question, answer)],
+            num_distractors=num_distractors,
+            max_length=max_length,
+            profile=profile
+        )[0]
+
+    def generate_distractors_batch(self, items: Sequence[Tuple[str, str]], **kwargs) -> List[List[str]]:
+        timeout = kwargs.get('timeout')
+        return self._call({
+            'op': 'generate_batch',
+            'items': [tuple(item) for item in items],
+            'kwargs': kwargs
+        }, timeout=timeout + RESPONSE_GRACE_SECONDS if timeout is not None else None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the shared distractor inference server')
+    parser.add_argument('--socket', default=os.environ.get('INFERENCE_SOCKET', DEFAULT_SOCKET))
+    parser.add_argument('--model-path', default=os.environ.get('MODEL_PATH'))
+    args = parser.parse_args()
+
+    run_inference_server(args.socket, args.model_path)
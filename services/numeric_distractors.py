@@ -0,0 +1,145 @@
+"""Rule-based distractors for numeric answers, deterministic and CPU only
+
+Wrong values come from the mistakes people make on arithmetic questions:
+operations mixed up between the numbers in the question, off-by-one-step
+errors, swapped digits, percentage slips and scale errors. Units, currency
+signs, thousands separators and decimal places of the answer are kept.
+"""
+import re
+import random
+import hashlib
+from decimal import Decimal, InvalidOperation
+from itertools import permutations
+from typing import List, NamedTuple, Optional
+
+NUMBER_RE = re.compile(r'^(?P<prefix>[$€£]?\s*)(?P<number>-?(?:\d{1,3}(?:,\d{3})+|\d*)(?:\.\d+)?)(?P<suffix>.*)$')
+QUESTION_NUMBER_RE = re.compile(r'(?<![\w.])-?(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?')
+
+# Order in which candidates are taken, one per category per round
+CATEGORIES = ('formula', 'step', 'digits', 'relative', 'scale')
+
+
+class NumericAnswer(NamedTuple):
+    prefix: str
+    value: Decimal
+    decimals: int
+    thousands: bool
+    suffix: str
+
+
+def parse_answer(answer: str) -> Optional[NumericAnswer]:
+    """Split an answer like '$1,250.50', '2.5 hours' or '15%' into number and formatting, None if not numeric"""
+    match = NUMBER_RE.match(answer.strip())
+    if not match or not any(c.isdigit() for c in match.group('number')):
+        return None
+
+    number, suffix = match.group('number'), match.group('suffix')
+    # '12:30', '3/4' or '1.2.3' are not a number with a unit
+    if suffix and not (suffix[0].isspace() or suffix[0].isalpha() or suffix[0] in '%°'):
+        return None
+
+    try:
+        value = Decimal(number.replace(',', ''))
+    except InvalidOperation:
+        return None
+
+    decimals = len(number.split('.')[1]) if '.' in number else 0
+    return NumericAnswer(match.group('prefix'), value, decimals, ',' in number, suffix)
+
+
+def format_value(answer: NumericAnswer, value: Decimal) -> str:
+    # Keep the answer's decimal places, with up to two more when a scale error needs them
+    needed = max(0, -value.normalize().as_tuple().exponent)
+    decimals = min(max(answer.decimals, needed), answer.decimals + 2)
+    value = value.quantize(Decimal(1).scaleb(-decimals))
+    text = f"{value:,.{decimals}f}" if answer.thousands else f"{value:.{decimals}f}"
+    return f"{answer.prefix}{text}{answer.suffix}"
+
+
+def _step(answer: NumericAnswer) -> Decimal:
+    """Smallest plausible difference: the last decimal place, or the magnitude of trailing zeros"""
+    if answer.decimals:
+        return Decimal(1).scaleb(-answer.decimals)
+    digits = str(abs(int(answer.value)))
+    zeros = len(digits) - len(digits.rstrip('0'))
+    return Decimal(10) ** min(zeros, len(digits) - 1)
+
+
+def _round_to(value: Decimal, step: Decimal) -> Decimal:
+    return (value / step).to_integral_value() * step
+
+
+def _question_numbers(question: str) -> List[Decimal]:
+    numbers = []
+    for match in QUESTION_NUMBER_RE.findall(question or ''):
+        try:
+            numbers.append(Decimal(match.replace(',', '')))
+        except InvalidOperation:
+            continue
+    return numbers[:6]
+
+
+def _candidates(answer: NumericAnswer, question: str) -> dict:
+    value, step = answer.value, _step(answer)
+    candidates = {category: [] for category in CATEGORIES}
+
+    for a, b in permutations(_question_numbers(question), 2):
+        results = [a + b, a - b, a * b]
+        if b:
+            results.append(a / b)
+        for result in results:
+            # Only results of a similar size, wildly different values are not plausible slips
+            if value and Decimal('0.25') <= abs(result / value) <= 4:
+                candidates['formula'].append(_round_to(result, step))
+
+    candidates['step'] = [value + step, value - step, value + 2 * step, value - 2 * step]
+
+    digits = str(abs(value)).replace('.', '')
+    for i in range(len(digits) - 1):
+        if digits[i] != digits[i + 1] and not (i == 0 and '0' in (digits[0], digits[1])):
+            swapped = digits[:i] + digits[i + 1] + digits[i] + digits[i + 2:]
+            if answer.decimals:
+                swapped = swapped[:-answer.decimals] + '.' + swapped[-answer.decimals:]
+            candidates['digits'].append(Decimal(swapped).copy_sign(value))
+
+    for factor in ('1.1', '0.9', '1.25', '0.75', '1.5'):
+        candidates['relative'].append(_round_to(value * Decimal(factor), step))
+
+    for factor in ('10', '0.1', '2', '0.5', '100', '0.01'):
+        candidates['scale'].append(value * Decimal(factor))
+
+    return candidates
+
+
+def numeric_distractors(answer: str, num_distractors: int = 3, question: str = '') -> List[str]:
+    """Up to num_distractors distinct wrong values formatted like the answer, [] for non-numeric answers"""
+    parsed = parse_answer(answer)
+    if parsed is None:
+        return []
+
+    # Seeded by the question so the same question always gets the same distractors
+    seed = int.from_bytes(hashlib.md5(f"{question}\x00{answer}".encode('utf-8')).digest()[:8], 'big')
+    rng = random.Random(seed)
+
+    pools = []
+    for category, values in _candidates(parsed, question).items():
+        rng.shuffle(values)
+        pools.append(values)
+
+    answer_text = format_value(parsed, parsed.value)
+    distractors, seen = [], {answer_text, answer.strip()}
+    while len(distractors) < num_distractors and any(pools):
+        for pool in pools:
+            while pool:
+                value = pool.pop()
+                if value == parsed.value or (parsed.value > 0 and value <= 0):
+                    continue
+                text = format_value(parsed, value)
+                if text not in seen:
+                    seen.add(text)
+                    distractors.append(text)
+                    break
+            if len(distractors) == num_distractors:
+                break
+
+    return distractors
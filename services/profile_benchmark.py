@@ -0,0 +1,115 @@
+"""Latency and distractor yield of each decoding profile on the question bank
+
+    python -m services.profile_benchmark --profiles fast balanced quality --limit 100 --output profiles.json
+
+Yield is measured after _filter_distractors: the number of distinct distractors
+per question and how often the requested number was reached.
+"""
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import statistics
+from typing import Dict, List
+
+from services.distractor_service import DistractorGenerator
+from services.decoding_profiles import PROFILES
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_profile(generator: DistractorGenerator, profile: str, items: List[tuple],
+                num_distractors: int, latency_samples: int) -> Dict:
+    # Single questions, as /stream_questions and the batch scheduler under low load see them
+    latencies = []
+    for question, answer in items[:latency_samples]:
+        started = time.perf_counter()
+        generator.generate_distractors_batch([(question, answer)], num_distractors=num_distractors, profile=profile)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    outputs = generator.generate_distractors_batch(items, num_distractors=num_distractors, profile=profile)
+    batch_seconds = time.perf_counter() - started
+
+    counts = [len(out or []) for out in outputs]
+    return {
+        'profile': profile,
+        'p50_ms': 1000 * _percentile(latencies, 0.5),
+        'p95_ms': 1000 * _percentile(latencies, 0.95),
+        'mean_ms': 1000 * statistics.mean(latencies),
+        'batch_ms_per_question': 1000 * batch_seconds / len(items),
+        'mean_distinct': statistics.mean(counts),
+        'complete_rate': sum(count >= num_distractors for count in counts) / len(counts),
+        'outputs': outputs
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark decoding profiles')
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument('--model-path', default=os.environ.get('MODEL_PATH', './downloaded_model'))
+    parser.add_argument('--backend', default=os.environ.get('INFERENCE_BACKEND', 'torch'))
+    parser.add_argument('--questions', default='quiz_results/arithmetik_questions.json')
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--latency-samples', type=int, default=20)
+    parser.add_argument('--num-distractors', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--min-complete-rate', type=float, default=0.95,
+                        help='Recommend the fastest profile reaching this complete rate')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='Write the full report as JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    with open(args.questions, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+    random.Random(args.seed).shuffle(questions)
+    items = [(q['question'], q['answer']) for q in questions[:args.limit]]
+
+    generator = DistractorGenerator(args.model_path, batch_size=args.batch_size, backend=args.backend)
+    # One untimed pass so the first profile does not pay for lazy initialization
+    generator.generate_distractors_batch(items[:1])
+
+    runs = [run_profile(generator, profile, items, args.num_distractors, args.latency_samples)
+            for profile in args.profiles]
+
+    for run in runs:
+        print(f"{run['profile']:10s} p50={run['p50_ms']:.0f} ms p95={run['p95_ms']:.0f} ms "
+              f"batched={run['batch_ms_per_question']:.0f} ms/question "
+              f"distinct={run['mean_distinct']:.2f} complete={run['complete_rate']:.2f}")
+
+    usable = [run for run in runs if run['complete_rate'] >= args.min_complete_rate]
+    recommended = min(usable, key=lambda run: run['p50_ms'])['profile'] if usable else None
+    print(f"Recommended profile: {recommended or 'none reaches the complete rate'}")
+
+    if args.output:
+        report = {
+            'backend': args.backend,
+            'questions': len(items),
+            'num_distractors': args.num_distractors,
+            'recommended': recommended,
+            'profiles': {run['profile']: {k: v for k, v in run.items() if k != 'outputs'} for run in runs},
+            'examples': [
+                {
+                    'question': question,
+                    'answer': answer,
+                    'distractors': {run['profile']: run['outputs'][i] for run in runs}
+                }
+                for i, (question, answer) in enumerate(items)
+            ]
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+import os
+import re
+import json
+import time
+import random
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTEGER_RE = re.compile(r'^-?\d{1,3}(,\d{3})*$|^-?\d+$')
+DECIMAL_RE = re.compile(r'^-?[\d,]*\.\d+$')
+WITH_UNIT_RE = re.compile(r'^[$€£]?\s*-?[\d,]*\.?\d+\s*\S')
+
+STRATA = ('answer_type', 'length_bucket')
+
+
+def answer_type(answer: str) -> str:
+    answer = answer.strip()
+    if INTEGER_RE.match(answer):
+        return 'integer'
+    if DECIMAL_RE.match(answer):
+        return 'decimal'
+    if WITH_UNIT_RE.match(answer):
+        return 'with_unit'
+    return 'text'
+
+
+def length_bucket(question: str) -> str:
+    if len(question) < 80:
+        return 'short'
+    if len(question) < 160:
+        return 'medium'
+    return 'long'
+
+
+class Question(NamedTuple):
+    question: str
+    answer: str
+    question_de: str
+    distractors: Tuple[str, ...]
+    answer_type: str
+    length_bucket: str
+
+    def to_dict(self) -> dict:
+        item = {
+            'question': self.question,
+            'answer': self.answer,
+            'translation': {'de': self.question_de}
+        }
+        if self.distractors:
+            item['distractors'] = list(self.distractors)
+        return item
+
+
+class _Collection(NamedTuple):
+    path: str
+    mtime: float
+    items: Tuple[Question, ...]
+    strata: Dict[str, Dict[str, Tuple[int, ...]]]
+
+
+class QuestionBank:
+    """Immutable, indexed view of the question files, reloaded only when a file's mtime changes"""
+
+    def __init__(self, sources: Dict[str, str], require_distractors: Sequence[str] = (),
+                 check_interval: float = 1.0):
+        self.sources = dict(sources)
+        self.require_distractors = set(require_distractors)
+        self.check_interval = check_interval
+        self._collections: Dict[str, _Collection] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _parse(self, name: str, raw_items: list) -> Tuple[Question, ...]:
+        items, skipped = [], 0
+        needs_distractors = name in self.require_distractors
+
+        for raw in raw_items:
+            try:
+                question = str(raw['question']).strip()
+                answer = str(raw['answer']).strip()
+                distractors = tuple(str(d).strip() for d in raw.get('distractors') or ())
+                question_de = (raw.get('translation') or {}).get('de', '')
+            except (KeyError, TypeError, AttributeError):
+                skipped += 1
+                continue
+
+            if not question or not answer or (needs_distractors and len(distractors) < 3):
+                skipped += 1
+                continue
+
+            items.append(Question(
+                question=question,
+                answer=answer,
+                question_de=question_de,
+                distractors=distractors,
+                answer_type=answer_type(answer),
+                length_bucket=length_bucket(question)
+            ))
+
+        if skipped:
+            logger.warning(f"Skipped {skipped} invalid questions in '{name}'")
+        return tuple(items)
+
+    def _load(self, name: str, mtime: float) -> _Collection:
+        path = self.sources[name]
+        with open(path, 'r', encoding='utf-8') as f:
+            items = self._parse(name, json.load(f))
+
+        strata = {}
+        for attribute in STRATA:
+            groups = {}
+            for index, item in enumerate(items):
+                groups.setdefault(getattr(item, attribute), []).append(index)
+            strata[attribute] = {value: tuple(indices) for value, indices in groups.items()}
+
+        logger.info(f"Loaded {len(items)} questions for '{name}' from {path}")
+        return _Collection(path, mtime, items, strata)
+
+    def _collection(self, name: str) -> _Collection:
+        now = time.monotonic()
+        collection = self._collections.get(name)
+        if collection is not None and now - self._checked_at.get(name, 0) < self.check_interval:
+            return collection
+
+        with self._lock:
+            collection = self._collections.get(name)
+            try:
+                mtime = os.stat(self.sources[name]).st_mtime
+                if collection is None or mtime != collection.mtime:
+                    collection = self._load(name, mtime)
+                    self._collections[name] = collection
+            except (OSError, ValueError) as e:
+                # Keep serving the last good version if a reload fails, e.g. during a partial write
+                if collection is None:
+                    logger.error(f"Error loading questions for '{name}': {e}")
+                    raise
+                logger.error(f"Error reloading questions for '{name}', keeping previous version: {e}")
+            self._checked_at[name] = now
+
+        return collection
+
+    def all(self, name: str) -> Tuple[Question, ...]:
+        return self._collection(name).items
+
+    def count(self, name: str) -> int:
+        return len(self._collection(name).items)
+
+    def strata(self, name: str, attribute: str) -> Dict[str, int]:
+        return {value: len(indices) for value, indices in self._collection(name).strata[attribute].items()}
+
+    def sample(self, name: str, k: int, stratify_by: Optional[str] = None,
+               rng: Optional[random.Random] = None) -> List[Question]:
+        """Draw k distinct questions, optionally proportionally to the strata of one attribute"""
+        rng = rng or random
+        collection = self._collection(name)
+        items = collection.items
+
+        if k > len(items):
+            raise ValueError(f"Requested {k} questions from '{name}', only {len(items)} available")
+
+        if not stratify_by:
+            return [items[i] for i in rng.sample(range(len(items)), k)]
+        if stratify_by not in collection.strata:
+            raise ValueError(f"Cannot stratify by '{stratify_by}', expected one of {', '.join(STRATA)}")
+
+        groups = collection.strata[stratify_by]
+        quotas = self._allocate(k, {value: len(indices) for value, indices in groups.items()}, rng)
+
+        indices = []
+        for value, quota in quotas.items():
+            indices.extend(rng.sample(groups[value], quota))
+        rng.shuffle(indices)
+        return [items[i] for i in indices]
+
+    @staticmethod
+    def _allocate(k: int, sizes: Dict[str, int], rng) -> Dict[str, int]:
+        """Largest-remainder allocation of k draws proportional to stratum sizes"""
+        total = sum(sizes.values())
+        exact = {value: k * size / total for value, size in sizes.items()}
+        quotas = {value: int(share) for value, share in exact.items()}
+
+        remaining = k - sum(quotas.values())
+        order = sorted(sizes, key=lambda value: (exact[value] - quotas[value], rng.random()), reverse=True)
+        for value in order:
+            if remaining == 0:
+                break
+            if quotas[value] < sizes[value]:
+                quotas[value] += 1
+                remaining -= 1
+
+        return quotas
@@ -1,49 +1,60 @@
-import json
 import os
 import logging
 from models.quiz import QuizModel
+from services.question_bank import QuestionBank
+from services.session_store import SessionStore, MemorySessionStore
 
 logger = logging.getLogger(__name__)
 
 class QuizService:
 
-    def __init__(self):
+    def __init__(self, session_store: SessionStore = None):
         self.questions_file = os.environ.get('QUESTIONS_FILE', 'quiz_results/arithmetik_questions.json')
         self.questions_with_distractors_file = 'quiz_results/arithmetik_questions_with_distractors.json'
-        self.quiz_data_store = {}
+        self.session_store = session_store if session_store is not None else MemorySessionStore()
+        self.stratify_by = os.environ.get('QUESTION_STRATIFY_BY') or None
+        self.question_bank = QuestionBank(
+            {
+                # questions for AI
+                'generated': self.questions_file,
+                # questions manual distractors
+                'manual': self.questions_with_distractors_file
+            },
+            require_distractors=['manual']
+        )
 
     def load_questions(self):
         try:
-            # questions for AI
-            with open(self.questions_file, 'r', encoding='utf-8') as f:
-                generated_questions = json.load(f)
-
-            # questions manual distractors
-            with open(self.questions_with_distractors_file, 'r', encoding='utf-8') as f:
-                manual_questions = json.load(f)
-
             return {
-                'generated': generated_questions,
-                'manual': manual_questions
+                'generated': [q.to_dict() for q in self.question_bank.all('generated')],
+                'manual': [q.to_dict() for q in self.question_bank.all('manual')]
             }
         except Exception as e:
             logger.error(f"Error loading questions: {str(e)}")
             raise
 
+    def question_counts(self):
+        return {
+            'generated': self.question_bank.count('generated'),
+            'manual': self.question_bank.count('manual')
+        }
+
+    def sample_questions(self, name, k):
+        return self.question_bank.sample(name, k, stratify_by=self.stratify_by)
+
     def store_quiz_data(self, quiz_id, quiz_data):
-        self.quiz_data_store[quiz_id] = quiz_data
+        self.session_store.set(quiz_id, quiz_data)
         logger.info(f"Stored quiz data for quiz_id: {quiz_id}")
 
     def get_quiz_data(self, quiz_id):
-        return self.quiz_data_store.get(quiz_id)
+        return self.session_store.get(quiz_id)
 
     def submit_quiz(self, quiz_data):
         try:
             result = QuizModel.save_quiz_result(quiz_data)
             logger.info(f"Quiz submitted successfully: {quiz_data['quiz_id']}")
 
-            if quiz_data['quiz_id'] in self.quiz_data_store:
-                del self.quiz_data_store[quiz_data['quiz_id']]
+            self.session_store.delete(quiz_data['quiz_id'])
 
             return result
         except Exception as e:
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore(ABC):
+    """Quiz data kept between /get_all_questions and /submit_quiz, with TTL and LRU bounds"""
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._stats_lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0}
+
+    def _count(self, name: str, amount: int = 1):
+        if amount:
+            with self._stats_lock:
+                self._counters[name] += amount
+
+    @abstractmethod
+    def set(self, quiz_id: str, data: Any):
+        pass
+
+    @abstractmethod
+    def get(self, quiz_id: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    def delete(self, quiz_id: str):
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            counters = dict(self._counters)
+        return {
+            'backend': self.backend,
+            'size': len(self),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl,
+            **counters
+        }
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process store, only correct when a single worker serves a quiz end to end"""
+
+    backend = 'memory'
+
+    def __init__(self, ttl: int = 4 * 3600, max_entries: int = 10000):
+        super().__init__(ttl, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._swept_at = time.monotonic()
+
+    def _sweep(self, now: float):
+        # Full expiry sweeps are amortized, LRU order alone does not track expiry times
+        if now - self._swept_at < self.ttl / 10:
+            return
+        expired = [quiz_id for quiz_id, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for quiz_id in expired:
+            del self._entries[quiz_id]
+        self._count('expired', len(expired))
+        self._swept_at = now
+
+    def set(self, quiz_id: str, data: Any):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[quiz_id] = (now + self.ttl, data)
+            self._entries.move_to_end(quiz_id)
+            self._sweep(now)
+
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            self._count('evicted', evicted)
+
+    def get(self, quiz_id: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(quiz_id)
+            if entry is None:
+                self._count('misses')
+                return None
+
+            expires_at, data = entry
+            if expires_at <= now:
+                del self._entries[quiz_id]
+                self._count('expired')
+                self._count('misses')
+                return None
+
+            self._entries.move_to_end(quiz_id)
+            self._count('hits')
+            return data
+
+    def delete(self, quiz_id: str):
+        with self._lock:
+            self._entries.pop(quiz_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Store shared by all gunicorn workers through a WAL-mode SQLite file"""
+
+    backend = 'sqlite'
+
+    def __init__(self, db_path: str, ttl: int = 4 * 3600, max_entries: int = 10000, sweep_every: int = 100):
+        super().__init__(ttl, max_entries)
+        self.db_path = db_path
+        self.sweep_every = sweep_every
+        self._local = threading.local()
+        self._writes = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        conn = self._connect()
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS quiz_sessions (
+                    quiz_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_quiz_sessions_last_access
+                ON quiz_sessions(last_access)
+            ''')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def set(self, quiz_id: str, data: Any):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                '''INSERT OR REPLACE INTO quiz_sessions (quiz_id, data, expires_at, last_access)
+                   VALUES (?, ?, ?, ?)''',
+                (quiz_id, json.dumps(data, ensure_ascii=False), now + self.ttl, now)
+            )
+
+        self._writes += 1
+        if self._writes % self.sweep_every == 0:
+            self.sweep()
+
+    def sweep(self):
+        conn = self._connect()
+        with conn:
+            expired = conn.execute(
+                "DELETE FROM quiz_sessions WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+            evicted = conn.execute('''
+                DELETE FROM quiz_sessions WHERE quiz_id IN (
+                    SELECT quiz_id FROM quiz_sessions
+                    ORDER BY last_access DESC
+                    LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_entries,)).rowcount
+        self._count('expired', expired)
+        self._count('evicted', evicted)
+
+    def get(self, quiz_id: str) -> Optional[Any]:
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT data, expires_at FROM quiz_sessions WHERE quiz_id = ?", (quiz_id,)
+        ).fetchone()
+
+        if row is None or row[1] <= now:
+            self._count('misses')
+            return None
+
+        with conn:
+            conn.execute("UPDATE quiz_sessions SET last_access = ? WHERE quiz_id = ?", (now, quiz_id))
+        self._count('hits')
+        return json.loads(row[0])
+
+    def delete(self, quiz_id: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM quiz_sessions WHERE quiz_id = ?", (quiz_id,))
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM quiz_sessions").fetchone()[0]
+
+
+def create_session_store(config) -> SessionStore:
+    backend = config.get('SESSION_STORE', 'sqlite')
+    ttl = config.get('SESSION_TTL', 4 * 3600)
+    max_entries = config.get('SESSION_MAX_ENTRIES', 10000)
+
+    if backend == 'memory':
+        return MemorySessionStore(ttl=ttl, max_entries=max_entries)
+    if backend == 'sqlite':
+        return SQLiteSessionStore(config['SESSION_STORE_PATH'], ttl=ttl, max_entries=max_entries)
+    raise ValueError(f"Unknown session store '{backend}', expected 'memory' or 'sqlite'")
@@ -11,6 +11,7 @@ function App() {
   const [quizStarted, setQuizStarted] = useState(false);
   const [quizCompleted, setQuizCompleted] = useState(false);
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [language, setLanguage] = useState('en');
   const [quizId, setQuizId] = useState<string | null>(null);
@@ -25,17 +26,36 @@ function App() {
     try {
       const startResponse = await api.startQuiz();
       setQuizId(startResponse.quiz_id);
-      
-      const questionsResponse = await api.getAllQuestions();
-      setQuestions(questionsResponse.questions);
+      setQuestions([]);
       setAnswers([]);
-      setQuizStarted(true);
       setQuizCompleted(false);
       setCurrentQuestionIndex(0);
+      setStreaming(true);
+      
+      // Questions arrive in any order with their position in the quiz. The quiz shows the questions
+      // up to the first one still being generated, so indices of answered questions never shift.
+      let slots: (Question | undefined)[] = [];
+      await api.streamAllQuestions((event) => {
+        if (event.type === 'start') {
+          setQuizId(event.quiz_id);
+          slots = new Array(event.total_questions).fill(undefined);
+        } else if (event.type === 'question') {
+          slots[event.position] = event.question;
+          const ready = slots.findIndex(question => question === undefined);
+          const shown = slots.slice(0, ready === -1 ? slots.length : ready) as Question[];
+          if (shown.length > 0) {
+            setQuestions(shown);
+            setQuizStarted(true);
+            setLoading(false);
+          }
+        }
+      });
     } catch (err) {
+      setQuizStarted(false);
       setError('Failed to start quiz. Please try again.');
       console.error('Error starting quiz:', err);
     } finally {
+      setStreaming(false);
       setLoading(false);
     }
   };
@@ -87,7 +107,7 @@ function App() {
     setError(null);
   };
 
-  const allQuestionsAnswered = questions.length > 0 && answers.length === questions.length && 
+  const allQuestionsAnswered = !streaming && questions.length > 0 && answers.length === questions.length && 
     answers.every(a => a.answer && a.confidence !== undefined);
 
   return (
@@ -17,6 +17,12 @@ interface GetAllQuestionsResponse {
   total_questions: number;
 }
 
+type QuestionStreamEvent =
+  | { type: 'start'; quiz_id: string; total_questions: number }
+  | { type: 'question'; position: number; question: Question }
+  | { type: 'complete'; quiz_id: string; total_questions: number }
+  | { type: 'error'; message: string };
+
 interface SubmitQuizRequest {
   quiz_id: string;
   answers: any[];
@@ -78,6 +84,53 @@ export const api = {
     return await response.json();
   },
 
+  streamAllQuestions: async (onEvent: (event: QuestionStreamEvent) => void): Promise<void> => {
+    const response = await fetch(`${API_BASE_URL}/stream_questions`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      credentials: 'include',
+    });
+    
+    if (!response.ok || !response.body) {
+      const errorText = await response.text();
+      let errorMessage = 'Failed to load questions';
+      
+      try {
+        const errorData = JSON.parse(errorText);
+        errorMessage = errorData.message || errorMessage;
+      } catch {
+        errorMessage = errorText || errorMessage;
+      }
+      
+      throw new Error(errorMessage);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop() ?? '';
+      
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        
+        const event = JSON.parse(line) as QuestionStreamEvent;
+        if (event.type === 'error') {
+          throw new Error(event.message);
+        }
+        onEvent(event);
+      }
+    }
+  },
+
   submitQuiz: async (quizData: SubmitQuizRequest): Promise<{ status: string; message: string }> => {
     const response = await fetch(`${API_BASE_URL}/submit_quiz`, {
       method: 'POST',
@@ -106,4 +159,4 @@ export const api = {
   }
 };
 
-export type { StartQuizResponse, GetAllQuestionsResponse, SubmitQuizRequest };
\ No newline at end of file
+export type { StartQuizResponse, GetAllQuestionsResponse, QuestionStreamEvent, SubmitQuizRequest };
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""Training data for the distractor model without padding to max_length
+
+Replaces DistractorDatasetSeq2Seq / DistractorDatasetCausalLM in train.ipynb:
+
+- TokenStore keeps the unpadded token ids of all examples in flat int32
+  arrays with offsets, and can be saved and memory-mapped from disk
+- DynamicPaddingCollator pads each batch to its longest example
+- LengthBucketSampler batches examples of similar length
+- BucketedTrainer is a Trainer that uses the sampler for training
+
+    dataset = DistractorDataset.from_records(train_data, tokenizer, is_seq2seq)
+    trainer = BucketedTrainer(model=model, args=training_args, train_dataset=dataset,
+                              data_collator=DynamicPaddingCollator(tokenizer.pad_token_id), ...)
+"""
+import os
+import json
+import random
+import logging
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset, Sampler
+from transformers import Trainer
+
+logger = logging.getLogger(__name__)
+
+SPECIAL_TOKENS = ["<distractor1>", "<distractor2>", "<distractor3>"]
+LABEL_PAD_ID = -100
+
+
+def seq2seq_texts(item: Dict) -> tuple:
+    distractors = item["distractors"]
+    return (
+        f"Question: {item['question']} Answer: {item['answer']}",
+        f"<distractor1> {distractors[0]} <distractor2> {distractors[1]} <distractor3> {distractors[2]}"
+    )
+
+
+def causal_texts(item: Dict) -> tuple:
+    # The model is trained on the distractors only, the prompt is masked from the labels
+    return f"Question: {item['question']} Answer: {item['answer']} Distractors:", f" {', '.join(item['distractors'])}"
+
+
+class TokenStore:
+    """Variable-length int32 sequences in one flat array, sequence i is values[offsets[i]:offsets[i + 1]]"""
+
+    def __init__(self, values: np.ndarray, offsets: np.ndarray):
+        self.values = values
+        self.offsets = offsets
+
+    @classmethod
+    def from_sequences(cls, sequences: Sequence[Sequence[int]]) -> 'TokenStore':
+        lengths = np.fromiter((len(seq) for seq in sequences), dtype=np.int64, count=len(sequences))
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        values = np.fromiter((token for seq in sequences for token in seq), dtype=np.int32, count=int(offsets[-1]))
+        return cls(values, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return self.values[self.offsets[index]:self.offsets[index + 1]]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def save(self, path: str):
+        np.save(f"{path}.values.npy", self.values)
+        np.save(f"{path}.offsets.npy", self.offsets)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'TokenStore':
+        mode = 'r' if mmap else None
+        return cls(np.load(f"{path}.values.npy", mmap_mode=mode), np.load(f"{path}.offsets.npy", mmap_mode=mode))
+
+
+class DistractorDataset(Dataset):
+    """Unpadded examples: inputs and targets for seq2seq, prompt + distractors with a masked prompt for causal LMs"""
+
+    def __init__(self, inputs: TokenStore, targets: Optional[TokenStore] = None,
+                 prompt_lengths: Optional[np.ndarray] = None):
+        self.inputs = inputs
+        self.targets = targets
+        self.prompt_lengths = prompt_lengths
+
+    @property
+    def is_seq2seq(self) -> bool:
+        return self.targets is not None
+
+    @classmethod
+    def from_records(cls, data: Sequence[Dict], tokenizer, is_seq2seq: bool, max_length: int = 512) -> 'DistractorDataset':
+        """Tokenize all records in batched tokenizer calls"""
+        if is_seq2seq:
+            tokenizer.add_special_tokens({"additional_special_tokens": SPECIAL_TOKENS})
+            sources, targets = zip(*(seq2seq_texts(item) for item in data)) if data else ((), ())
+            encoded_sources = tokenizer(list(sources), max_length=max_length, truncation=True)['input_ids']
+            encoded_targets = tokenizer(list(targets), max_length=max_length, truncation=True)['input_ids']
+            return cls(TokenStore.from_sequences(encoded_sources), TokenStore.from_sequences(encoded_targets))
+
+        prompts, completions = zip(*(causal_texts(item) for item in data)) if data else ((), ())
+        encoded = tokenizer([p + c for p, c in zip(prompts, completions)], max_length=max_length, truncation=True)['input_ids']
+        # Same special tokens as the full sequence (e.g. a leading BOS), minus any the tokenizer appends at the end
+        special_ids = set(tokenizer.all_special_ids)
+        prompt_lengths = []
+        for ids in tokenizer(list(prompts))['input_ids']:
+            length = len(ids)
+            while length and ids[length - 1] in special_ids:
+                length -= 1
+            prompt_lengths.append(length)
+
+        # Examples truncated into the prompt have no label left to train on (and a NaN loss)
+        keep = [i for i, (ids, length) in enumerate(zip(encoded, prompt_lengths)) if len(ids) > length]
+        if len(keep) < len(encoded):
+            logger.warning(f"Skipped {len(encoded) - len(keep)} of {len(encoded)} examples whose distractors "
+                           f"were truncated away at max_length={max_length}")
+        return cls(TokenStore.from_sequences([encoded[i] for i in keep]),
+                   prompt_lengths=np.asarray([prompt_lengths[i] for i in keep], dtype=np.int32))
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.inputs.save(os.path.join(directory, 'inputs'))
+        if self.is_seq2seq:
+            self.targets.save(os.path.join(directory, 'targets'))
+        else:
+            np.save(os.path.join(directory, 'prompt_lengths.npy'), self.prompt_lengths)
+        with open(os.path.join(directory, 'dataset.json'), 'w', encoding='utf-8') as f:
+            json.dump({'examples': len(self), 'is_seq2seq': self.is_seq2seq, 'tokens': int(self.inputs.offsets[-1])}, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'DistractorDataset':
+        """Load a saved dataset, memory-mapped by default so workers share the pages"""
+        with open(os.path.join(directory, 'dataset.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        inputs = TokenStore.load(os.path.join(directory, 'inputs'), mmap)
+        if meta['is_seq2seq']:
+            return cls(inputs, TokenStore.load(os.path.join(directory, 'targets'), mmap))
+        return cls(inputs, prompt_lengths=np.load(os.path.join(directory, 'prompt_lengths.npy')))
+
+    def __len__(self) -> int:
+        return len(self.inputs)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """Padded batch cost per example, used for bucketing"""
+        if self.is_seq2seq:
+            return np.maximum(self.inputs.lengths, self.targets.lengths)
+        return self.inputs.lengths
+
+    def __getitem__(self, index: int) -> Dict[str, np.ndarray]:
+        input_ids = self.inputs[index]
+        if self.is_seq2seq:
+            return {'input_ids': input_ids, 'labels': self.targets[index]}
+        labels = np.array(input_ids, dtype=np.int64)
+        labels[:self.prompt_lengths[index]] = LABEL_PAD_ID
+        return {'input_ids': input_ids, 'labels': labels}
+
+
+class DynamicPaddingCollator:
+    """Pad input_ids, attention_mask and labels to the longest example of the batch"""
+
+    def __init__(self, pad_token_id: int, label_pad_id: int = LABEL_PAD_ID, pad_to_multiple_of: Optional[int] = None):
+        self.pad_token_id = pad_token_id
+        self.label_pad_id = label_pad_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+
+    def _padded_length(self, sequences: List[np.ndarray]) -> int:
+        length = max(len(seq) for seq in sequences)
+        if self.pad_to_multiple_of:
+            length = -(-length // self.pad_to_multiple_of) * self.pad_to_multiple_of
+        return length
+
+    def _pad(self, sequences: List[np.ndarray], value: int) -> torch.Tensor:
+        batch = torch.full((len(sequences), self._padded_length(sequences)), value, dtype=torch.long)
+        for i, seq in enumerate(sequences):
+            batch[i, :len(seq)] = torch.from_numpy(np.asarray(seq, dtype=np.int64))
+        return batch
+
+    def __call__(self, features: List[Dict[str, np.ndarray]]) -> Dict[str, torch.Tensor]:
+        inputs = [feature['input_ids'] for feature in features]
+        input_ids = self._pad(inputs, self.pad_token_id)
+        attention_mask = torch.zeros_like(input_ids)
+        for i, seq in enumerate(inputs):
+            attention_mask[i, :len(seq)] = 1
+        return {
+            'input_ids': input_ids,
+            'attention_mask': attention_mask,
+            'labels': self._pad([feature['labels'] for feature in features], self.label_pad_id)
+        }
+
+
+class LengthBucketSampler(Sampler):
+    """Shuffled indices where each run of batch_size has a similar length
+
+    Indices are shuffled, split into buckets of batch_size * bucket_batches,
+    sorted by length within a bucket and cut into batches, and the batches are
+    shuffled again, so batches stay random but carry little padding. Each
+    iteration is a new epoch with a new order.
+    """
+
+    def __init__(self, lengths: Sequence[int], batch_size: int, bucket_batches: int = 50, seed: int = 42):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.bucket_size = batch_size * bucket_batches
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __iter__(self) -> Iterator[int]:
+        rng = random.Random(self.seed + self.epoch)
+        self.epoch += 1
+
+        indices = list(range(len(self.lengths)))
+        rng.shuffle(indices)
+        batches = []
+        for start in range(0, len(indices), self.bucket_size):
+            bucket = sorted(indices[start:start + self.bucket_size], key=lambda i: self.lengths[i])
+            batches.extend(bucket[i:i + self.batch_size] for i in range(0, len(bucket), self.batch_size))
+        rng.shuffle(batches)
+        return iter([index for batch in batches for index in batch])
+
+
+class BucketedTrainer(Trainer):
+    """Trainer with length-bucketed training batches and length-sorted evaluation batches"""
+
+    def _get_train_sampler(self, *args, **kwargs):
+        dataset = self.train_dataset
+        if not isinstance(dataset, DistractorDataset):
+            return super()._get_train_sampler(*args, **kwargs)
+        # Every process of a distributed run would need its own shard, keep the default sampler there
+        if self.args.world_size > 1:
+            return super()._get_train_sampler(*args, **kwargs)
+        return LengthBucketSampler(dataset.lengths, self.args.per_device_train_batch_size, seed=self.args.seed)
+
+    def _get_eval_sampler(self, eval_dataset):
+        if not isinstance(eval_dataset, DistractorDataset) or self.args.world_size > 1:
+            return super()._get_eval_sampler(eval_dataset)
+        # Loss is averaged over the set, so the order does not matter
+        return [int(i) for i in np.argsort(eval_dataset.lengths, kind='stable')]
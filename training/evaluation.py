@@ -0,0 +1,328 @@
+"""Evaluate a trained distractor model on a test set
+
+    python -m training.evaluation --model distractor_model/final \
+        --test-data quiz_results/arithmetik_questions_with_distractors.json --output evaluation.json
+
+Same metrics as evaluate_model in train.ipynb, but the embedding model is
+loaded once, gold distractor embeddings are cached across evaluations,
+generation and encoding run in batches and the similarities of the whole test
+set are computed with one batched matrix product.
+"""
+import re
+import json
+import time
+import logging
+import argparse
+from typing import Dict, List, Optional, Sequence, Union
+
+from training.rouge import rouge_scores
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+
+def _require_numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError("Evaluation needs numpy: pip install numpy")
+    return np
+
+
+def build_prompt(question: str, answer: str, is_seq2seq: bool) -> str:
+    return f"Question: {question} Answer: {answer}" if is_seq2seq else f"Question: {question} Answer: {answer} Distractors:"
+
+
+def _split_distractors(text: str, sentences: bool) -> List[str]:
+    if ',' in text:
+        return [d.strip() for d in text.split(',')]
+    parts = text.split()
+    if all(d.replace('.', '').isdigit() for d in parts):
+        return parts
+    if sentences:
+        split = re.split(r'[.!?]\s+', text)
+        if len(split) > 1:
+            return [s.strip() + '.' for s in split if s.strip()]
+    return [text]
+
+
+def extract_distractors(generated_text: str, is_seq2seq: bool) -> List[str]:
+    """Parse one generated sequence like generate_distractors in train.ipynb"""
+    if is_seq2seq:
+        if "<distractor1>" not in generated_text:
+            return _split_distractors(generated_text.strip(), sentences=False)
+        distractors = []
+        for part in generated_text.split("<distractor")[1:]:
+            if ">" in part:
+                distractors.append(part.split(">", 1)[1].split("<distractor")[0].strip())
+        return distractors
+
+    if "Distractors:" not in generated_text:
+        return []
+    return _split_distractors(generated_text.split("Distractors:")[1].strip(), sentences=True)
+
+
+def select_distractors(candidates: Sequence[str], answer: str, num_distractors: int) -> List[str]:
+    unique = []
+    seen = set()
+    for distractor in candidates:
+        cleaned = distractor.strip()
+        if cleaned and cleaned not in seen and cleaned.lower() != answer.lower():
+            seen.add(cleaned)
+            unique.append(cleaned)
+
+    if not unique and answer.replace('.', '').isdigit():
+        base = float(answer)
+        unique = [str(round(base * 0.9, 2)), str(round(base * 1.1, 2)), str(round(base * 0.95, 2))]
+    return unique[:num_distractors]
+
+
+def generate_batch(model, tokenizer, items: Sequence[tuple], is_seq2seq: bool,
+                   num_distractors: Union[int, Sequence[int]] = 3, max_length: int = 100,
+                   batch_size: int = 16) -> List[List[str]]:
+    """Generate distractors for (question, answer) items, batch_size prompts per generate() call
+
+    num_distractors is one count for all items or one per item. As in train.ipynb
+    the count also sets num_return_sequences, so items are batched with others
+    of the same count.
+    """
+    import torch
+
+    counts = [num_distractors] * len(items) if isinstance(num_distractors, int) else list(num_distractors)
+    if len(counts) != len(items):
+        raise ValueError(f"Got {len(counts)} distractor counts for {len(items)} items")
+    groups = {}
+    for index, count in enumerate(counts):
+        groups.setdefault(count, []).append(index)
+
+    # Decoder-only models continue the last token, so pad prompts on the left
+    padding_side = tokenizer.padding_side
+    if not is_seq2seq:
+        tokenizer.padding_side = 'left'
+
+    results: List[List[str]] = [[] for _ in items]
+    try:
+        for count, indices in groups.items():
+            num_sequences = count * 2
+            for start in range(0, len(indices), batch_size):
+                chunk = indices[start:start + batch_size]
+                prompts = [build_prompt(*items[i], is_seq2seq) for i in chunk]
+                inputs = tokenizer(prompts, return_tensors="pt", padding=True)
+                with torch.no_grad():
+                    output = model.generate(
+                        inputs["input_ids"].to(model.device),
+                        attention_mask=inputs["attention_mask"].to(model.device),
+                        max_length=min(inputs["input_ids"].shape[1] + max_length, 512),
+                        num_return_sequences=num_sequences,
+                        num_beams=num_sequences,
+                        temperature=0.8,
+                        top_p=0.92,
+                        do_sample=True,
+                        pad_token_id=tokenizer.eos_token_id,
+                        repetition_penalty=1.2,
+                        no_repeat_ngram_size=2,
+                        early_stopping=True
+                    )
+                texts = tokenizer.batch_decode(output, skip_special_tokens=True)
+
+                # generate() returns num_sequences rows per prompt, grouped by prompt
+                for position, index in enumerate(chunk):
+                    candidates = []
+                    for text in texts[position * num_sequences:(position + 1) * num_sequences]:
+                        candidates.extend(extract_distractors(text, is_seq2seq))
+                    results[index] = select_distractors(candidates, items[index][1], count)
+    finally:
+        tokenizer.padding_side = padding_side
+    return results
+
+
+class EmbeddingScorer:
+    """Mean over generated distractors of the best cosine similarity to a gold distractor
+
+    The sentence embedding model is loaded on first use and gold embeddings are
+    kept, so repeated evaluations on the same test set (sweep trials) only
+    encode the generated distractors.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, device: Optional[str] = None, batch_size: int = 256):
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self._model = None
+        self._gold_cache: Dict[str, object] = {}
+
+    @property
+    def model(self):
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise RuntimeError("Embedding scores need sentence-transformers: pip install sentence-transformers")
+            logger.info(f"Loading embedding model {self.model_name}")
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def encode(self, texts: Sequence[str]):
+        """Unit-length embeddings, each distinct text encoded once"""
+        np = _require_numpy()
+        unique = list(dict.fromkeys(texts))
+        if not unique:
+            return np.zeros((0, 0), dtype=np.float32)
+        embeddings = self.model.encode(
+            unique, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+        index = {text: i for i, text in enumerate(unique)}
+        return embeddings[[index[text] for text in texts]]
+
+    def encode_gold(self, texts: Sequence[str]):
+        np = _require_numpy()
+        missing = [text for text in dict.fromkeys(texts) if text not in self._gold_cache]
+        if missing:
+            for text, embedding in zip(missing, self.encode(missing)):
+                self._gold_cache[text] = embedding
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.stack([self._gold_cache[text] for text in texts])
+
+    def score(self, generated: Sequence[Sequence[str]], gold: Sequence[Sequence[str]]) -> List[float]:
+        """Per-example scores, 0.0 where either side is empty"""
+        np = _require_numpy()
+        generated = [[str(d) for d in ds if d] for ds in generated]
+        gold = [[str(d) for d in ds if d] for ds in gold]
+        if not any(generated) or not any(gold):
+            return [0.0] * len(generated)
+
+        gen_flat = self.encode([d for ds in generated for d in ds])
+        gold_flat = self.encode_gold([d for ds in gold for d in ds])
+        dim = max(gen_flat.shape[1], gold_flat.shape[1])
+
+        # Pad both sides to [examples, max count, dim] and mask the padding
+        n = len(generated)
+        max_gen = max(1, max(len(ds) for ds in generated))
+        max_gold = max(1, max(len(ds) for ds in gold))
+        gen = np.zeros((n, max_gen, dim), dtype=np.float32)
+        ref = np.zeros((n, max_gold, dim), dtype=np.float32)
+        gen_mask = np.zeros((n, max_gen), dtype=bool)
+        gold_mask = np.zeros((n, max_gold), dtype=bool)
+
+        gen_offset = gold_offset = 0
+        for i, (gen_ds, gold_ds) in enumerate(zip(generated, gold)):
+            gen[i, :len(gen_ds)] = gen_flat[gen_offset:gen_offset + len(gen_ds)]
+            ref[i, :len(gold_ds)] = gold_flat[gold_offset:gold_offset + len(gold_ds)]
+            gen_mask[i, :len(gen_ds)] = True
+            gold_mask[i, :len(gold_ds)] = True
+            gen_offset += len(gen_ds)
+            gold_offset += len(gold_ds)
+
+        similarity = np.matmul(gen, ref.transpose(0, 2, 1))
+        similarity[~np.broadcast_to(gold_mask[:, None, :], similarity.shape)] = -np.inf
+        best = np.where(gen_mask, similarity.max(axis=2), 0.0)
+
+        counts = gen_mask.sum(axis=1)
+        valid = (counts > 0) & gold_mask.any(axis=1)
+        scores = np.where(valid, best.sum(axis=1) / np.maximum(counts, 1), 0.0)
+        return [float(score) for score in scores]
+
+
+def evaluate_model(model, tokenizer, is_seq2seq: bool, test_data: List[Dict], model_name: str,
+                   scorer: Optional[EmbeddingScorer] = None, batch_size: int = 16,
+                   rouge_workers: Optional[int] = None) -> Dict:
+    """Drop-in for evaluate_model in train.ipynb, returns the same summary"""
+    np = _require_numpy()
+    scorer = scorer or EmbeddingScorer()
+    items = [(item['question'], item['answer']) for item in test_data]
+    gold = [item['distractors'] for item in test_data]
+
+    started = time.perf_counter()
+    # As many distractors as the example has gold ones, like the notebook; the scores average over them
+    generated = generate_batch(model, tokenizer, items, is_seq2seq, [len(ds) for ds in gold], batch_size=batch_size)
+    generation_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    bert_scores = scorer.score(generated, gold)
+    rouge = rouge_scores(generated, gold, workers=rouge_workers)
+    scoring_seconds = time.perf_counter() - started
+
+    results = [
+        {
+            "question": question,
+            "answer": answer,
+            "gold_distractors": gold_ds,
+            "generated_distractors": gen_ds,
+            "bert_score": bert,
+            "rouge1_score": rouge_score['rouge1'],
+            "rouge2_score": rouge_score['rouge2'],
+            "rougeL_score": rouge_score['rougeL']
+        }
+        for (question, answer), gold_ds, gen_ds, bert, rouge_score in zip(items, gold, generated, bert_scores, rouge)
+    ]
+    logger.info(f"Evaluated {model_name} on {len(results)} examples: "
+                f"generation {generation_seconds:.1f}s, scoring {scoring_seconds:.1f}s")
+
+    def mean(key: str) -> float:
+        return float(np.mean([result[key] for result in results])) if results else 0.0
+
+    return {
+        "model_name": model_name,
+        "avg_bert_score": mean("bert_score"),
+        "avg_rouge1_score": mean("rouge1_score"),
+        "avg_rouge2_score": mean("rouge2_score"),
+        "avg_rougeL_score": mean("rougeL_score"),
+        "generation_seconds": generation_seconds,
+        "scoring_seconds": scoring_seconds,
+        "results": results
+    }
+
+
+def load_model(model_path: str, device: Optional[str] = None):
+    """(model, tokenizer, is_seq2seq) for a trained model directory or hub name"""
+    import torch
+    from transformers import AutoConfig, AutoModelForCausalLM, AutoModelForSeq2SeqLM, AutoTokenizer
+
+    is_seq2seq = AutoConfig.from_pretrained(model_path).is_encoder_decoder
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model_class = AutoModelForSeq2SeqLM if is_seq2seq else AutoModelForCausalLM
+    model = model_class.from_pretrained(model_path)
+    model.to(device or ('cuda' if torch.cuda.is_available() else 'cpu'))
+    model.eval()
+    return model, tokenizer, is_seq2seq
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate a distractor model against gold distractors')
+    parser.add_argument('--model', required=True, help='Trained model directory or hub name')
+    parser.add_argument('--test-data', default='quiz_results/arithmetik_questions_with_distractors.json')
+    parser.add_argument('--limit', type=int, help='Only the first N test examples')
+    parser.add_argument('--batch-size', type=int, default=16, help='Prompts per generate() call')
+    parser.add_argument('--embedding-model', default=EMBEDDING_MODEL)
+    parser.add_argument('--device')
+    parser.add_argument('--rouge-workers', type=int, help='ROUGE scoring processes, default one per core for large test sets')
+    parser.add_argument('--output', help='Write the summary with per-example results as JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    with open(args.test_data, 'r', encoding='utf-8') as f:
+        test_data = json.load(f)[:args.limit]
+
+    model, tokenizer, is_seq2seq = load_model(args.model, args.device)
+    scorer = EmbeddingScorer(args.embedding_model, device=args.device)
+    summary = evaluate_model(
+        model, tokenizer, is_seq2seq, test_data, args.model, scorer, args.batch_size, args.rouge_workers
+    )
+
+    print(f"Examples: {len(summary['results'])}")
+    for key in ('avg_bert_score', 'avg_rouge1_score', 'avg_rouge2_score', 'avg_rougeL_score'):
+        print(f"{key:20s} {summary[key]:.4f}")
+    print(f"Generation {summary['generation_seconds']:.1f}s, scoring {summary['scoring_seconds']:.1f}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
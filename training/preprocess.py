@@ -0,0 +1,284 @@
+"""Build the training corpus as checksummed JSONL shards
+
+    python -m training.preprocess --output processed_data/combined \
+        --dataset allenai/math_qa --dataset TIGER-Lab/MMLU-Pro:1351
+    python -m training.preprocess --output processed_data/local --input data/extra_questions.jsonl
+
+The script version of preprocess_data / combine_datasets in train.ipynb.
+Source records are streamed and cut into shards of --shard-size input
+records. The shards are parsed on a process pool and written as
+<source>-<index>.jsonl with {question, answer, distractors} per line.
+manifest.json records the sha256, record count and skip reasons of every
+finished shard. Rerunning the same command resumes: finished shards whose
+checksum still matches are not parsed again.
+"""
+import os
+import re
+import json
+import hashlib
+import logging
+import argparse
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+PLACEHOLDER_DISTRACTOR = "No distractor available"
+
+DATASETS = {
+    "allenai/math_qa": {"split": "train"},
+    "TIGER-Lab/MMLU-Pro": {
+        "split": "test",
+        "categories": ["mathematics", "math", "arithmetic", "geometry", "algebra"]
+    }
+}
+
+MATHQA_OPTIONS = re.compile(r'[a-e]\s*\)\s*([^,]*?)(?=\s*$|\s*,\s*[a-e]\s*\))')
+OPTION_PREFIX = re.compile(r'^\s*[a-e][\):.-]?\s*')
+
+
+def format_options(options_field: Any) -> List[str]:
+    if isinstance(options_field, str):
+        return [opt.strip() for opt in MATHQA_OPTIONS.findall(options_field)]
+    if isinstance(options_field, list):
+        return [OPTION_PREFIX.sub('', opt.strip()) for opt in options_field]
+    raise ValueError(f"Unexpected format in options: {options_field}")
+
+
+def parse_record(item: Dict, max_distractors: int = 3) -> Tuple[Optional[Dict], Optional[str]]:
+    """(record, None) for a usable MathQA or MMLU-Pro item, (None, skip reason) otherwise"""
+    try:
+        if 'Problem' in item:  # MathQA
+            problem, options_field, correct = item['Problem'], item.get('options', ''), item.get('correct', '')
+            if not (problem and options_field and correct):
+                return None, 'missing_fields'
+            options = format_options(options_field)
+            correct_index = ord(correct.lower()) - ord('a')
+            if not 0 <= correct_index < len(options):
+                return None, 'bad_option'
+        elif 'question' in item and 'options' in item:  # MMLU-Pro
+            problem, options, correct_index = item['question'], item.get('options') or [], item.get('answer_index')
+            if not (problem and options and correct_index is not None):
+                return None, 'missing_fields'
+            if not 0 <= correct_index < len(options):
+                return None, 'bad_option'
+        elif 'question' in item and 'answer' in item and 'distractors' in item:  # Already processed
+            problem, options = item['question'], [item['answer'], *item['distractors']]
+            correct_index = 0
+        else:
+            return None, 'unknown_format'
+    except (TypeError, ValueError, AttributeError):
+        return None, 'unparseable'
+
+    distractors = [opt for i, opt in enumerate(options) if i != correct_index][:max_distractors]
+    distractors += [PLACEHOLDER_DISTRACTOR] * (max_distractors - len(distractors))
+    return {"question": problem, "answer": options[correct_index], "distractors": distractors}, None
+
+
+def _source_name(source: str) -> str:
+    return re.sub(r'[^A-Za-z0-9]+', '_', os.path.basename(source) if os.path.exists(source) else source).strip('_')
+
+
+def iter_source(source: str, split: Optional[str] = None) -> Iterator[Dict]:
+    """Records of a local .json/.jsonl file or a Hugging Face dataset, streamed where possible"""
+    if os.path.exists(source):
+        with open(source, 'r', encoding='utf-8') as f:
+            if source.endswith('.jsonl'):
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from json.load(f)
+        return
+
+    try:
+        from datasets import load_dataset
+    except ImportError:
+        raise RuntimeError("Hugging Face sources need datasets: pip install datasets")
+    split = split or DATASETS.get(source, {}).get('split', 'train')
+    for item in load_dataset(source, split=split, streaming=True):
+        yield dict(item)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def process_shard(output_dir: str, filename: str, items: List[Dict], max_distractors: int) -> Dict:
+    """Parse one shard of source records and write it, returns its manifest entry"""
+    skipped = Counter()
+    records = 0
+    path = os.path.join(output_dir, filename)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        for item in items:
+            record, reason = parse_record(item, max_distractors)
+            if record is None:
+                skipped[reason] += 1
+                continue
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            records += 1
+    os.replace(f"{path}.tmp", path)
+    return {'file': filename, 'input_records': len(items), 'records': records,
+            'skipped': dict(skipped), 'sha256': _sha256(path)}
+
+
+class Manifest:
+
+    def __init__(self, output_dir: str, config: Dict):
+        self.path = os.path.join(output_dir, MANIFEST)
+        self.data = {'config': config, 'sources': {}}
+        self._verified = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                existing = json.load(f)
+            if existing.get('config') != config:
+                raise ValueError(f"{self.path} was written with other settings, use a new --output or --overwrite")
+            self.data = existing
+
+    def source(self, name: str) -> Dict:
+        return self.data['sources'].setdefault(name, {'complete': False, 'shards': {}})
+
+    def valid_shard(self, output_dir: str, name: str, index: int) -> bool:
+        entry = self.source(name)['shards'].get(str(index))
+        if entry is None:
+            return False
+        if entry['file'] not in self._verified:
+            path = os.path.join(output_dir, entry['file'])
+            self._verified[entry['file']] = os.path.exists(path) and _sha256(path) == entry['sha256']
+            if not self._verified[entry['file']]:
+                logger.warning(f"Shard {entry['file']} is missing or does not match its checksum, rebuilding it")
+        return self._verified[entry['file']]
+
+    def save(self):
+        with open(f"{self.path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+def preprocess(sources: List[Tuple[str, Optional[int]]], output_dir: str, shard_size: int = 5000,
+               max_distractors: int = 3, workers: Optional[int] = None) -> Dict:
+    """Shard every (source, limit) into output_dir, resuming from its manifest"""
+    os.makedirs(output_dir, exist_ok=True)
+    config = {'shard_size': shard_size, 'max_distractors': max_distractors,
+              'sources': [[source, limit] for source, limit in sources]}
+    manifest = Manifest(output_dir, config)
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for source, limit in sources:
+            name = _source_name(source)
+            state = manifest.source(name)
+            if state['complete'] and all(manifest.valid_shard(output_dir, name, int(i)) for i in state['shards']):
+                logger.info(f"{source}: complete, {len(state['shards'])} shards")
+                continue
+            state['complete'] = False
+            records = iter_source(source)
+            # Category selection comes before the limit, as in the notebook
+            categories = DATASETS.get(source, {}).get('categories')
+            if categories:
+                records = (item for item in records
+                           if any(cat in str(item.get('category', '')).lower() for cat in categories))
+            if limit:
+                records = islice(records, limit)
+
+            pending = {}
+            index = 0
+            while True:
+                items = list(islice(records, shard_size))
+                if not items:
+                    break
+                if not manifest.valid_shard(output_dir, name, index):
+                    filename = f"{name}-{index:05d}.jsonl"
+                    pending[pool.submit(process_shard, output_dir, filename, items, max_distractors)] = index
+                index += 1
+
+                # Bounded read-ahead, records of finished shards are released
+                while len(pending) >= 2 * workers:
+                    _collect(manifest, state, pending)
+            while pending:
+                _collect(manifest, state, pending)
+
+            # Shards of an earlier, longer run of this source
+            for stale in [i for i in state['shards'] if int(i) >= index]:
+                del state['shards'][stale]
+            state['complete'] = True
+            manifest.save()
+
+    return manifest.data
+
+
+def _collect(manifest: Manifest, state: Dict, pending: Dict):
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        entry = future.result()
+        state['shards'][str(pending.pop(future))] = entry
+        manifest.save()
+        skipped = ', '.join(f"{reason}={count}" for reason, count in sorted(entry['skipped'].items())) or 'none'
+        logger.info(f"{entry['file']}: {entry['records']}/{entry['input_records']} records, skipped: {skipped}")
+
+
+def iter_records(output_dir: str, verify: bool = True) -> Iterator[Dict]:
+    """Records of all shards in a preprocessed directory, in source and shard order"""
+    with open(os.path.join(output_dir, MANIFEST), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    for name, state in manifest['sources'].items():
+        if not state['complete']:
+            raise ValueError(f"{name} in {output_dir} is incomplete, rerun training.preprocess to finish it")
+        for index in sorted(state['shards'], key=int):
+            entry = state['shards'][index]
+            path = os.path.join(output_dir, entry['file'])
+            if verify and _sha256(path) != entry['sha256']:
+                raise ValueError(f"{path} does not match its checksum")
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    yield json.loads(line)
+
+
+def _parse_source(value: str) -> Tuple[str, Optional[int]]:
+    source, _, limit = value.rpartition(':')
+    if source and limit.isdigit():
+        return source, int(limit)
+    return value, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Preprocess MathQA / MMLU-Pro style data into checksummed shards')
+    parser.add_argument('--dataset', action='append', default=[], help='Hugging Face dataset, optionally name:limit')
+    parser.add_argument('--input', action='append', default=[], help='Local .json or .jsonl file, optionally path:limit')
+    parser.add_argument('--output', required=True, help='Directory for the shards and manifest.json')
+    parser.add_argument('--shard-size', type=int, default=5000, help='Source records per shard')
+    parser.add_argument('--max-distractors', type=int, default=3)
+    parser.add_argument('--workers', type=int, help='Parsing processes, default one per core')
+    parser.add_argument('--overwrite', action='store_true', help='Discard an existing manifest instead of resuming')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    sources = [_parse_source(value) for value in args.dataset + args.input]
+    if not sources:
+        parser.error("at least one --dataset or --input is required")
+    if args.overwrite and os.path.exists(os.path.join(args.output, MANIFEST)):
+        os.remove(os.path.join(args.output, MANIFEST))
+
+    try:
+        manifest = preprocess(sources, args.output, args.shard_size, args.max_distractors, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    for name, state in manifest['sources'].items():
+        shards = state['shards'].values()
+        skipped = Counter()
+        for entry in shards:
+            skipped.update(entry['skipped'])
+        print(f"{name}: {sum(entry['records'] for entry in shards)} records in {len(shards)} shards, "
+              f"skipped {sum(skipped.values())} {dict(skipped)}")
+
+
+if __name__ == '__main__':
+    main()
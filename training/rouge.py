@@ -0,0 +1,125 @@
+"""ROUGE-1/2/L of generated against gold distractors, in bulk
+
+For each example the score is the mean over generated distractors of the best
+F-measure against any gold distractor, as compute_rouge_scores in
+train.ipynb. Tokenization matches rouge_score (lowercase, alphanumeric tokens,
+Porter stemming of tokens longer than 3 characters), but every gold set is
+tokenized once, stems are memoized and n-gram overlap and LCS are computed
+directly instead of through a RougeScorer per pair. Large test sets are split
+across a process pool.
+"""
+import re
+import logging
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('rouge1', 'rouge2', 'rougeL')
+NON_ALPHANUMERIC = re.compile(r'[^a-z0-9]+')
+
+# Below this many examples a process pool costs more than it saves
+PARALLEL_MIN_EXAMPLES = 2000
+
+_stemmer = None
+
+
+def _get_stemmer():
+    global _stemmer
+    if _stemmer is None:
+        try:
+            from nltk.stem import porter
+        except ImportError:
+            raise RuntimeError("ROUGE stemming needs nltk: pip install rouge-score")
+        _stemmer = porter.PorterStemmer()
+    return _stemmer
+
+
+@lru_cache(maxsize=100000)
+def _stem(token: str) -> str:
+    return _get_stemmer().stem(token)
+
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    return tuple(_stem(token) if len(token) > 3 else token for token in NON_ALPHANUMERIC.sub(' ', text.lower()).split())
+
+
+class _Reference:
+    """A tokenized text with its unigram and bigram counts"""
+
+    __slots__ = ('tokens', 'unigrams', 'bigrams')
+
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.unigrams = Counter(self.tokens)
+        self.bigrams = Counter(zip(self.tokens, self.tokens[1:]))
+
+
+def _fmeasure(overlap: int, predicted: int, target: int) -> float:
+    if not overlap:
+        return 0.0
+    precision = overlap / predicted
+    recall = overlap / target
+    return 2 * precision * recall / (precision + recall)
+
+
+def _ngram_fmeasure(a: Counter, b: Counter) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    overlap = sum(min(count, b[ngram]) for ngram, count in a.items() if ngram in b)
+    return _fmeasure(overlap, sum(a.values()), sum(b.values()))
+
+
+def _lcs_length(a: Sequence[str], b: Sequence[str]) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    previous = [0] * (len(b) + 1)
+    for token in a:
+        current = [0]
+        for j, other in enumerate(b):
+            current.append(previous[j] + 1 if token == other else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+
+def _score_example(generated: Sequence[str], gold: Sequence[str]) -> Dict[str, float]:
+    generated = [_Reference(str(d)) for d in generated if d]
+    gold = [_Reference(str(d)) for d in gold if d]
+    if not generated or not gold:
+        return {metric: 0.0 for metric in METRICS}
+
+    totals = dict.fromkeys(METRICS, 0.0)
+    for gen in generated:
+        best = dict.fromkeys(METRICS, 0.0)
+        for ref in gold:
+            best['rouge1'] = max(best['rouge1'], _ngram_fmeasure(gen.unigrams, ref.unigrams))
+            best['rouge2'] = max(best['rouge2'], _ngram_fmeasure(gen.bigrams, ref.bigrams))
+            if gen.tokens and ref.tokens:
+                lcs = _lcs_length(gen.tokens, ref.tokens)
+                best['rougeL'] = max(best['rougeL'], _fmeasure(lcs, len(gen.tokens), len(ref.tokens)))
+        for metric in METRICS:
+            totals[metric] += best[metric]
+    return {metric: total / len(generated) for metric, total in totals.items()}
+
+
+def _score_chunk(pairs: List[Tuple[Sequence[str], Sequence[str]]]) -> List[Dict[str, float]]:
+    return [_score_example(generated, gold) for generated, gold in pairs]
+
+
+def rouge_scores(generated: Sequence[Sequence[str]], gold: Sequence[Sequence[str]],
+                 workers: Optional[int] = None, chunk_size: int = 500) -> List[Dict[str, float]]:
+    """Per-example {'rouge1', 'rouge2', 'rougeL'} F-measures, 0.0 where either side is empty
+
+    workers=None uses a process pool (one process per core) for large inputs,
+    workers=1 always scores in this process.
+    """
+    pairs = list(zip(generated, gold))
+    if workers == 1 or (workers is None and len(pairs) < PARALLEL_MIN_EXAMPLES):
+        return _score_chunk(pairs)
+
+    chunks = [pairs[start:start + chunk_size] for start in range(0, len(pairs), chunk_size)]
+    logger.info(f"Scoring ROUGE of {len(pairs)} examples in {len(chunks)} chunks")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [scores for chunk in pool.map(_score_chunk, chunks) for scores in chunk]
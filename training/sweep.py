@@ -0,0 +1,311 @@
+"""Hyperparameter sweep with a tokenized-dataset cache and early pruning
+
+    python -m training.sweep --data processed_data/combined --output sweeps/run1 --trials 20
+    python -m training.sweep --data processed_data/combined_data.json --output sweeps/run2 \
+        --models t5-small gpt2 --trials 10 --wandb-project bachelorprojekt
+
+Runs locally; wandb is only used with --wandb-project. Compared to
+train_evaluate_sweep in train.ipynb:
+
+- the train/eval split is tokenized once per tokenizer, prompt template, max
+  length and data version and kept in --cache-dir, later trials load it
+  memory-mapped
+- trials are pruned ASHA-style: at rung epochs grace * eta^k a trial only
+  continues if its eval loss is in the best 1/eta of the trials that reached
+  that rung so far
+- only trials that are not pruned are evaluated on the test set, sharing one
+  embedding model and its gold embedding cache
+"""
+import os
+import json
+import math
+import random
+import hashlib
+import logging
+import argparse
+from typing import Dict, List, Optional
+
+from training.data import (
+    SPECIAL_TOKENS, BucketedTrainer, DistractorDataset, DynamicPaddingCollator, causal_texts, seq2seq_texts
+)
+from training.evaluation import EmbeddingScorer, evaluate_model
+
+logger = logging.getLogger(__name__)
+
+SEARCH_SPACE = {
+    'learning_rate': [1e-6, 1e-5, 5e-5, 1e-4],
+    'batch_size': [8, 16, 32],
+    'model_name': ['facebook/bart-base', 't5-small', 'gpt2'],
+    'gradient_accumulation_steps': [2, 4],
+    'weight_decay': [0.01, 0.05, 0.1],
+    'warmup_ratio': [0.05, 0.1, 0.15],
+    'lr_scheduler_type': ['linear', 'cosine', 'cosine_with_restarts'],
+    'early_stopping_patience': [3, 5]
+}
+
+
+def is_seq2seq_model(model_name: str) -> bool:
+    return "bart" in model_name.lower() or "t5" in model_name.lower()
+
+
+def load_training_data(path: str) -> List[Dict]:
+    """A training.preprocess output directory or a JSON file like combined_data.json"""
+    if os.path.isdir(path):
+        from training.preprocess import iter_records
+        return list(iter_records(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def data_version(path: str) -> str:
+    """Changes whenever the training data changes"""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        from training.preprocess import MANIFEST
+        path = os.path.join(path, MANIFEST)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def split_data(data: List[Dict], eval_fraction: float = 0.2, seed: int = 42):
+    indices = list(range(len(data)))
+    random.Random(seed).shuffle(indices)
+    cut = int(len(data) * eval_fraction)
+    return [data[i] for i in indices[cut:]], [data[i] for i in indices[:cut]]
+
+
+def prepare_tokenizer(model_name: str):
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    if is_seq2seq_model(model_name):
+        tokenizer.add_special_tokens({"additional_special_tokens": SPECIAL_TOKENS})
+    return tokenizer
+
+
+class TokenizedCache:
+    """Tokenized train/eval splits on disk, keyed by everything that changes the token ids"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def key(tokenizer, is_seq2seq: bool, max_length: int, data_version: str, eval_fraction: float, seed: int) -> str:
+        # The template is identified by what it renders for placeholder fields
+        probe = {'question': '{question}', 'answer': '{answer}', 'distractors': ['{d1}', '{d2}', '{d3}']}
+        template = seq2seq_texts(probe) if is_seq2seq else causal_texts(probe)
+        parts = {
+            'tokenizer': [type(tokenizer).__name__, tokenizer.name_or_path, len(tokenizer)],
+            'template': template,
+            'max_length': max_length,
+            'data': data_version,
+            'split': [eval_fraction, seed]
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    def get(self, data_path: str, tokenizer, is_seq2seq: bool, max_length: int = 512,
+            eval_fraction: float = 0.2, seed: int = 42):
+        """(train, eval) datasets, tokenized on the first request and loaded memory-mapped afterwards"""
+        key = self.key(tokenizer, is_seq2seq, max_length, data_version(data_path), eval_fraction, seed)
+        directory = os.path.join(self.cache_dir, key)
+        if os.path.exists(os.path.join(directory, 'eval', 'dataset.json')):
+            logger.info(f"Using tokenized datasets from {directory}")
+            return DistractorDataset.load(os.path.join(directory, 'train')), DistractorDataset.load(os.path.join(directory, 'eval'))
+
+        logger.info(f"Tokenizing {data_path} for {tokenizer.name_or_path} into {directory}")
+        train_data, eval_data = split_data(load_training_data(data_path), eval_fraction, seed)
+        train = DistractorDataset.from_records(train_data, tokenizer, is_seq2seq, max_length)
+        evaluation = DistractorDataset.from_records(eval_data, tokenizer, is_seq2seq, max_length)
+        # eval is written last and marks the entry as complete
+        train.save(os.path.join(directory, 'train'))
+        evaluation.save(os.path.join(directory, 'eval'))
+        return train, evaluation
+
+
+class SuccessiveHalving:
+    """Asynchronous successive halving over sequential trials (minimizing a metric)
+
+    Rungs are at epochs grace * eta^k. A trial reaching a rung continues if its
+    value is among the best 1/eta of all values recorded at that rung, once at
+    least min_trials have reached it.
+    """
+
+    def __init__(self, max_epochs: int, grace: int = 1, eta: int = 3, min_trials: Optional[int] = None):
+        self.eta = eta
+        self.min_trials = min_trials or eta
+        self.rungs = []
+        epoch = grace
+        while epoch < max_epochs:
+            self.rungs.append(epoch)
+            epoch *= eta
+        self.results: Dict[int, List[float]] = {rung: [] for rung in self.rungs}
+
+    def should_stop(self, epoch: int, value: float) -> bool:
+        if epoch not in self.results:
+            return False
+        values = self.results[epoch]
+        values.append(value)
+        if len(values) < self.min_trials:
+            return False
+        keep = max(1, math.floor(len(values) / self.eta))
+        return sorted(values).index(value) >= keep
+
+
+def _trial_callback(scheduler: SuccessiveHalving, patience: int, trial: Dict):
+    from transformers import TrainerCallback
+
+    class TrialCallback(TrainerCallback):
+        """Reports eval loss per epoch to the scheduler and stops pruned or stalled trials"""
+
+        def __init__(self):
+            self.best = math.inf
+            self.stalled = 0
+
+        def on_evaluate(self, args, state, control, metrics=None, **kwargs):
+            loss = (metrics or {}).get('eval_loss')
+            if loss is None:
+                return
+            epoch = round(state.epoch or 0)
+            trial['eval_losses'].append(loss)
+
+            if loss < self.best:
+                self.best, self.stalled = loss, 0
+            else:
+                self.stalled += 1
+            if patience and self.stalled >= patience:
+                trial['status'] = 'early_stopped'
+                control.should_training_stop = True
+            elif scheduler.should_stop(epoch, loss):
+                trial['status'] = 'pruned'
+                trial['pruned_at_epoch'] = epoch
+                control.should_training_stop = True
+
+    return TrialCallback()
+
+
+def sample_configs(num_trials: int, models: Optional[List[str]], seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+    space = {**SEARCH_SPACE, 'model_name': models or SEARCH_SPACE['model_name']}
+    return [{name: rng.choice(values) for name, values in space.items()} for _ in range(num_trials)]
+
+
+def run_trial(number: int, config: Dict, args, cache: TokenizedCache, scheduler: SuccessiveHalving,
+              scorer: EmbeddingScorer, test_data: List[Dict]) -> Dict:
+    import torch
+    from transformers import AutoModelForCausalLM, AutoModelForSeq2SeqLM, TrainingArguments
+
+    model_name = config['model_name']
+    is_seq2seq = is_seq2seq_model(model_name)
+    tokenizer = prepare_tokenizer(model_name)
+    train_dataset, eval_dataset = cache.get(args.data, tokenizer, is_seq2seq, args.max_length)
+
+    model = (AutoModelForSeq2SeqLM if is_seq2seq else AutoModelForCausalLM).from_pretrained(model_name)
+    model.resize_token_embeddings(len(tokenizer))
+
+    trial = {'trial': number, 'config': config, 'status': 'completed', 'eval_losses': []}
+    trial_dir = os.path.join(args.output, f"trial-{number:03d}")
+    training_args = TrainingArguments(
+        output_dir=trial_dir,
+        run_name=f"{model_name.split('/')[-1]}-lr{config['learning_rate']}-bs{config['batch_size']}-trial{number}",
+        num_train_epochs=args.max_epochs,
+        per_device_train_batch_size=config['batch_size'],
+        per_device_eval_batch_size=config['batch_size'],
+        eval_strategy="epoch",
+        save_strategy="no",
+        logging_steps=100,
+        learning_rate=config['learning_rate'],
+        weight_decay=config['weight_decay'],
+        warmup_ratio=config['warmup_ratio'],
+        lr_scheduler_type=config['lr_scheduler_type'],
+        fp16=torch.cuda.is_available(),
+        gradient_accumulation_steps=config['gradient_accumulation_steps'],
+        report_to="wandb" if args.wandb_project else "none",
+        seed=args.seed
+    )
+
+    run = None
+    if args.wandb_project:
+        import wandb
+        run = wandb.init(project=args.wandb_project, config=config)
+
+    try:
+        trainer = BucketedTrainer(
+            model=model,
+            args=training_args,
+            train_dataset=train_dataset,
+            eval_dataset=eval_dataset,
+            data_collator=DynamicPaddingCollator(tokenizer.pad_token_id),
+            callbacks=[_trial_callback(scheduler, config['early_stopping_patience'], trial)]
+        )
+        trainer.train()
+        trial['epochs'] = len(trial['eval_losses'])
+        trial['eval_loss'] = min(trial['eval_losses'], default=None)
+
+        if trial['status'] != 'pruned':
+            summary = evaluate_model(model, tokenizer, is_seq2seq, test_data, model_name, scorer, args.eval_batch_size)
+            trial.update({key: value for key, value in summary.items() if key.startswith('avg_')})
+            if args.save_models:
+                final_dir = os.path.join(trial_dir, 'final')
+                model.save_pretrained(final_dir)
+                tokenizer.save_pretrained(final_dir)
+                trial['model_dir'] = final_dir
+        if run is not None:
+            run.log({key: value for key, value in trial.items() if isinstance(value, (int, float))})
+    finally:
+        if run is not None:
+            run.finish()
+    return trial
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hyperparameter sweep with dataset caching and successive halving')
+    parser.add_argument('--data', required=True, help='training.preprocess directory or a JSON file of records')
+    parser.add_argument('--test-data', default='quiz_results/arithmetik_questions_with_distractors.json')
+    parser.add_argument('--output', required=True, help='Directory for trial outputs and results.jsonl')
+    parser.add_argument('--cache-dir', default='processed_data/tokenized_cache')
+    parser.add_argument('--trials', type=int, default=10)
+    parser.add_argument('--models', nargs='+', help=f"Restrict model_name, default {SEARCH_SPACE['model_name']}")
+    parser.add_argument('--max-epochs', type=int, default=9)
+    parser.add_argument('--grace-epochs', type=int, default=1, help='First rung')
+    parser.add_argument('--eta', type=int, default=3, help='Keep the best 1/eta of the trials at each rung')
+    parser.add_argument('--max-length', type=int, default=512)
+    parser.add_argument('--eval-batch-size', type=int, default=16, help='Prompts per generate() call in evaluation')
+    parser.add_argument('--save-models', action='store_true', help='Save the model of every trial that is not pruned')
+    parser.add_argument('--wandb-project', help='Also log trials to wandb')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    os.makedirs(args.output, exist_ok=True)
+
+    with open(args.test_data, 'r', encoding='utf-8') as f:
+        test_data = json.load(f)
+
+    cache = TokenizedCache(args.cache_dir)
+    scheduler = SuccessiveHalving(args.max_epochs, args.grace_epochs, args.eta)
+    scorer = EmbeddingScorer()
+    results_path = os.path.join(args.output, 'results.jsonl')
+
+    trials = []
+    for number, config in enumerate(sample_configs(args.trials, args.models, args.seed)):
+        logger.info(f"Trial {number}: {config}")
+        trial = run_trial(number, config, args, cache, scheduler, scorer, test_data)
+        trials.append(trial)
+        with open(results_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(trial) + '\n')
+        logger.info(f"Trial {number} {trial['status']} after {trial['epochs']} epochs, eval loss {trial['eval_loss']}")
+
+    evaluated = [trial for trial in trials if 'avg_bert_score' in trial]
+    print(f"{len(trials)} trials, {sum(trial['status'] == 'pruned' for trial in trials)} pruned, "
+          f"{sum(trial['epochs'] for trial in trials)} epochs trained (without pruning {len(trials) * args.max_epochs})")
+    for trial in sorted(evaluated, key=lambda trial: trial['avg_bert_score'], reverse=True)[:5]:
+        print(f"trial {trial['trial']:3d} bert={trial['avg_bert_score']:.4f} rouge1={trial['avg_rouge1_score']:.4f} "
+              f"eval_loss={trial['eval_loss']:.4f} {trial['config']}")
+
+
+if __name__ == '__main__':
+    main()
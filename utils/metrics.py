@@ -0,0 +1,435 @@
+"""Counters, gauges and histograms exposed in the Prometheus text format
+
+Every process (gunicorn workers, the inference server) keeps its metrics in
+memory and periodically writes a snapshot to METRICS_DIR. /metrics merges the
+snapshots of all processes, so counts aggregate across workers. Counters and
+histograms of exited processes are kept, folded into one metrics-retired.json;
+gauges only count live processes. Snapshot files carry a random token besides
+the pid, so a new process that reuses a pid does not overwrite an old snapshot.
+"""
+import os
+import copy
+import json
+import time
+import atexit
+import bisect
+import logging
+import secrets
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows, snapshots of exited processes are then kept as they are
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RETIRED_SNAPSHOT = 'metrics-retired.json'
+
+
+def _label_key(labelnames: Tuple[str, ...], labels: Dict[str, str]) -> str:
+    return json.dumps([str(labels.get(name, '')) for name in labelnames])
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _describe(self) -> dict:
+        return {'type': self.kind, 'help': self.documentation, 'labels': list(self.labelnames)}
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self._describe(), 'samples': dict(self._values)}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self.registry.touch()
+
+
+class Gauge(_Metric):
+    """mode says how values of several processes combine: 'sum' or 'max' (for values every process sees alike)"""
+    kind = 'gauge'
+
+    def __init__(self, registry, name, documentation, labelnames=(), mode: str = 'sum'):
+        super().__init__(registry, name, documentation, labelnames)
+        self.mode = mode
+
+    def _describe(self) -> dict:
+        return {**super()._describe(), 'mode': self.mode}
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+        self.registry.touch()
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _describe(self) -> dict:
+        return {**super()._describe(), 'buckets': list(self.buckets)}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._values.get(key)
+            if sample is None:
+                # Non-cumulative bucket counts plus one overflow bucket, then sum and count
+                sample = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            sample[0][index] += 1
+            sample[1] += value
+            sample[2] += 1
+        self.registry.touch()
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = {key: [list(counts), total, count] for key, (counts, total, count) in self._values.items()}
+        return {**self._describe(), 'samples': samples}
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self.directory = None
+        self.flush_interval = 5.0
+        self.enabled = False
+        self._flusher_pid = None
+        self._token = None
+        self._started = None
+        self._start_lock = threading.Lock()
+
+    def configure(self, directory: str, flush_interval: float = 5.0, enabled: bool = True, clear: bool = False):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        if not enabled:
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        if clear:
+            for name in os.listdir(directory):
+                if name.startswith('metrics-') and name.endswith('.json'):
+                    os.remove(os.path.join(directory, name))
+        self.touch()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), mode: str = 'sum') -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames, mode))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def on_collect(self, collector: Callable[[], None]):
+        """Run collector before every snapshot, e.g. to set a gauge from the current state"""
+        self._collectors.append(collector)
+
+    def touch(self):
+        # The flush thread is started lazily per process, threads do not survive fork
+        if self.enabled and self._flusher_pid != os.getpid():
+            with self._start_lock:
+                if self._flusher_pid != os.getpid():
+                    self._flusher_pid = os.getpid()
+                    # pids get reused, the token tells this process from an exited one with the same pid
+                    self._token = secrets.token_hex(4)
+                    self._started = time.time()
+                    threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.directory, f"metrics-{os.getpid()}-{self._token}.json")
+
+    def flush(self):
+        """Write this process's metrics to its snapshot file"""
+        if not self.enabled:
+            return
+        self.touch()
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+
+        snapshot = {
+            'pid': os.getpid(),
+            'token': self._token,
+            'started': self._started,
+            'metrics': {name: metric.snapshot() for name, metric in self._metrics.items()}
+        }
+        path = self._snapshot_path()
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write metrics snapshot: {e}")
+
+    def _read_snapshots(self) -> Dict[str, dict]:
+        snapshots = {}
+        for name in os.listdir(self.directory):
+            if not (name.startswith('metrics-') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                    snapshots[name] = json.load(f)
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def _load_snapshots(self) -> List[dict]:
+        """Snapshots of all processes, each marked alive or not, plus the retired totals"""
+        self.flush()
+        if fcntl is None:
+            return self._mark_alive(self._read_snapshots())
+
+        with open(os.path.join(self.directory, '.metrics.lock'), 'a') as lock:
+            # Only one process at a time may fold snapshots into the retired totals
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                return self._retire(self._read_snapshots())
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _mark_alive(self, snapshots: Dict[str, dict]) -> List[dict]:
+        # Of several snapshots with one pid only the newest can belong to a running process
+        newest = {}
+        for snapshot in snapshots.values():
+            if 'pid' in snapshot:
+                newest[snapshot['pid']] = max(newest.get(snapshot['pid'], 0), snapshot.get('started') or 0)
+        for snapshot in snapshots.values():
+            if 'pid' in snapshot:
+                snapshot['alive'] = (snapshot.get('started') or 0) >= newest[snapshot['pid']] and self._alive(snapshot['pid'])
+        return list(snapshots.values())
+
+    def _retire(self, snapshots: Dict[str, dict]) -> List[dict]:
+        """Fold counters and histograms of exited processes into RETIRED_SNAPSHOT and remove their files"""
+        retired = snapshots.pop(RETIRED_SNAPSHOT, None) or {'metrics': {}, 'folded': []}
+        # Already folded by a run that stopped before removing them
+        for name in retired.get('folded', []):
+            if snapshots.pop(name, None) is not None:
+                self._remove(name)
+
+        live = self._mark_alive(snapshots)
+        dead = [name for name, snapshot in snapshots.items() if not snapshot['alive']]
+        if not dead:
+            return live + [retired]
+
+        folded = {'metrics': copy.deepcopy(retired['metrics']), 'folded': dead}
+        for name in dead:
+            for metric_name, metric in snapshots[name]['metrics'].items():
+                if metric['type'] == 'gauge':
+                    continue
+                target = folded['metrics'].setdefault(metric_name, {**metric, 'samples': {}})
+                _merge_samples(metric['type'], target['samples'], metric['samples'])
+
+        path = os.path.join(self.directory, RETIRED_SNAPSHOT)
+        try:
+            with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(folded, f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning(f"Failed to write retired metrics: {e}")
+            return live + [retired]
+        for name in dead:
+            self._remove(name)
+        return [snapshot for snapshot in live if snapshot['alive']] + [folded]
+
+    def _remove(self, name: str):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def collect(self) -> Dict[str, dict]:
+        """Merge the snapshots of all processes"""
+        merged = {}
+        for snapshot in self._load_snapshots():
+            for name, metric in snapshot['metrics'].items():
+                target = merged.setdefault(name, {**metric, 'samples': {}})
+                samples = target['samples']
+
+                if metric['type'] == 'gauge':
+                    if not snapshot.get('alive'):
+                        continue
+                    for key, value in metric['samples'].items():
+                        if metric.get('mode') == 'max':
+                            samples[key] = max(samples.get(key, value), value)
+                        else:
+                            samples[key] = samples.get(key, 0) + value
+                else:
+                    _merge_samples(metric['type'], samples, metric['samples'])
+        return merged
+
+    def render(self) -> str:
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labelnames = metric['labels']
+
+            for key, value in sorted(metric['samples'].items()):
+                labels = list(zip(labelnames, json.loads(key)))
+                if metric['type'] != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip([*metric['buckets'], float('inf')], counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _merge_samples(kind: str, samples: dict, other: dict):
+    """Add counter or histogram samples of another process to samples"""
+    if kind == 'counter':
+        for key, value in other.items():
+            samples[key] = samples.get(key, 0) + value
+        return
+    for key, (counts, total, count) in other.items():
+        current = samples.setdefault(key, [[0] * len(counts), 0.0, 0])
+        current[0] = [a + b for a, b in zip(current[0], counts)]
+        current[1] += total
+        current[2] += count
+
+
+def _format_labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = MetricsRegistry()
+atexit.register(REGISTRY.flush)
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (), mode: str = 'sum') -> Gauge:
+    return REGISTRY.gauge(name, documentation, labelnames, mode)
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+def configure_from_env(clear: bool = False):
+    """Configure the registry from METRICS_* env vars, e.g. in processes that do not create the app"""
+    db_dir = os.path.dirname(os.environ.get('DB_PATH') or 'data/quiz_db.sqlite')
+    REGISTRY.configure(
+        os.environ.get('METRICS_DIR') or os.path.join(db_dir, 'metrics'),
+        flush_interval=float(os.environ.get('METRICS_FLUSH_INTERVAL', '5')),
+        enabled=os.environ.get('METRICS_ENABLED', 'true').lower() == 'true',
+        clear=clear
+    )
+
+
+REQUEST_SECONDS = histogram(
+    'quiz_http_request_duration_seconds', 'HTTP request latency until the response headers are sent',
+    ['endpoint', 'method', 'status']
+)
+
+
+def init_app(app):
+    """Configure the registry from app.config, time every request and serve /metrics"""
+    from flask import Response, g, request
+
+    # Under gunicorn the master clears old snapshots once (gunicorn.conf.py), a single process clears its own
+    REGISTRY.configure(
+        app.config['METRICS_DIR'],
+        flush_interval=app.config.get('METRICS_FLUSH_INTERVAL', 5.0),
+        enabled=app.config.get('METRICS_ENABLED', True),
+        clear=os.environ.get('METRICS_MULTIPROCESS', 'false').lower() != 'true'
+    )
+    if not REGISTRY.enabled:
+        return
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_latency(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+                method=request.method,
+                status=response.status_code
+            )
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus text format, merged across all worker processes"""
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,235 @@
+"""Opt-in per-request profiling
+
+With PROFILING_ENABLED, a request is profiled when it carries
+`X-Profile: <PROFILING_TOKEN>` or is picked by PROFILING_SAMPLE_RATE. The
+request runs under cProfile, and model.generate calls in this process that run
+meanwhile (also on the batch scheduler thread) under the PyTorch profiler.
+Each capture is written to PROFILING_DIR as <id>.prof (pstats) and <id>.txt
+(summary), keeping the newest PROFILING_MAX_CAPTURES.
+
+    python -m utils.profiling list
+    python -m utils.profiling show <id>
+
+When disabled no hooks are registered.
+"""
+import os
+import io
+import time
+import uuid
+import pstats
+import random
+import hmac
+import logging
+import argparse
+import cProfile
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+
+# Captures in progress in this process, generate() calls are profiled only while there are any
+_active = set()
+_active_lock = threading.Lock()
+# Only one cProfile profiler can be active at a time
+_cprofile_lock = threading.Lock()
+
+
+class ProfileCapture:
+
+    def __init__(self, endpoint: str):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.profiler = cProfile.Profile()
+        self.torch_tables: List[str] = []
+
+    def start(self):
+        with _active_lock:
+            _active.add(self)
+        self.profiler.enable()
+
+    def stop(self) -> float:
+        self.profiler.disable()
+        with _active_lock:
+            _active.discard(self)
+        return time.perf_counter() - self.started
+
+    def write(self, directory: str, seconds: float, status: int):
+        self.profiler.dump_stats(os.path.join(directory, f"{self.id}.prof"))
+
+        summary = io.StringIO()
+        summary.write(f"endpoint: {self.endpoint}\nstatus: {status}\nseconds: {seconds:.3f}\n\n")
+        pstats.Stats(self.profiler, stream=summary).sort_stats('cumulative').print_stats(40)
+        for number, table in enumerate(self.torch_tables, 1):
+            summary.write(f"\nmodel.generate call {number} (torch profiler)\n{table}\n")
+        with open(os.path.join(directory, f"{self.id}.txt"), 'w', encoding='utf-8') as f:
+            f.write(summary.getvalue())
+
+
+def profile_generate():
+    """Wrap model.generate in the PyTorch profiler while a request of this process is being profiled"""
+    if not _active:
+        return nullcontext()
+    return _torch_profile()
+
+
+@contextmanager
+def _torch_profile():
+    import torch
+    from torch.profiler import ProfilerActivity, profile
+
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+
+    with profile(activities=activities) as prof:
+        yield
+
+    table = prof.key_averages().table(sort_by='self_cpu_time_total', row_limit=25)
+    with _active_lock:
+        captures = list(_active)
+    for capture in captures:
+        capture.torch_tables.append(table)
+
+
+def list_captures(directory: str) -> List[Dict]:
+    if not os.path.isdir(directory):
+        return []
+    captures = []
+    for name in os.listdir(directory):
+        if not name.endswith('.txt'):
+            continue
+        capture_id = name[:-len('.txt')]
+        path = os.path.join(directory, name)
+        with open(path, 'r', encoding='utf-8') as f:
+            header = dict(line.split(': ', 1) for line in (f.readline().strip() for _ in range(3)) if ': ' in line)
+        captures.append({
+            'id': capture_id,
+            'endpoint': header.get('endpoint'),
+            'status': header.get('status'),
+            'seconds': float(header.get('seconds', 0)),
+            'created': os.path.getmtime(path),
+            'files': [f"{capture_id}.txt", f"{capture_id}.prof"]
+        })
+    return sorted(captures, key=lambda capture: capture['created'], reverse=True)
+
+
+def prune(directory: str, max_captures: int):
+    """Ring buffer: drop the oldest captures beyond max_captures"""
+    for capture in list_captures(directory)[max_captures:]:
+        for name in capture['files']:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def init_app(app):
+    """Register the profiling hooks and endpoints, only when PROFILING_ENABLED is set"""
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+
+    from flask import g, jsonify, request, send_from_directory
+
+    directory = os.path.abspath(app.config['PROFILING_DIR'])
+    os.makedirs(directory, exist_ok=True)
+    sample_rate = app.config.get('PROFILING_SAMPLE_RATE', 0.0)
+    max_captures = app.config.get('PROFILING_MAX_CAPTURES', 50)
+    token = app.config.get('PROFILING_TOKEN')
+
+    def authorized(value: Optional[str]) -> bool:
+        return bool(token) and value is not None and hmac.compare_digest(value, token)
+
+    @app.before_request
+    def start_profile():
+        if request.path.startswith('/profiles'):
+            return
+        requested = authorized(request.headers.get(PROFILE_HEADER))
+        if not requested and not (sample_rate and random.random() < sample_rate):
+            return
+        if not _cprofile_lock.acquire(blocking=False):
+            logger.info(f"Skipping profile of {request.path}, another request is being profiled")
+            return
+        g.profile_capture = ProfileCapture(request.url_rule.rule if request.url_rule else request.path)
+        g.profile_capture.start()
+
+    @app.after_request
+    def finish_profile(response):
+        # Streamed bodies are produced after this point, their profile covers setup only
+        capture = g.pop('profile_capture', None)
+        if capture is None:
+            return response
+        try:
+            seconds = capture.stop()
+            capture.write(directory, seconds, response.status_code)
+            prune(directory, max_captures)
+            response.headers['X-Profile-Id'] = capture.id
+            logger.info(f"Profiled {capture.endpoint} in {seconds:.3f}s as {capture.id}")
+        except Exception as e:
+            logger.error(f"Failed to write profile: {e}")
+        finally:
+            _cprofile_lock.release()
+        return response
+
+    @app.teardown_request
+    def abort_profile(error):
+        # after_request does not run when the view raised
+        capture = g.pop('profile_capture', None)
+        if capture is not None:
+            capture.stop()
+            _cprofile_lock.release()
+
+    def check_token():
+        bearer = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not authorized(bearer):
+            return jsonify({"status": "error", "message": "Profiles require a valid PROFILING_TOKEN"}), 403
+        return None
+
+    @app.route('/profiles', methods=['GET'])
+    def profiles():
+        """Captured profiles, newest first"""
+        denied = check_token()
+        if denied:
+            return denied
+        return jsonify({"status": "success", "profiles": list_captures(directory)})
+
+    @app.route('/profiles/<path:filename>', methods=['GET'])
+    def download_profile(filename):
+        """Download <id>.prof (pstats, e.g. for snakeviz) or <id>.txt"""
+        denied = check_token()
+        if denied:
+            return denied
+        return send_from_directory(directory, filename, as_attachment=True)
+
+    logger.info(f"Profiling enabled (sample rate {sample_rate}), captures in {directory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List and inspect captured request profiles')
+    parser.add_argument('command', choices=['list', 'show', 'stats'])
+    parser.add_argument('id', nargs='?', help='Capture id for show and stats')
+    parser.add_argument('--dir', default=os.environ.get('PROFILING_DIR', 'data/profiles'))
+    parser.add_argument('--sort', default='cumulative', help='pstats sort key for stats')
+    parser.add_argument('--limit', type=int, default=30)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for capture in list_captures(args.dir):
+            created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(capture['created']))
+            print(f"{capture['id']}  {created}  {capture['seconds']:7.3f}s  {capture['status']}  {capture['endpoint']}")
+        return
+
+    if not args.id:
+        parser.error(f"{args.command} needs a capture id")
+    if args.command == 'show':
+        with open(os.path.join(args.dir, f"{args.id}.txt"), 'r', encoding='utf-8') as f:
+            print(f.read())
+    else:
+        pstats.Stats(os.path.join(args.dir, f"{args.id}.prof")).sort_stats(args.sort).print_stats(args.limit)
+
+
+if __name__ == '__main__':
+    main()
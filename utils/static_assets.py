@@ -0,0 +1,181 @@
+"""Serves the built frontend (dist/) from an in-memory manifest
+
+At startup every file in dist/ is read once, gets an ETag from its content and
+gzip/brotli variants (precompressed .gz/.br files next to it, otherwise
+compressed here; brotli needs the optional `brotli` package). Requests pick
+the best variant from Accept-Encoding and answer If-None-Match with 304.
+Vite's content-hashed files (assets/index-<hash>.js) are cached for a year as
+immutable, everything else including index.html has to be revalidated.
+Paths that are not files fall back to index.html for client-side routing.
+Restart the app to pick up a new build.
+"""
+import os
+import re
+import gzip
+import hashlib
+import logging
+import mimetypes
+from typing import Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# build.assetsDir in vite.config.ts. Only Vite writes there, as [name]-[hash][extname] with an
+# 8 character base64url hash; files copied from public/ keep their names and must be revalidated
+ASSETS_DIR = 'assets'
+HASHED_ASSET = re.compile(rf'^{ASSETS_DIR}/[^/]+-[A-Za-z0-9_-]{{8}}\.[A-Za-z0-9]+$')
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/xml',
+                      'application/manifest+json', 'image/svg+xml', 'image/x-icon', 'font/ttf', 'font/otf')
+MIN_COMPRESS_SIZE = 512
+# Larger files are served from disk, only their metadata is kept
+MAX_MEMORY_SIZE = 4 * 1024 * 1024
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# Preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class Asset:
+    """One file of dist/: body (bytes, or a path for large files) per content encoding"""
+
+    __slots__ = ('path', 'mimetype', 'etag', 'hashed', 'variants')
+
+    def __init__(self, path: str, mimetype: str, etag: str, hashed: bool, variants: Dict[str, Union[bytes, str]]):
+        self.path = path
+        self.mimetype = mimetype
+        self.etag = etag
+        self.hashed = hashed
+        self.variants = variants
+
+    @property
+    def cache_control(self) -> str:
+        return IMMUTABLE if self.hashed else REVALIDATE
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _compressible(mimetype: str) -> bool:
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def load_asset(root: str, relative_path: str, brotli=None) -> Asset:
+    file_path = os.path.join(root, relative_path)
+    mimetype = mimetypes.guess_type(relative_path)[0] or 'application/octet-stream'
+    size = os.path.getsize(file_path)
+    in_memory = size <= MAX_MEMORY_SIZE
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        data = f.read() if in_memory else None
+        if data is not None:
+            digest.update(data)
+        else:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+
+    variants: Dict[str, Union[bytes, str]] = {'identity': data if in_memory else file_path}
+    for encoding, suffix in ENCODINGS:
+        precompressed = file_path + suffix
+        if os.path.exists(precompressed):
+            if os.path.getsize(precompressed) > MAX_MEMORY_SIZE:
+                variants[encoding] = precompressed
+            else:
+                with open(precompressed, 'rb') as f:
+                    variants[encoding] = f.read()
+        elif in_memory and size >= MIN_COMPRESS_SIZE and _compressible(mimetype):
+            if encoding == 'gzip':
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            elif brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+            else:
+                continue
+            # Not worth a Content-Encoding for a few bytes
+            if len(compressed) < 0.9 * size:
+                variants[encoding] = compressed
+
+    return Asset(relative_path, mimetype, digest.hexdigest()[:32],
+                 bool(HASHED_ASSET.match(relative_path)), variants)
+
+
+def build_manifest(root: str) -> Dict[str, Asset]:
+    """Every file under root by its URL path, without the .gz/.br siblings of other files"""
+    manifest = {}
+    if not os.path.isdir(root):
+        logger.warning(f"Frontend build {root} not found, run `npm run build`")
+        return manifest
+
+    brotli = _brotli()
+    for directory, _, filenames in os.walk(root):
+        names = set(filenames)
+        for name in filenames:
+            base, extension = os.path.splitext(name)
+            if extension in ('.gz', '.br') and base in names:
+                continue
+            relative_path = os.path.relpath(os.path.join(directory, name), root).replace(os.sep, '/')
+            manifest[relative_path] = load_asset(root, relative_path, brotli)
+
+    encoded = sum(len(asset.variants) > 1 for asset in manifest.values())
+    logger.info(f"Static manifest: {len(manifest)} files from {root}, {encoded} with compressed variants"
+                f"{'' if brotli else ' (gzip only, pip install brotli for br)'}")
+    return manifest
+
+
+def init_app(app, root: Optional[str] = None):
+    """Serve the frontend build at / with client-side routing fallback to index.html
+
+    The app must be created with static_folder=None, Flask's own static route
+    would shadow this one.
+    """
+    from flask import Response, jsonify, request, send_file
+
+    root = root or os.path.join(app.root_path, 'dist')
+    manifest = build_manifest(root)
+
+    def serve(asset: Asset):
+        encoding = 'identity'
+        if len(asset.variants) > 1:
+            for candidate, _ in ENCODINGS:
+                if candidate in asset.variants and request.accept_encodings.quality(candidate) > 0:
+                    encoding = candidate
+                    break
+
+        etag = asset.etag if encoding == 'identity' else f"{asset.etag}-{encoding}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            body = asset.variants[encoding]
+            if isinstance(body, bytes):
+                response = Response(body, mimetype=asset.mimetype)
+            else:
+                response = send_file(body, mimetype=asset.mimetype, conditional=False, etag=False)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = asset.cache_control
+        if len(asset.variants) > 1:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve_react_app(path):
+        asset = manifest.get(path)
+        if asset is not None:
+            return serve(asset)
+
+        # A missing file (e.g. an asset of an older build) must not be answered with HTML
+        if path.startswith(f'{ASSETS_DIR}/') or os.path.splitext(path)[1]:
+            return jsonify({"status": "error", "message": "Not found"}), 404
+
+        index = manifest.get('index.html')
+        if index is None:
+            return jsonify({"status": "error", "message": "Frontend not built"}), 404
+        return serve(index)